@@ -0,0 +1,28 @@
+"""add chunk_hash to pages
+
+Revision ID: 49b9edbf0718
+Revises: b3dea2f46f1e
+Create Date: 2026-10-17 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '49b9edbf0718'
+down_revision: Union[str, None] = 'b3dea2f46f1e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('pages', sa.Column('chunk_hash', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('pages', 'chunk_hash')
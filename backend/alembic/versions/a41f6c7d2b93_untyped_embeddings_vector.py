@@ -0,0 +1,32 @@
+"""untyped embeddings vector
+
+Revision ID: a41f6c7d2b93
+Revises: 7c2e91d04a6b
+Create Date: 2026-10-17 14:21:05.117842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41f6c7d2b93'
+down_revision: Union[str, None] = '7c2e91d04a6b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Размерность зависит от бэкенда и настроек датасета
+    op.alter_column('embeddings', 'vector', type_=Vector(), existing_type=Vector(1536))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Векторы другой размерности при этом не переживут приведение типа
+    op.execute("DELETE FROM embeddings WHERE vector_dims(vector) <> 1536")
+    op.alter_column('embeddings', 'vector', type_=Vector(1536), existing_type=Vector(),
+                    postgresql_using='vector::vector(1536)')
@@ -0,0 +1,44 @@
+"""move raw_html to blob store
+
+Revision ID: b9c3e6d1f742
+Revises: a7d4c2e9b315
+Create Date: 2026-10-17 20:14:51.630927
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9c3e6d1f742'
+down_revision: Union[str, None] = 'a7d4c2e9b315'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'page_blobs',
+        sa.Column('sha', sa.String(length=64), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('sha'),
+    )
+    # Данные уже сжаты zstd — повторное pglz-сжатие TOAST только тратит CPU
+    op.execute("ALTER TABLE page_blobs ALTER COLUMN data SET STORAGE EXTERNAL")
+
+    op.add_column('pages', sa.Column('raw_html_sha', sa.String(length=64), nullable=True))
+    # Перенос содержимого — scripts/migrate_raw_html.py (пачками, без долгой блокировки)
+    op.alter_column('pages', 'raw_html', existing_type=sa.Text(), nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Перед откатом HTML нужно вернуть в pages.raw_html: scripts/migrate_raw_html.py --restore
+    op.alter_column('pages', 'raw_html', existing_type=sa.Text(), nullable=False)
+    op.drop_column('pages', 'raw_html_sha')
+    op.drop_table('page_blobs')
@@ -0,0 +1,96 @@
+"""denormalize dataset_id on chunks and embeddings
+
+Revision ID: c4e8a1f6d392
+Revises: b9c3e6d1f742
+Create Date: 2026-10-17 22:41:09.518304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a1f6d392'
+down_revision: Union[str, None] = 'b9c3e6d1f742'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH = 10000  # строк на транзакцию: короткие блокировки, таблица доступна на запись
+
+BACKFILL_CHUNKS = sa.text(
+    "UPDATE chunks c SET dataset_id = l.dataset_id FROM pages p JOIN links l ON l.id = p.link_id "
+    "WHERE p.id = c.page_id AND c.dataset_id IS NULL AND c.id >= :lo AND c.id < :hi"
+)
+BACKFILL_EMBEDDINGS = sa.text(
+    "UPDATE embeddings e SET dataset_id = c.dataset_id FROM chunks c "
+    "WHERE c.id = e.chunk_id AND e.dataset_id IS NULL AND e.chunk_id >= :lo AND e.chunk_id < :hi"
+)
+
+INDEXES = [
+    "ix_links_dataset_status ON links (dataset_id, status)",
+    "ix_pages_link_id ON pages (link_id)",
+    "ix_chunks_page_id ON chunks (page_id)",
+    "ix_chunks_dataset_id ON chunks (dataset_id, id)",
+    "ix_chunks_canonical ON chunks (dataset_id, id) WHERE duplicate_of IS NULL",
+    "ix_chunks_pending_enrich ON chunks (dataset_id, id) "
+    "WHERE summary IS NULL AND quality IS NULL AND duplicate_of IS NULL",
+    "ix_embeddings_dataset_id ON embeddings (dataset_id, chunk_id)",
+]
+
+
+def backfill(statement, table: str, key: str) -> None:
+    # Пачками по диапазону ключа, каждая — отдельная транзакция (autocommit_block)
+    last = op.get_bind().execute(sa.text(f"SELECT coalesce(max({key}), 0) FROM {table}")).scalar()
+    for lo in range(0, last + 1, BACKFILL_BATCH):
+        op.execute(statement.bindparams(lo=lo, hi=lo + BACKFILL_BATCH))
+
+
+def set_not_null(table: str) -> None:
+    # CHECK NOT VALID + VALIDATE не держат эксклюзивную блокировку на время проверки,
+    # а SET NOT NULL при проверенном CHECK не сканирует таблицу заново
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT ck_{table}_dataset_id_not_null "
+               f"CHECK (dataset_id IS NOT NULL) NOT VALID")
+    op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT ck_{table}_dataset_id_not_null")
+    op.execute(f"ALTER TABLE {table} ALTER COLUMN dataset_id SET NOT NULL")
+    op.execute(f"ALTER TABLE {table} DROP CONSTRAINT ck_{table}_dataset_id_not_null")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Колонки без default — мгновенно; внешние ключи NOT VALID — без проверки существующих строк
+    op.add_column('chunks', sa.Column('dataset_id', sa.Integer(), nullable=True))
+    op.add_column('embeddings', sa.Column('dataset_id', sa.Integer(), nullable=True))
+    op.execute("ALTER TABLE chunks ADD CONSTRAINT chunks_dataset_id_fkey FOREIGN KEY (dataset_id) "
+               "REFERENCES datasets (id) ON DELETE CASCADE NOT VALID")
+    op.execute("ALTER TABLE embeddings ADD CONSTRAINT embeddings_dataset_id_fkey FOREIGN KEY (dataset_id) "
+               "REFERENCES datasets (id) ON DELETE CASCADE NOT VALID")
+
+    # Стадии ETL старой версии на время миграции лучше остановить: их новые строки
+    # без dataset_id догоняет только повторный проход ниже
+    with op.get_context().autocommit_block():
+        backfill(BACKFILL_CHUNKS, 'chunks', 'id')
+        op.execute("UPDATE chunks c SET dataset_id = l.dataset_id FROM pages p JOIN links l ON l.id = p.link_id "
+                   "WHERE p.id = c.page_id AND c.dataset_id IS NULL")
+        backfill(BACKFILL_EMBEDDINGS, 'embeddings', 'chunk_id')
+        op.execute("UPDATE embeddings e SET dataset_id = c.dataset_id FROM chunks c "
+                   "WHERE c.id = e.chunk_id AND e.dataset_id IS NULL")
+
+        op.execute("ALTER TABLE chunks VALIDATE CONSTRAINT chunks_dataset_id_fkey")
+        op.execute("ALTER TABLE embeddings VALIDATE CONSTRAINT embeddings_dataset_id_fkey")
+        set_not_null('chunks')
+        set_not_null('embeddings')
+
+        # CONCURRENTLY — чтобы не блокировать запись на время построения
+        for index in INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for index in reversed(INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index.split()[0]}")
+    op.drop_column('embeddings', 'dataset_id')
+    op.drop_column('chunks', 'dataset_id')
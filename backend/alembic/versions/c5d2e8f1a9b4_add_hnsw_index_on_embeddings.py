@@ -0,0 +1,34 @@
+"""add hnsw index on embeddings
+
+Revision ID: c5d2e8f1a9b4
+Revises: a41f6c7d2b93
+Create Date: 2026-10-17 15:04:52.640113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d2e8f1a9b4'
+down_revision: Union[str, None] = 'a41f6c7d2b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY — чтобы не блокировать запись эмбеддингов на время построения
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_embeddings_vector_hnsw ON embeddings "
+            "USING hnsw ((vector::vector(1536)) vector_cosine_ops) WITH (m = 16, ef_construction = 64) "
+            "WHERE vector_dims(vector) = 1536"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_embeddings_vector_hnsw")
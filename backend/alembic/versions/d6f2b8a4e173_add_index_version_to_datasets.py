@@ -0,0 +1,29 @@
+"""add index_version to datasets
+
+Revision ID: d6f2b8a4e173
+Revises: c4e8a1f6d392
+Create Date: 2026-10-18 11:05:42.316508
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6f2b8a4e173'
+down_revision: Union[str, None] = 'c4e8a1f6d392'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Константный DEFAULT — без перезаписи таблицы
+    op.add_column('datasets', sa.Column('index_version', sa.BigInteger(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('datasets', 'index_version')
@@ -0,0 +1,77 @@
+"""add search_vector to chunks
+
+Revision ID: e8b3f7a25c61
+Revises: c5d2e8f1a9b4
+Create Date: 2026-10-17 16:37:48.902215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b3f7a25c61'
+down_revision: Union[str, None] = 'c5d2e8f1a9b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH = 10000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chunks', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.execute("""
+        CREATE OR REPLACE FUNCTION chunks_search_vector_update() RETURNS trigger AS $$
+        DECLARE
+            cfg regconfig;
+            topics text;
+        BEGIN
+            SELECT CASE WHEN p.meta_data->>'language' = 'ru' THEN 'russian' ELSE 'english' END::regconfig
+            INTO cfg FROM pages p WHERE p.id = NEW.page_id;
+            IF jsonb_typeof(NEW.chunk_meta_data->'topics') = 'array' THEN
+                SELECT string_agg(t, ' ') INTO topics FROM jsonb_array_elements_text(NEW.chunk_meta_data->'topics') t;
+            END IF;
+            cfg := coalesce(cfg, 'english');
+            NEW.search_vector :=
+                setweight(to_tsvector(cfg, coalesce(NEW.chunk_text, '')), 'A') ||
+                setweight(to_tsvector(cfg, coalesce(NEW.summary, '')), 'B') ||
+                setweight(to_tsvector(cfg, coalesce(topics, '')), 'B');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER chunks_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF chunk_text, summary, chunk_meta_data ON chunks
+        FOR EACH ROW EXECUTE FUNCTION chunks_search_vector_update()
+    """)
+
+    # Заполнение существующих чанков: пустой UPDATE по колонке из списка будит триггер.
+    # Пачками по id, каждая — отдельная транзакция (autocommit_block), чтобы не держать
+    # одну гигантскую транзакцию строк; колонка и триггер фиксируются до входа в блок
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        max_id = connection.execute(sa.text("SELECT coalesce(max(id), 0) FROM chunks")).scalar()
+        for start in range(0, max_id, BACKFILL_BATCH):
+            connection.execute(
+                sa.text("UPDATE chunks SET chunk_text = chunk_text WHERE id > :start AND id <= :end"),
+                {"start": start, "end": start + BACKFILL_BATCH},
+            )
+
+        # CONCURRENTLY не блокирует запись в chunks на время построения; вне транзакции
+        op.create_index('ix_chunks_search_vector', 'chunks', ['search_vector'],
+                        postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_chunks_search_vector', table_name='chunks', postgresql_using='gin',
+                      postgresql_concurrently=True, if_exists=True)
+    op.execute("DROP TRIGGER IF EXISTS chunks_search_vector_trigger ON chunks")
+    op.execute("DROP FUNCTION IF EXISTS chunks_search_vector_update()")
+    op.drop_column('chunks', 'search_vector')
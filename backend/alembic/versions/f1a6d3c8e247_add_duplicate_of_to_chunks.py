@@ -0,0 +1,32 @@
+"""add duplicate_of to chunks
+
+Revision ID: f1a6d3c8e247
+Revises: e8b3f7a25c61
+Create Date: 2026-10-17 17:52:30.415826
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a6d3c8e247'
+down_revision: Union[str, None] = 'e8b3f7a25c61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chunks', sa.Column('duplicate_of', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'chunks_duplicate_of_fkey', 'chunks', 'chunks', ['duplicate_of'], ['id'], ondelete='SET NULL'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('chunks_duplicate_of_fkey', 'chunks', type_='foreignkey')
+    op.drop_column('chunks', 'duplicate_of')
@@ -6,6 +6,7 @@ from sqlalchemy.future import select
 from core.db import get_db
 from core.security import verify_password, create_access_token
 from models.models import User
+from models.profiles import USER_AUTH
 from api.schemas.users import Token
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -16,7 +17,7 @@ async def login_for_access_token(
     db: AsyncSession = Depends(get_db)
 ):
     # Аутентификация пользователя
-    result = await db.execute(select(User).where(User.email == form_data.username))
+    result = await db.execute(select(User).where(User.email == form_data.username).options(*USER_AUTH.options()))
     user = result.scalar_one_or_none()
     
     if not user or not verify_password(form_data.password, user.password_hash):
@@ -2,11 +2,17 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import List, Optional
+import time
 
 from core.db import get_db
 from core.security import get_current_user
-from models.models import Chunk, Page
-from api.schemas.chunks import ChunkBase, ChunkCreate, ChunkUpdate, ChunkResponse
+from models.models import Chunk, Dataset, Link, Page
+from models.profiles import CHUNK_ID, CHUNK_RESPONSE
+from api.schemas.chunks import ChunkBase, ChunkCreate, ChunkUpdate, ChunkResponse, ChunkSearchRequest
+from api.schemas.search import SearchResponse, SearchResult
+from search import PgVectorIndex, SearchFilters, embed_query, lexical_search, load_results, rrf_fuse
+from search.numpy_index import bump_version
+from search.hybrid import CANDIDATES
 
 router = APIRouter(prefix="/chunks", tags=["Chunks"])
 
@@ -22,7 +28,7 @@ async def get_chunks(
     """
     Get all chunks with optional filtering by page_id and quality
     """
-    query = select(Chunk)
+    query = select(Chunk).options(*CHUNK_RESPONSE.options())
     
     if page_id:
         query = query.where(Chunk.page_id == page_id)
@@ -38,6 +44,44 @@ async def get_chunks(
     
     return chunks
 
+@router.post("/search", response_model=SearchResponse)
+async def search_chunks(
+    data: ChunkSearchRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Keyword, vector or hybrid (reciprocal rank fusion) search over dataset chunks
+    """
+    result = await db.execute(
+        select(Dataset.embedding_settings).where(
+            Dataset.id == data.dataset_id,
+            Dataset.user_id == current_user.id
+        )
+    )
+    row = result.first()
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+
+    started = time.perf_counter()
+    filters = SearchFilters(quality=data.quality, metadata=data.metadata)
+    # Для слияния берём с каждой стороны больше кандидатов, чем k
+    depth = data.k if data.mode != "hybrid" else max(data.k * 4, CANDIDATES)
+
+    rankings = []
+    if data.mode in ("hybrid", "lexical"):
+        rankings.append(await lexical_search(db, data.dataset_id, data.query, depth, filters))
+    if data.mode in ("hybrid", "vector"):
+        vector = await embed_query(data.query, row.embedding_settings)
+        rankings.append(await PgVectorIndex(db).search(data.dataset_id, vector, depth, filters, data.ef_search))
+
+    hits = rrf_fuse(rankings, data.k, data.rrf_k) if data.mode == "hybrid" else rankings[0]
+    results = [SearchResult(**item) for item in await load_results(db, hits)]
+    return SearchResponse(took_ms=(time.perf_counter() - started) * 1000, results=results)
+
 @router.get("/{chunk_id}", response_model=ChunkResponse)
 async def get_chunk(
     chunk_id: int,
@@ -47,7 +91,7 @@ async def get_chunk(
     """
     Get a specific chunk by ID
     """
-    result = await db.execute(select(Chunk).where(Chunk.id == chunk_id))
+    result = await db.execute(select(Chunk).where(Chunk.id == chunk_id).options(*CHUNK_RESPONSE.options()))
     chunk = result.scalar_one_or_none()
     
     if not chunk:
@@ -67,18 +111,20 @@ async def create_chunk(
     """
     Create a new chunk
     """
-    # Verify that the page exists
-    result = await db.execute(select(Page).where(Page.id == chunk.page_id))
-    page = result.scalar_one_or_none()
+    # Verify that the page exists; its dataset is copied onto the chunk
+    result = await db.execute(
+        select(Link.dataset_id).join(Page, Page.link_id == Link.id).where(Page.id == chunk.page_id)
+    )
+    dataset_id = result.scalar_one_or_none()
     
-    if not page:
+    if dataset_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Page not found"
         )
     
     # Create new chunk
-    db_chunk = Chunk(**chunk.dict())
+    db_chunk = Chunk(**chunk.dict(), dataset_id=dataset_id)
     db.add(db_chunk)
     await db.commit()
     await db.refresh(db_chunk)
@@ -95,7 +141,7 @@ async def update_chunk(
     """
     Update an existing chunk
     """
-    result = await db.execute(select(Chunk).where(Chunk.id == chunk_id))
+    result = await db.execute(select(Chunk).where(Chunk.id == chunk_id).options(*CHUNK_RESPONSE.options()))
     db_chunk = result.scalar_one_or_none()
     
     if not db_chunk:
@@ -108,6 +154,8 @@ async def update_chunk(
     update_data = chunk_update.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_chunk, key, value)
+    # Text, quality and metadata are part of the numpy search snapshot
+    await bump_version(db, select(Chunk.dataset_id).where(Chunk.id == chunk_id).scalar_subquery())
     
     await db.commit()
     await db.refresh(db_chunk)
@@ -123,7 +171,7 @@ async def delete_chunk(
     """
     Delete a chunk
     """
-    result = await db.execute(select(Chunk).where(Chunk.id == chunk_id))
+    result = await db.execute(select(Chunk).where(Chunk.id == chunk_id).options(*CHUNK_ID.options()))
     db_chunk = result.scalar_one_or_none()
     
     if not db_chunk:
@@ -132,6 +180,7 @@ async def delete_chunk(
             detail="Chunk not found"
         )
     
+    await bump_version(db, select(Chunk.dataset_id).where(Chunk.id == chunk_id).scalar_subquery())
     await db.delete(db_chunk)
     await db.commit()
     
@@ -6,10 +6,13 @@ from typing import List
 from core.db import get_db
 from core.security import get_current_user
 from models.models import Dataset as DatasetModel, DatasetSettings as DatasetSettingsModel
+from models.profiles import DATASET_CHUNK_PREVIEW, DATASET_SETTINGS_EDIT
 from api.schemas.datasets import (
     DatasetCreate, DatasetUpdate, Dataset,
-    DatasetSettingsCreate, DatasetSettingsUpdate, RecommendationResponse
+    DatasetSettingsCreate, DatasetSettingsUpdate, RecommendationResponse,
+    ChunkPreviewRequest, ChunkPreviewResponse
 )
+from etl.splitter import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, TOKENIZER_MODEL, split_text
 
 router = APIRouter(prefix="/datasets", tags=["Datasets"])
 
@@ -37,13 +40,12 @@ async def get_recommendations(
 ):
     # Проверка доступа к датасету
     result = await db.execute(
-        select(DatasetModel).where(
+        select(DatasetModel.id).where(
             DatasetModel.id == dataset_id,
             DatasetModel.user_id == current_user.id
         )
     )
-    dataset = result.scalar_one_or_none()
-    if not dataset:
+    if result.scalar_one_or_none() is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Dataset not found"
@@ -59,6 +61,46 @@ async def get_recommendations(
         recommended_chunk_overlap=100
     )
 
+@router.post("/{dataset_id}/chunk-preview", response_model=ChunkPreviewResponse)
+async def preview_chunks(
+    dataset_id: int,
+    data: ChunkPreviewRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    # Проверка доступа к датасету; настройки — тем же профилем, без отдельного запроса в коде
+    result = await db.execute(
+        select(DatasetModel).where(
+            DatasetModel.id == dataset_id,
+            DatasetModel.user_id == current_user.id
+        ).options(*DATASET_CHUNK_PREVIEW.options())
+    )
+    dataset = result.scalar_one_or_none()
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+
+    # Параметры из запроса перекрывают настройки датасета
+    settings = dataset.settings
+    chunk_size = data.chunk_size or (settings.chunk_size if settings else DEFAULT_CHUNK_SIZE)
+    if data.chunk_overlap is not None:
+        chunk_overlap = data.chunk_overlap
+    else:
+        chunk_overlap = settings.chunk_overlap if settings else DEFAULT_CHUNK_OVERLAP
+
+    try:
+        # Сплиттер берётся из общего кэша etl/splitter.py
+        chunks = split_text(data.text, TOKENIZER_MODEL, chunk_size, chunk_overlap)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    return ChunkPreviewResponse(chunk_size=chunk_size, chunk_overlap=chunk_overlap, chunks=chunks)
+
 @router.post("/{dataset_id}/settings")
 async def update_settings(
     dataset_id: int, 
@@ -68,19 +110,22 @@ async def update_settings(
 ):
     # Проверка доступа к датасету
     result = await db.execute(
-        select(DatasetModel).where(
+        select(DatasetModel.id).where(
             DatasetModel.id == dataset_id,
             DatasetModel.user_id == current_user.id
         )
     )
-    dataset = result.scalar_one_or_none()
-    if not dataset:
+    if result.scalar_one_or_none() is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Dataset not found"
         )
     
-    result = await db.execute(select(DatasetSettingsModel).where(DatasetSettingsModel.dataset_id == dataset_id))
+    result = await db.execute(
+        select(DatasetSettingsModel)
+        .where(DatasetSettingsModel.dataset_id == dataset_id)
+        .options(*DATASET_SETTINGS_EDIT.options())
+    )
     settings = result.scalar_one_or_none()
 
     if settings:
@@ -6,7 +6,9 @@ from typing import List, Optional
 from core.db import get_db
 from core.security import get_current_user
 from models.models import Embedding, Chunk
+from models.profiles import EMBEDDING_ID, EMBEDDING_RESPONSE
 from api.schemas.embeddings import EmbeddingBase, EmbeddingCreate, EmbeddingResponse
+from search.numpy_index import bump_version
 
 router = APIRouter(prefix="/embeddings", tags=["Embeddings"])
 
@@ -21,7 +23,7 @@ async def get_embeddings(
     """
     Get all embeddings with optional filtering by chunk_id
     """
-    query = select(Embedding)
+    query = select(Embedding).options(*EMBEDDING_RESPONSE.options())
     
     if chunk_id:
         query = query.where(Embedding.chunk_id == chunk_id)
@@ -43,7 +45,9 @@ async def get_embedding(
     """
     Get a specific embedding by chunk_id
     """
-    result = await db.execute(select(Embedding).where(Embedding.chunk_id == chunk_id))
+    result = await db.execute(
+        select(Embedding).where(Embedding.chunk_id == chunk_id).options(*EMBEDDING_RESPONSE.options())
+    )
     embedding = result.scalar_one_or_none()
     
     if not embedding:
@@ -64,28 +68,28 @@ async def create_embedding(
     Create a new embedding
     """
     # Verify that the chunk exists
-    result = await db.execute(select(Chunk).where(Chunk.id == embedding.chunk_id))
-    chunk = result.scalar_one_or_none()
+    result = await db.execute(select(Chunk.dataset_id).where(Chunk.id == embedding.chunk_id))
+    dataset_id = result.scalar_one_or_none()
     
-    if not chunk:
+    if dataset_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Chunk not found"
         )
     
     # Check if embedding already exists
-    result = await db.execute(select(Embedding).where(Embedding.chunk_id == embedding.chunk_id))
-    existing_embedding = result.scalar_one_or_none()
+    result = await db.execute(select(Embedding.chunk_id).where(Embedding.chunk_id == embedding.chunk_id))
     
-    if existing_embedding:
+    if result.scalar_one_or_none() is not None:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Embedding already exists for this chunk"
         )
     
     # Create new embedding
-    db_embedding = Embedding(**embedding.dict())
+    db_embedding = Embedding(**embedding.dict(), dataset_id=dataset_id)
     db.add(db_embedding)
+    await bump_version(db, dataset_id)
     await db.commit()
     await db.refresh(db_embedding)
     
@@ -100,7 +104,7 @@ async def delete_embedding(
     """
     Delete an embedding
     """
-    result = await db.execute(select(Embedding).where(Embedding.chunk_id == chunk_id))
+    result = await db.execute(select(Embedding).where(Embedding.chunk_id == chunk_id).options(*EMBEDDING_ID.options()))
     db_embedding = result.scalar_one_or_none()
     
     if not db_embedding:
@@ -109,6 +113,7 @@ async def delete_embedding(
             detail="Embedding not found"
         )
     
+    await bump_version(db, select(Embedding.dataset_id).where(Embedding.chunk_id == chunk_id).scalar_subquery())
     await db.delete(db_embedding)
     await db.commit()
     
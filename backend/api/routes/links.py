@@ -6,6 +6,7 @@ from typing import List
 from core.db import get_db
 from core.security import get_current_user
 from models.models import Link as LinkModel, Dataset
+from models.profiles import LINK_RESPONSE
 from api.schemas.links import LinkCreate, LinkUpdate, Link, LinkList, LinkState
 
 router = APIRouter(prefix="/links", tags=["Links"])
@@ -18,11 +19,11 @@ async def create_link(
 ):
     # Проверка, что датасет существует и принадлежит пользователю
     result = await db.execute(
-        select(Dataset).where(Dataset.id == link.dataset_id)
+        select(Dataset.user_id).where(Dataset.id == link.dataset_id)
     )
-    dataset = result.scalar_one_or_none()
+    owner_id = result.scalar_one_or_none()
     
-    if not dataset or dataset.user_id != current_user.id:
+    if owner_id is None or owner_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Dataset not found or does not belong to the current user"
@@ -49,11 +50,11 @@ async def read_links_by_dataset(
 ):
     # Проверка, что датасет существует и принадлежит пользователю
     result = await db.execute(
-        select(Dataset).where(Dataset.id == dataset_id)
+        select(Dataset.user_id).where(Dataset.id == dataset_id)
     )
-    dataset = result.scalar_one_or_none()
+    owner_id = result.scalar_one_or_none()
     
-    if not dataset or dataset.user_id != current_user.id:
+    if owner_id is None or owner_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Dataset not found or does not belong to the current user"
@@ -63,6 +64,7 @@ async def read_links_by_dataset(
     result = await db.execute(
         select(LinkModel)
         .where(LinkModel.dataset_id == dataset_id)
+        .options(*LINK_RESPONSE.options())
         .offset(skip)
         .limit(limit)
     )
@@ -86,13 +88,14 @@ async def update_link(
 ):
     # Получение ссылки и проверка прав доступа
     result = await db.execute(
-        select(LinkModel, Dataset)
+        select(LinkModel, Dataset.user_id)
         .join(Dataset, LinkModel.dataset_id == Dataset.id)
         .where(LinkModel.id == link_id)
+        .options(*LINK_RESPONSE.options())
     )
     db_result = result.first()
     
-    if not db_result or db_result[1].user_id != current_user.id:
+    if not db_result or db_result.user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Link not found or does not belong to the current user"
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import List, Optional
 
+from blobstore import load_page_html, save_html
 from core.db import get_db
 from core.security import get_current_user
 from models.models import Page, Link
+from models.profiles import PAGE_ID, PAGE_RESPONSE
 from api.schemas.pages import PageBase, PageCreate, PageUpdate, PageResponse
 
 router = APIRouter(prefix="/pages", tags=["Pages"])
@@ -21,7 +24,7 @@ async def get_pages(
     """
     Get all pages with optional filtering by link_id
     """
-    query = select(Page)
+    query = select(Page).options(*PAGE_RESPONSE.options())
     
     if link_id:
         query = query.where(Page.link_id == link_id)
@@ -43,7 +46,7 @@ async def get_page(
     """
     Get a specific page by ID
     """
-    result = await db.execute(select(Page).where(Page.id == page_id))
+    result = await db.execute(select(Page).where(Page.id == page_id).options(*PAGE_RESPONSE.options()))
     page = result.scalar_one_or_none()
     
     if not page:
@@ -54,6 +57,25 @@ async def get_page(
     
     return page
 
+@router.get("/{page_id}/html", response_class=PlainTextResponse)
+async def get_page_html(
+    page_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Get the raw HTML of a page (loaded from the blob store only on this request)
+    """
+    html = await load_page_html(db, [page_id])
+    if page_id not in html:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Page HTML not found"
+        )
+
+    # text/plain: чужой HTML не должен исполняться в origin API
+    return PlainTextResponse(html[page_id])
+
 @router.post("", response_model=PageResponse, status_code=status.HTTP_201_CREATED)
 async def create_page(
     page: PageCreate,
@@ -64,17 +86,18 @@ async def create_page(
     Create a new page
     """
     # Verify that the link exists
-    result = await db.execute(select(Link).where(Link.id == page.link_id))
-    link = result.scalar_one_or_none()
+    result = await db.execute(select(Link.id).where(Link.id == page.link_id))
     
-    if not link:
+    if result.scalar_one_or_none() is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Link not found"
         )
     
     # Create new page
-    db_page = Page(**page.dict())
+    data = page.dict()
+    data["raw_html_sha"] = (await save_html(db, [data.pop("raw_html")]))[0]
+    db_page = Page(**data)
     db.add(db_page)
     await db.commit()
     await db.refresh(db_page)
@@ -91,7 +114,7 @@ async def update_page(
     """
     Update an existing page
     """
-    result = await db.execute(select(Page).where(Page.id == page_id))
+    result = await db.execute(select(Page).where(Page.id == page_id).options(*PAGE_RESPONSE.options()))
     db_page = result.scalar_one_or_none()
     
     if not db_page:
@@ -102,6 +125,10 @@ async def update_page(
     
     # Update page attributes
     update_data = page_update.dict(exclude_unset=True)
+    if "raw_html" in update_data:
+        raw_html = update_data.pop("raw_html")
+        update_data["raw_html_sha"] = (await save_html(db, [raw_html]))[0] if raw_html is not None else None
+        update_data["raw_html"] = None
     for key, value in update_data.items():
         setattr(db_page, key, value)
     
@@ -119,7 +146,7 @@ async def delete_page(
     """
     Delete a page
     """
-    result = await db.execute(select(Page).where(Page.id == page_id))
+    result = await db.execute(select(Page).where(Page.id == page_id).options(*PAGE_ID.options()))
     db_page = result.scalar_one_or_none()
     
     if not db_page:
@@ -0,0 +1,57 @@
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from core.db import get_db
+from core.security import get_current_user
+from models.models import Dataset
+from api.schemas.search import SearchRequest, SearchResponse, SearchResult
+from search import PgVectorIndex, SearchFilters, embed_query, load_results
+from search.numpy_index import get_index
+
+router = APIRouter(prefix="/datasets", tags=["Search"])
+
+@router.post("/{dataset_id}/search", response_model=SearchResponse)
+async def search_chunks(
+    dataset_id: int,
+    data: SearchRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Top-k chunks of the dataset closest to the query text or vector
+    """
+    if (data.query is None) == (data.vector is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass either query or vector"
+        )
+
+    # Проверка доступа к датасету; нужны только настройки эмбеддингов
+    result = await db.execute(
+        select(Dataset.embedding_settings).where(
+            Dataset.id == dataset_id,
+            Dataset.user_id == current_user.id
+        )
+    )
+    row = result.first()
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+
+    started = time.perf_counter()
+    vector = data.vector if data.vector is not None else await embed_query(data.query, row.embedding_settings)
+
+    filters = SearchFilters(quality=data.quality, metadata=data.metadata)
+    if data.engine == "numpy":
+        index = await get_index(db, dataset_id)
+        hits = await index.search(dataset_id, vector, data.k, filters, data.ef_search) if index else []
+    else:
+        hits = await PgVectorIndex(db).search(dataset_id, vector, data.k, filters, data.ef_search)
+
+    results = [SearchResult(**item) for item in await load_results(db, hits)]
+    return SearchResponse(took_ms=(time.perf_counter() - started) * 1000, results=results)
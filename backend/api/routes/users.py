@@ -13,7 +13,7 @@ router = APIRouter(prefix="/users", tags=["Users"])
 @router.post("/", response_model=User, status_code=status.HTTP_201_CREATED)
 async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     # Проверка, что пользователь с таким email не существует
-    result = await db.execute(select(UserModel).where(UserModel.email == user.email))
+    result = await db.execute(select(UserModel.id).where(UserModel.email == user.email))
     if result.scalar_one_or_none():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -41,7 +41,7 @@ async def update_user(
     # Обновление данных пользователя
     if user.email is not None and user.email != current_user.email:
         # Проверка, что новый email не занят
-        result = await db.execute(select(UserModel).where(UserModel.email == user.email))
+        result = await db.execute(select(UserModel.id).where(UserModel.email == user.email))
         if result.scalar_one_or_none():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
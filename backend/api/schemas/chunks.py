@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Literal
 from datetime import datetime
 
 class ChunkBase(BaseModel):
@@ -28,3 +28,14 @@ class ChunkResponse(ChunkBase):
     
     class Config:
         orm_mode = True
+
+class ChunkSearchRequest(BaseModel):
+    dataset_id: int
+    query: str = Field(..., min_length=1)
+    # hybrid — RRF лексической и векторной выдачи; lexical — только полнотекстовый индекс
+    mode: Literal["hybrid", "lexical", "vector"] = "hybrid"
+    k: int = Field(10, ge=1, le=100)
+    ef_search: Optional[int] = Field(None, ge=1, le=1000)
+    rrf_k: int = Field(60, ge=1)
+    quality: Optional[List[str]] = None
+    metadata: Optional[Dict[str, Any]] = None
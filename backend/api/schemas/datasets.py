@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 
 class DatasetBase(BaseModel):
@@ -33,6 +33,16 @@ class RecommendationResponse(BaseModel):
     recommended_chunk_size: int
     recommended_chunk_overlap: int
 
+class ChunkPreviewRequest(BaseModel):
+    text: str
+    chunk_size: Optional[int] = Field(None, ge=1)
+    chunk_overlap: Optional[int] = Field(None, ge=0)
+
+class ChunkPreviewResponse(BaseModel):
+    chunk_size: int
+    chunk_overlap: int
+    chunks: List[str]
+
 class Dataset(DatasetBase):
     id: int
     user_id: int
@@ -5,7 +5,6 @@ from datetime import datetime
 class PageBase(BaseModel):
     url: str
     title: Optional[str] = None
-    raw_html: str
     clean_text: Optional[str] = None
     raw_author: Optional[str] = None
     clean_author: Optional[str] = None
@@ -20,6 +19,7 @@ class PageBase(BaseModel):
 
 class PageCreate(PageBase):
     link_id: int
+    raw_html: str  # пишется в хранилище blob-ов, в ответах не возвращается
 
 class PageUpdate(BaseModel):
     url: Optional[str] = None
@@ -40,6 +40,7 @@ class PageUpdate(BaseModel):
 class PageResponse(PageBase):
     id: int
     link_id: int
+    raw_html_sha: Optional[str] = None  # сам HTML — GET /pages/{id}/html
     created_at: datetime
     
     class Config:
@@ -0,0 +1,27 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any, Literal
+
+class SearchRequest(BaseModel):
+    # Ровно одно из двух: текст запроса (векторизуется бэкендом датасета) или готовый вектор
+    query: Optional[str] = None
+    vector: Optional[List[float]] = None
+    k: int = Field(10, ge=1, le=100)
+    ef_search: Optional[int] = Field(None, ge=1, le=1000)
+    quality: Optional[List[str]] = None
+    metadata: Optional[Dict[str, Any]] = None
+    # numpy — индекс в памяти процесса (search/numpy_index.py); ef_search для него — nprobe IVF
+    engine: Literal["pgvector", "numpy"] = "pgvector"
+
+class SearchResult(BaseModel):
+    chunk_id: int
+    page_id: int
+    url: str
+    score: float
+    chunk_text: str
+    summary: Optional[str] = None
+    quality: Optional[str] = None
+    chunk_meta_data: Dict[str, Any] = Field(default_factory=dict)
+
+class SearchResponse(BaseModel):
+    took_ms: float
+    results: List[SearchResult]
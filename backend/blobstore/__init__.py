@@ -0,0 +1,8 @@
+# Хранилище raw HTML вне таблицы pages: zstd + адрес по содержимому
+from blobstore.base import BlobStore, PackedBlob
+from blobstore.db_store import DbBlobStore
+from blobstore.fs_store import FsBlobStore
+from blobstore.pages import get_blob_store, load_page_html, pack_html, save_html, unpack_html
+
+__all__ = ["BlobStore", "PackedBlob", "DbBlobStore", "FsBlobStore", "get_blob_store", "load_page_html",
+           "pack_html", "save_html", "unpack_html"]
@@ -0,0 +1,29 @@
+"""base.py
+
+Общий интерфейс хранилищ blob-ов.
+
+Ключ — sha256 исходного (несжатого) содержимого, значение — zstd-поток.
+Одинаковый HTML хранится один раз, запись идемпотентна. Хранилище получает
+сессию вызывающего: табличный бэкенд пишет в той же транзакции, что и страница.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, NamedTuple
+
+
+class PackedBlob(NamedTuple):
+    sha: str     # sha256 исходных байт, hex
+    data: bytes  # zstd
+    size: int    # байт до сжатия
+
+
+class BlobStore(ABC):
+    name = "base"
+
+    @abstractmethod
+    async def put_many(self, session, blobs: List[PackedBlob]) -> None:
+        ...
+
+    @abstractmethod
+    async def get_many(self, session, shas: Iterable[str]) -> Dict[str, bytes]:
+        """{sha: zstd-данные}; отсутствующие ключи просто не попадают в ответ."""
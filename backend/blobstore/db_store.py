@@ -0,0 +1,36 @@
+"""db_store.py
+
+Blob-ы в отдельной таблице page_blobs. Горячая таблица pages остаётся узкой,
+а HTML читается только по явному запросу — по sha.
+"""
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from blobstore.base import BlobStore
+from models.models import PageBlob
+
+WRITE_BATCH = 100
+READ_BATCH = 500
+
+
+class DbBlobStore(BlobStore):
+    name = "db"
+
+    async def put_many(self, session, blobs):
+        # Без commit — в одной транзакции со страницами; повтор того же HTML тихо пропускается
+        rows = [{"sha": blob.sha, "data": blob.data, "size": blob.size} for blob in {b.sha: b for b in blobs}.values()]
+        for i in range(0, len(rows), WRITE_BATCH):
+            await session.execute(
+                insert(PageBlob).values(rows[i:i + WRITE_BATCH]).on_conflict_do_nothing(index_elements=[PageBlob.sha])
+            )
+
+    async def get_many(self, session, shas):
+        shas = list(set(shas))
+        found = {}
+        for i in range(0, len(shas), READ_BATCH):
+            result = await session.execute(
+                select(PageBlob.sha, PageBlob.data).where(PageBlob.sha.in_(shas[i:i + READ_BATCH]))
+            )
+            found.update({row.sha: row.data for row in result})
+        return found
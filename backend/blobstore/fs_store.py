@@ -0,0 +1,50 @@
+"""fs_store.py
+
+Blob-ы файлами: <root>/ab/cd/abcd….zst. Та же раскладка ложится на объектное
+хранилище (ключ = путь), поэтому S3-бэкенд — это ещё один класс с теми же методами.
+
+Файл пишется до commit страницы: при откате остаётся лишний файл, но не битая ссылка.
+"""
+
+import asyncio
+import os
+from pathlib import Path
+
+from blobstore.base import BlobStore
+
+
+class FsBlobStore(BlobStore):
+    name = "fs"
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def path(self, sha: str) -> Path:
+        return self.root / sha[:2] / sha[2:4] / f"{sha}.zst"
+
+    def _write(self, blobs):
+        for blob in blobs:
+            path = self.path(blob.sha)
+            if path.exists():
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Атомарно: читатель никогда не увидит недописанный файл
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(blob.data)
+            os.replace(tmp, path)
+
+    def _read(self, shas):
+        found = {}
+        for sha in shas:
+            try:
+                found[sha] = self.path(sha).read_bytes()
+            except FileNotFoundError:
+                continue
+        return found
+
+    async def put_many(self, session, blobs):
+        if blobs:
+            await asyncio.to_thread(self._write, blobs)
+
+    async def get_many(self, session, shas):
+        return await asyncio.to_thread(self._read, set(shas))
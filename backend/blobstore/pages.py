@@ -0,0 +1,79 @@
+"""pages.py
+
+raw HTML страниц ↔ хранилище blob-ов.
+
+* pack_html — sha256 + zstd; синхронная, её удобно звать в пуле процессов
+  (etl/raw_html_extractor.py пакует HTML тем же заходом, что и парсит).
+* save_html / load_page_html — запись и явная загрузка. Страницы, которые ещё не
+  перенесены scripts/migrate_raw_html.py, читаются из старой колонки pages.raw_html.
+* Бэкенд — settings.BLOB_STORE: "db" (таблица page_blobs) или "fs" (каталог BLOB_DIR).
+"""
+
+import asyncio
+import hashlib
+import os
+
+import zstandard
+from sqlalchemy import select
+
+from blobstore.base import PackedBlob
+from blobstore.db_store import DbBlobStore
+from blobstore.fs_store import FsBlobStore
+from core.config import settings
+from models.models import Page
+
+ZSTD_LEVEL = int(os.getenv("BLOB_ZSTD_LEVEL", "9"))  # HTML жмётся в 5–10 раз, уровень 9 ещё быстрый
+
+_store = None
+
+
+def get_blob_store():
+    global _store
+    if _store is None:
+        if settings.BLOB_STORE == "db":
+            _store = DbBlobStore()
+        elif settings.BLOB_STORE == "fs":
+            _store = FsBlobStore(settings.BLOB_DIR)
+        else:
+            raise ValueError(f"Неизвестное хранилище blob-ов: {settings.BLOB_STORE}")
+    return _store
+
+
+def pack_html(html: str) -> PackedBlob:
+    raw = html.encode("utf-8")
+    data = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return PackedBlob(hashlib.sha256(raw).hexdigest(), data, len(raw))
+
+
+def unpack_html(data: bytes) -> str:
+    return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+
+
+async def save_html(session, htmls, store=None) -> list[str]:
+    """Пакует и пишет HTML (без commit); возвращает sha в том же порядке."""
+    packed = await asyncio.to_thread(lambda: [pack_html(html) for html in htmls])
+    await (store or get_blob_store()).put_many(session, packed)
+    return [blob.sha for blob in packed]
+
+
+async def load_page_html(session, page_ids, store=None) -> dict:
+    """{page_id: raw HTML} — единственный путь, которым HTML попадает в Python."""
+    page_ids = list(page_ids)
+    if not page_ids:
+        return {}
+    result = await session.execute(select(Page.id, Page.raw_html_sha).where(Page.id.in_(page_ids)))
+    shas = {row.id: row.raw_html_sha for row in result}
+
+    html = {}
+    blobs = await (store or get_blob_store()).get_many(session, {sha for sha in shas.values() if sha})
+    if blobs:
+        unpacked = await asyncio.to_thread(lambda: {sha: unpack_html(data) for sha, data in blobs.items()})
+        html = {page_id: unpacked[sha] for page_id, sha in shas.items() if sha in unpacked}
+
+    legacy = [page_id for page_id, sha in shas.items() if not sha]
+    if legacy:
+        result = await session.execute(
+            select(Page.id, Page.raw_html).where(Page.id.in_(legacy)).where(Page.raw_html.isnot(None))
+        )
+        html.update({row.id: row.raw_html for row in result})
+    return html
@@ -10,5 +10,7 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    BLOB_STORE: str = os.getenv("BLOB_STORE", "db")          # db | fs — где лежит raw HTML страниц
+    BLOB_DIR: str = os.getenv("BLOB_DIR", "data/blobs")
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""query_guard.py
+
+Детектор N+1 и лишней выборки. Слушает запросы движка, пока открыт контекст,
+и на выходе падает с AssertionError, если:
+
+* запросов больше, чем заявлено профилями (1 на профиль + по одному на связь) и extra;
+* один и тот же запрос (с точностью до параметров) выполнился больше repeat раз — N+1;
+* SELECT вернул колонку вне профилей и allow — например, pages.raw_html или embeddings.vector
+  там, где нужен только id.
+
+В тесте маршрута:
+
+    async with QueryGuard(engine, USER_AUTH, CHUNK_RESPONSE):
+        response = await client.get("/api/chunks?limit=100")
+
+В тесте стадии ETL — так же вокруг вызова стадии; в allow — колонки, которые стадия
+выбирает через select(Model.col, ...), например allow=("datasets.embedding_settings",),
+в extra — число таких запросов. Профили — models/profiles.py.
+"""
+
+import re
+from collections import Counter
+
+from sqlalchemy import event
+
+IN_RE = re.compile(r"\bIN\s*\([^()]*\)", re.IGNORECASE)
+PARAM_RE = re.compile(r"%\(\w+\)s|\$\d+|'[^']*'|\b\d+\b")
+
+
+def normalize(statement: str) -> str:
+    # Параметры, литералы и IN (...) любой длины не различаем — один и тот же запрос
+    return " ".join(PARAM_RE.sub("?", IN_RE.sub("IN (?)", statement)).split())
+
+
+class QueryGuard:
+    def __init__(self, engine, *profiles, allow=(), extra: int = 0, repeat: int = 1):
+        # AsyncEngine слушается через sync_engine
+        self.engine = getattr(engine, "sync_engine", engine)
+        self.profiles = profiles
+        self.allow = {tuple(name.split(".", 1)) for name in allow}   # "таблица.колонка"
+        self.budget = sum(profile.queries for profile in profiles) + extra
+        self.repeat = repeat
+        self.statements = []   # [(sql, [колонки результата])]
+
+    def allowed(self) -> set:
+        allowed = set(self.allow)
+        for profile in self.profiles:
+            allowed |= profile.allowed_columns()
+        return allowed
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        columns = [column[0] for column in cursor.description or ()]
+        self.statements.append((statement, columns))
+
+    def violations(self) -> list[str]:
+        selects = [(sql, columns) for sql, columns in self.statements if sql.lstrip().upper().startswith(("SELECT", "WITH"))]
+        problems = []
+
+        if len(selects) > self.budget:
+            problems.append(f"запросов {len(selects)}, по профилям ожидалось не больше {self.budget}")
+
+        repeated = Counter(normalize(sql) for sql, _ in selects)
+        for sql, count in repeated.items():
+            if count > self.repeat:
+                problems.append(f"N+1: запрос выполнен {count} раз: {sql[:200]}")
+
+        # Имена в cursor.description — без таблицы; сверяем по имени или по «таблица_колонка»
+        allowed = self.allowed()
+        names = {column for _, column in allowed} | {f"{table}_{column}" for table, column in allowed}
+        for sql, columns in selects:
+            extra = [column for column in columns if column not in names]
+            if extra:
+                problems.append(f"лишние колонки {extra}: {sql[:200]}")
+        return problems
+
+    def __enter__(self):
+        event.listen(self.engine, "after_cursor_execute", self._after_execute)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(self.engine, "after_cursor_execute", self._after_execute)
+        if exc_type is None:
+            problems = self.violations()
+            assert not problems, "Запросы вышли за профиль загрузки:\n" + "\n".join(problems)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
@@ -11,6 +11,7 @@ from sqlalchemy.future import select
 from core.config import settings
 from core.db import get_db
 from models.models import User
+from models.profiles import USER_AUTH
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
@@ -22,7 +23,7 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 async def get_user(email: str, session: AsyncSession):
-    result = await session.execute(select(User).where(User.email == email))
+    result = await session.execute(select(User).where(User.email == email).options(*USER_AUTH.options()))
     return result.scalar_one_or_none()
 
 async def authenticate_user(email: str, password: str, session: AsyncSession):
@@ -2,63 +2,180 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import asyncio
+from sqlalchemy import delete, func, insert, update
 from sqlalchemy.future import select
-from semantic_text_splitter import TextSplitter
-import re
 
 # Импортируем модели и соединение с БД из централизованных модулей
-from models.models import Page, Chunk, Link, DatasetSettings
+from models.models import Page, Chunk, Link, DatasetSettings, Embedding
+from models.profiles import SETTINGS_CHUNKER
 from core.db import async_session_maker
+from etl.splitter import (
+    DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, TOKENIZER_MODEL, split_text,
+)
+from etl.jobqueue import complete, enqueue, fail, iter_claimed, seed
+from etl.workers import CPU_WORKERS, make_process_pool, run_in_pool
+from search.numpy_index import bump_version
 
-def flatten(text):
-    return re.sub(r'\s+', ' ', text.replace('\n', ' ')).strip()
+PAGE_BATCH = 200  # страниц на один запрос/commit
+
+async def split_texts(texts, chunk_size, chunk_overlap, pool=None):
+    # С пулом — страницы режутся параллельно на всех ядрах, порядок результатов сохраняется.
+    # Сплиттер кэшируется в каждом процессе (etl/splitter.py).
+    if pool is None:
+        return [split_text(text, TOKENIZER_MODEL, chunk_size, chunk_overlap) for text in texts]
+    return await asyncio.gather(*[
+        run_in_pool(pool, split_text, text, TOKENIZER_MODEL, chunk_size, chunk_overlap)
+        for text in texts
+    ])
 
 async def get_chunk_settings(session, dataset_id):
     # Получаем настройки чанкирования из dataset_settings
     result = await session.execute(
-        select(DatasetSettings).where(DatasetSettings.dataset_id == dataset_id)
+        select(DatasetSettings)
+        .where(DatasetSettings.dataset_id == dataset_id)
+        .options(*SETTINGS_CHUNKER.options())
     )
     settings = result.scalar_one_or_none()
-    chunk_size = settings.chunk_size if settings and settings.chunk_size else 512
-    chunk_overlap = settings.chunk_overlap if settings and settings.chunk_overlap else 50
+    chunk_size = settings.chunk_size if settings and settings.chunk_size else DEFAULT_CHUNK_SIZE
+    # overlap = 0 — допустимое значение, поэтому сравниваем с None
+    if settings and settings.chunk_overlap is not None:
+        chunk_overlap = settings.chunk_overlap
+    else:
+        chunk_overlap = DEFAULT_CHUNK_OVERLAP
     return chunk_size, chunk_overlap
 
-async def chunk_texts(dataset_id: int):
+def chunk_hash_expr(chunk_size, chunk_overlap):
+    # Хэш считается в Postgres — неизменённые страницы даже не читаются
+    return func.md5(func.concat(Page.clean_text, f"|{TOKENIZER_MODEL}|{chunk_size}|{chunk_overlap}"))
+
+def pending_pages(dataset_id, new_hash, *columns):
+    # Страницы без чанков или с изменившимся текстом/настройками
+    return (
+        select(*columns)
+        .join(Link, Link.id == Page.link_id)
+        .where(Link.dataset_id == dataset_id)
+        .where(Page.clean_text.isnot(None))
+        .where(Page.chunk_hash.is_distinct_from(new_hash))
+    )
+
+async def iter_page_batches(session, dataset_id, chunk_size, chunk_overlap, batch_size=PAGE_BATCH, page_ids=None):
+    # Keyset-пагинация по pages.id: только id, clean_text и новый хэш, без raw_html и связей.
+    # page_ids — только из этого списка (захваченные задачи chunk).
+    new_hash = chunk_hash_expr(chunk_size, chunk_overlap)
+    last_id = 0
+    while True:
+        query = (
+            pending_pages(dataset_id, new_hash, Page.id, Page.clean_text, new_hash.label("chunk_hash"))
+            .where(Page.id > last_id)
+            .order_by(Page.id)
+            .limit(batch_size)
+        )
+        if page_ids is not None:
+            query = query.where(Page.id.in_(page_ids))
+        result = await session.execute(query)
+        rows = result.all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+async def chunk_batch(session, dataset_id, rows, chunk_size, chunk_overlap, pool=None, claimed=()):
+    """Режет пачку страниц из iter_page_batches и пишет чанки; возвращает id новых чанков.
+    В той же транзакции: задачи enrich/embed на новые чанки и закрытие задач chunk (claimed)."""
+    page_ids = [row.id for row in rows]
+    page_chunks = await split_texts([row.clean_text for row in rows], chunk_size, chunk_overlap, pool)
+
+    # Старые чанки изменившихся страниц (и их векторы) заменяем в той же транзакции
+    old_chunks = select(Chunk.id).where(Chunk.page_id.in_(page_ids))
+    removed = await session.execute(delete(Embedding).where(Embedding.chunk_id.in_(old_chunks)))
+    if removed.rowcount:
+        await bump_version(session, dataset_id)
+    await session.execute(delete(Chunk).where(Chunk.page_id.in_(page_ids)))
+
+    values = []
+    for page_id, chunks in zip(page_ids, page_chunks):
+        values.extend(
+            {"page_id": page_id, "dataset_id": dataset_id, "chunk_index": idx, "chunk_text": chunk_text}
+            for idx, chunk_text in enumerate(chunks)
+        )
+    chunk_ids = []
+    if values:
+        result = await session.execute(insert(Chunk).returning(Chunk.id), values)
+        chunk_ids = list(result.scalars())
+    if rows:
+        await session.execute(
+            update(Page),
+            [{"id": row.id, "chunk_hash": row.chunk_hash} for row in rows],
+        )
+    await enqueue(session, "enrich", dataset_id, chunk_ids)
+    await enqueue(session, "embed", dataset_id, chunk_ids)
+    await complete(session, "chunk", claimed)
+    await session.commit()  # один commit на пачку страниц
+    return chunk_ids
+
+async def chunk_claimed(session, dataset_id, page_ids, chunk_size, chunk_overlap, pool=None):
+    """Одна пачка захваченных задач chunk → (страниц нарезано, id новых чанков)."""
+    rows = [
+        row
+        async for batch in iter_page_batches(session, dataset_id, chunk_size, chunk_overlap, page_ids=page_ids)
+        for row in batch
+    ]
+    try:
+        return len(rows), await chunk_batch(session, dataset_id, rows, chunk_size, chunk_overlap, pool, page_ids)
+    except Exception as e:
+        # Задачи уйдут на повтор с задержкой, после MAX_ATTEMPTS — в dead
+        await session.rollback()
+        print(f"❌ Ошибка чанкирования страниц {page_ids}: {e}")
+        await fail(session, "chunk", page_ids, str(e))
+        await session.commit()
+        return 0, []
+
+async def chunk_pages(session, dataset_id, page_ids, chunk_size, chunk_overlap, pool=None):
+    # Только указанные страницы — для потокового конвейера (etl/orchestrator.py)
+    chunk_ids = []
+    async for claimed in iter_claimed("chunk", dataset_id, PAGE_BATCH, page_ids):
+        chunk_ids += (await chunk_claimed(session, dataset_id, claimed, chunk_size, chunk_overlap, pool))[1]
+    return chunk_ids
+
+async def chunk_texts(dataset_id: int, workers: int = CPU_WORKERS):
+    pool = make_process_pool(workers) if workers > 1 else None
+    try:
+        await _chunk_texts(dataset_id, pool)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+async def _chunk_texts(dataset_id, pool):
     async with async_session_maker() as session:
         chunk_size, chunk_overlap = await get_chunk_settings(session, dataset_id)
         print(f"🧩 chunk_size={chunk_size}, chunk_overlap={chunk_overlap}")
-
-        # Находим все pages с заполненным clean_text, где еще нет чанков
-        result = await session.execute(
-            select(Page)
-            .join(Link)
-            .where(Link.dataset_id == dataset_id)
-            .where(Page.clean_text.isnot(None))
-        )
-        pages = result.scalars().all()
-        if not pages:
-            print("⚠️ Нет страниц для чанкирования.")
+        if chunk_overlap >= chunk_size:
+            print("❌ chunk_overlap должен быть меньше chunk_size")
             return
 
-        splitter = TextSplitter.from_tiktoken_model("gpt-3.5-turbo", chunk_size)
+        # Хэш считается в Postgres — неизменённые страницы даже не попадают в очередь
+        new_hash = chunk_hash_expr(chunk_size, chunk_overlap)
+        await seed(session, "chunk", dataset_id, pending_pages(dataset_id, new_hash, Page.id))
+        await session.commit()
+
+        total_pages = 0
         total_chunks = 0
 
-        for page in pages:
-            text = flatten(page.clean_text)
-            chunks = splitter.chunks(text)
-            for idx, chunk_text in enumerate(chunks):
-                session.add(Chunk(
-                    page_id=page.id,
-                    chunk_index=idx,
-                    chunk_text=chunk_text
-                ))
-            total_chunks += len(chunks)
-            print(f"✅ {page.url[:50]} — чанков: {len(chunks)}")
-            await session.commit()  # Можно вынести за цикл для скорости
+        # Страницы берутся пачками из очереди jobs: параллельный воркер получит другие
+        async for page_ids in iter_claimed("chunk", dataset_id, PAGE_BATCH):
+            pages, chunk_ids = await chunk_claimed(session, dataset_id, page_ids, chunk_size, chunk_overlap, pool)
+            total_pages += pages
+            total_chunks += len(chunk_ids)
+            print(f"✅ страниц: {total_pages}, чанков: {total_chunks}")
+
+        if not total_pages:
+            print("⚠️ Нет новых или изменённых страниц для чанкирования.")
+            return
 
         print(f"\n✅ Готово! Сгенерировано чанков: {total_chunks}")
 
 if __name__ == "__main__":
     import sys
     dataset_id = int(sys.argv[1]) if len(sys.argv) > 1 else 1
-    asyncio.run(chunk_texts(dataset_id))
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else CPU_WORKERS
+    asyncio.run(chunk_texts(dataset_id, workers))
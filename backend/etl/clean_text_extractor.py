@@ -3,30 +3,31 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import asyncio
 from sqlalchemy.future import select
-from bs4 import BeautifulSoup
-import trafilatura
 
 # Импортируем модели и соединение с БД из централизованных модулей
 from models.models import Page
+from models.profiles import PAGE_CLEAN
 from core.db import async_session_maker
+from blobstore import load_page_html
+from etl.extraction import extract_text, parse_tree
+from etl.workers import make_process_pool, run_in_pool
 
 def extract_clean_text(html: str) -> str:
-    # Пробуем через trafilatura (часто лучший вариант)
-    clean = trafilatura.extract(html)
-    if clean and len(clean.strip()) > 50:
-        return clean.strip()
-    # Fallback: BeautifulSoup
-    soup = BeautifulSoup(html, 'lxml')
-    text = soup.get_text(separator=' ', strip=True)
-    return text if len(text) > 50 else ""
+    # Тот же разбор, что и при скачивании (etl/extraction.py).
+    # Новые страницы получают clean_text сразу в raw_html_extractor,
+    # здесь дочищаются только старые записи.
+    tree = parse_tree(html)
+    return extract_text(tree) if tree is not None else ""
 
 async def clean_pages(dataset_id: int, batch_size: int = 20):
     async with async_session_maker() as session:
-        # Находим все страницы с пустым clean_text по датасету
+        # Находим все страницы с пустым clean_text по датасету. Вне очереди jobs (etl/jobqueue.py):
+        # это разовая дочистка старых записей, новые страницы в предикат не попадают
         result = await session.execute(
             select(Page)
             .where(Page.clean_text.is_(None))
             .where(Page.link.has(dataset_id=dataset_id))
+            .options(*PAGE_CLEAN.options())
             .limit(batch_size)
         )
         pages = result.scalars().all()
@@ -34,8 +35,16 @@ async def clean_pages(dataset_id: int, batch_size: int = 20):
             print("🔍 Нет страниц для чистки.")
             return
 
-        for page in pages:
-            clean = extract_clean_text(page.raw_html)
+        # HTML — только по явному запросу, из хранилища blob-ов (или старой колонки)
+        html = await load_page_html(session, [page.id for page in pages])
+
+        # trafilatura/BeautifulSoup грузят CPU — разбираем пачку параллельно в пуле процессов
+        with make_process_pool() as pool:
+            cleaned = await asyncio.gather(*[
+                run_in_pool(pool, extract_clean_text, html.get(page.id, "")) for page in pages
+            ])
+
+        for page, clean in zip(pages, cleaned):
             if clean:
                 page.clean_text = clean
                 print(f"✅ cleaned: {page.url[:60]}")
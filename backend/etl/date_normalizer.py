@@ -0,0 +1,162 @@
+"""date_normalizer.py
+
+Быстрая нормализация сырых дат правилами, до всякого GPT.
+
+* Скомпилированные шаблоны: ISO, dd.mm.yyyy, yyyy/mm/dd, «12 марта 2024», «March 12, 2024», unix time.
+* Префиксы вида «Updated:», «Опубликовано:» отрезаются.
+* Для каждого домена запоминается шаблон, который сработал последним, — он пробуется первым.
+
+Что не разобралось правилами — остаток для gpt_clean в meta_cleaner.
+"""
+
+import re
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from dateutil import parser as dateparser
+
+PREFIX_RE = re.compile(
+    r'^\s*(updated|published|posted|date|modified|'
+    r'опубликовано|обновлено|дата публикации|дата|изменено)\s*:?\s*',
+    re.I,
+)
+TRAILING_RE = re.compile(r'\s*(г\.|года|год)(?=\s|,|$)', re.I)
+
+MONTHS = {
+    # русский: именительный, родительный, сокращения
+    'январь': 1, 'января': 1, 'янв': 1,
+    'февраль': 2, 'февраля': 2, 'фев': 2, 'февр': 2,
+    'март': 3, 'марта': 3, 'мар': 3,
+    'апрель': 4, 'апреля': 4, 'апр': 4,
+    'май': 5, 'мая': 5,
+    'июнь': 6, 'июня': 6, 'июн': 6,
+    'июль': 7, 'июля': 7, 'июл': 7,
+    'август': 8, 'августа': 8, 'авг': 8,
+    'сентябрь': 9, 'сентября': 9, 'сен': 9, 'сент': 9,
+    'октябрь': 10, 'октября': 10, 'окт': 10,
+    'ноябрь': 11, 'ноября': 11, 'ноя': 11, 'нояб': 11,
+    'декабрь': 12, 'декабря': 12, 'дек': 12,
+    # английский
+    'january': 1, 'jan': 1, 'february': 2, 'feb': 2, 'march': 3, 'mar': 3,
+    'april': 4, 'apr': 4, 'may': 5, 'june': 6, 'jun': 6, 'july': 7, 'jul': 7,
+    'august': 8, 'aug': 8, 'september': 9, 'sep': 9, 'sept': 9,
+    'october': 10, 'oct': 10, 'november': 11, 'nov': 11, 'december': 12, 'dec': 12,
+}
+MONTH_ALT = '|'.join(sorted(MONTHS, key=len, reverse=True))
+TIME = r'(?:[,\s]+(?:в\s+|at\s+)?(?P<H>\d{1,2}):(?P<M>\d{2})(?::(?P<S>\d{2}))?)?'
+
+
+def _build(year, month, day, match):
+    hour = int(match.group('H') or 0) if 'H' in match.re.groupindex else 0
+    minute = int(match.group('M') or 0) if 'M' in match.re.groupindex else 0
+    second = int(match.group('S') or 0) if 'S' in match.re.groupindex else 0
+    return datetime(int(year), int(month), int(day), hour, minute, second)
+
+
+def _iso(m):
+    return datetime.fromisoformat(m.group(0).replace('Z', '+00:00'))
+
+
+def _numeric(m):
+    return _build(m.group('y'), m.group('m'), m.group('d'), m)
+
+
+def _named_month(m):
+    return _build(m.group('y'), MONTHS[m.group('mon').lower().rstrip('.')], m.group('d'), m)
+
+
+def _unix(m):
+    return datetime.fromtimestamp(int(m.group(0)[:10]), tz=timezone.utc)
+
+
+# (имя, шаблон, сборщик) — порядок важен только без кэша домена
+PATTERNS = [
+    ('iso', re.compile(
+        r'^\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?$'), _iso),
+    ('dmy', re.compile(r'^(?P<d>\d{1,2})[./-](?P<m>\d{1,2})[./-](?P<y>\d{4})' + TIME + r'$'), _numeric),
+    ('ymd', re.compile(r'^(?P<y>\d{4})[./](?P<m>\d{1,2})[./](?P<d>\d{1,2})' + TIME + r'$'), _numeric),
+    ('d_month_y', re.compile(
+        r'^(?P<d>\d{1,2})\s+(?P<mon>' + MONTH_ALT + r')\.?,?\s+(?P<y>\d{4})' + TIME + r'$', re.I), _named_month),
+    ('month_d_y', re.compile(
+        r'^(?P<mon>' + MONTH_ALT + r')\.?\s+(?P<d>\d{1,2})(?:st|nd|rd|th)?,?\s+(?P<y>\d{4})' + TIME + r'$', re.I),
+        _named_month),
+    ('unix', re.compile(r'^\d{10}(?:\d{3})?$'), _unix),
+]
+
+YEAR_RE = re.compile(r'\b(19|20)\d{2}\b')
+# dateutil дополняет недостающие части из default; разбор с двумя разными default
+# показывает, были ли в строке год, месяц и день («March 2024» — не дата, а остаток)
+DEFAULTS = (datetime(1900, 1, 1), datetime(1904, 2, 2))
+
+
+def clean_date_string(raw: str) -> str:
+    text = ' '.join(raw.split())
+    text = PREFIX_RE.sub('', text)
+    text = TRAILING_RE.sub('', text)
+    return text.strip(' ,')
+
+
+def domain_of(url) -> str:
+    return urlsplit(url or '').netloc.lower()
+
+
+class DateNormalizer:
+    """Правила + кэш «домен → шаблон»."""
+
+    def __init__(self):
+        self.domain_patterns: dict[str, int] = {}
+        self.stats = {'rules': 0, 'dateutil': 0, 'residue': 0}
+
+    def _try(self, index, text):
+        name, pattern, build = PATTERNS[index]
+        match = pattern.match(text)
+        if not match:
+            return None
+        try:
+            return build(match)
+        except (ValueError, KeyError, OverflowError):
+            return None
+
+    def parse(self, raw, url=None):
+        if not raw or not raw.strip():
+            return None
+        text = clean_date_string(raw)
+        domain = domain_of(url)
+
+        # Сначала шаблон, который уже срабатывал для этого домена
+        cached = self.domain_patterns.get(domain)
+        order = range(len(PATTERNS)) if cached is None else [cached] + [i for i in range(len(PATTERNS)) if i != cached]
+        for index in order:
+            parsed = self._try(index, text)
+            if parsed is not None:
+                self.domain_patterns[domain] = index
+                self.stats['rules'] += 1
+                return _aware(parsed)
+
+        # Последний шанс правилами: dateutil, но только если в строке есть год, месяц и день
+        if YEAR_RE.search(text):
+            try:
+                first, second = (dateparser.parse(text, dayfirst=True, default=d) for d in DEFAULTS)
+            except (ValueError, OverflowError):
+                first = second = None
+            if first is not None and first.date() == second.date():
+                self.stats['dateutil'] += 1
+                return _aware(first)
+
+        self.stats['residue'] += 1
+        return None
+
+    def parse_many(self, rows):
+        """rows: [(id, url, raw_date)] → ({id: datetime}, [(id, raw_date)] остаток)."""
+        parsed, residue = {}, []
+        for row_id, url, raw in rows:
+            value = self.parse(raw, url)
+            if value is None:
+                residue.append((row_id, raw))
+            else:
+                parsed[row_id] = value
+        return parsed, residue
+
+
+def _aware(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
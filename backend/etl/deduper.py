@@ -0,0 +1,307 @@
+"""deduper.py
+
+Поиск почти-дубликатов среди чанков датасета: MinHash + LSH.
+
+* Текст чанка → множество шинглов (SHINGLE_SIZE слов подряд) → MinHash-сигнатура
+  из NUM_PERM хэшей (numpy, пачками в пуле процессов).
+* LSH: сигнатура режется на BANDS полос по ROWS значений; чанки с совпавшей полосой —
+  кандидаты. Сравниваются только кандидаты, а не все пары.
+* Кандидат подтверждается оценкой Jaccard по сигнатурам (≥ threshold) и, если задан
+  cosine, — косинусом эмбеддингов (когда оба вектора уже есть).
+* Группы дублей собираются через union-find; каноническим считается чанк с меньшим id,
+  остальным пишется chunks.duplicate_of. Ничего не удаляется — enricher и embedder
+  просто пропускают помеченные чанки.
+* Потоковый режим (etl/orchestrator.py): load_index один раз читает все чанки датасета
+  и считает их сигнатуры (параллельно со скачиванием), дальше LSHIndex держит их в памяти,
+  и каждая новая пачка сверяется только с ним, без повторного прохода по датасету.
+
+Запуск:
+    python etl/deduper.py <dataset_id> [threshold] [cosine]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+from sqlalchemy import update
+from sqlalchemy.future import select
+
+# Импортируем модели и соединение с БД из централизованных модулей
+from models.models import Chunk, Embedding
+from core.db import async_session_maker
+from etl.jobqueue import skip
+from etl.workers import CPU_WORKERS, make_process_pool, run_in_pool
+from search.numpy_index import bump_version
+
+DEDUP_THRESHOLD = 0.9   # оценка Jaccard по шинглам
+SHINGLE_SIZE = 5        # слов в шингле
+NUM_PERM = 128
+BANDS, ROWS = 16, 8     # BANDS * ROWS == NUM_PERM; порог срабатывания LSH ≈ (1/16)^(1/8) ≈ 0.71
+FETCH_BATCH = 2000      # чанков на один запрос к БД и одну задачу в пул
+UPDATE_BATCH = 1000
+MAX_BUCKET = 200        # в больших корзинах (шаблонный текст) сравниваем только соседей, а не все пары
+
+PRIME = (1 << 61) - 1
+_rnd = np.random.default_rng(20240917)
+# a, b < 2^31: a * x (x < 2^32) + b не переполняет uint64
+PERM_A = _rnd.integers(1, 1 << 31, NUM_PERM, dtype=np.uint64)
+PERM_B = _rnd.integers(0, 1 << 31, NUM_PERM, dtype=np.uint64)
+EMPTY = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+WORD_RE = re.compile(r"\w+")
+
+
+def shingles(text: str) -> np.ndarray:
+    words = WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in set(grams)), dtype=np.uint64)
+
+
+def minhash(text: str) -> np.ndarray:
+    hashes = shingles(text)
+    if not len(hashes):
+        return EMPTY
+    return ((hashes[:, None] * PERM_A + PERM_B) % PRIME).min(axis=0)
+
+
+def minhash_batch(texts) -> np.ndarray:
+    # Вызывается в процессе пула: на вход — пачка текстов, на выход — (len, NUM_PERM)
+    return np.stack([minhash(text) for text in texts]) if texts else np.empty((0, NUM_PERM), np.uint64)
+
+
+def lsh_candidates(signatures: np.ndarray) -> set:
+    """Пары строк (i, j), i < j, у которых совпала хотя бы одна полоса."""
+    pairs = set()
+    for band in range(BANDS):
+        buckets = defaultdict(list)
+        block = signatures[:, band * ROWS:(band + 1) * ROWS]
+        for row, key in enumerate(map(bytes, block)):
+            buckets[key].append(row)
+        for rows in buckets.values():
+            if len(rows) > MAX_BUCKET:
+                pairs.update(zip(rows, rows[1:]))
+            elif len(rows) > 1:
+                pairs.update((rows[i], rows[j]) for i in range(len(rows)) for j in range(i + 1, len(rows)))
+    return pairs
+
+
+def jaccard(signatures: np.ndarray, i: int, j: int) -> float:
+    return float(np.mean(signatures[i] == signatures[j]))
+
+
+class LSHIndex:
+    """Инкрементальный LSH: в индексе только канонические чанки."""
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self.buckets = [defaultdict(list) for _ in range(BANDS)]
+        self.signatures = {}
+
+    @staticmethod
+    def band_keys(signature):
+        return [bytes(signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+    def add(self, chunk_id, signature):
+        self.signatures[chunk_id] = signature
+        for bucket, key in zip(self.buckets, self.band_keys(signature)):
+            if len(bucket[key]) < MAX_BUCKET:
+                bucket[key].append(chunk_id)
+
+    def match(self, signature):
+        """Меньший id известного чанка с Jaccard ≥ threshold или None."""
+        candidates = set()
+        for bucket, key in zip(self.buckets, self.band_keys(signature)):
+            candidates.update(bucket.get(key, ()))
+        matched = [
+            chunk_id for chunk_id in candidates
+            if np.mean(self.signatures[chunk_id] == signature) >= self.threshold
+        ]
+        return min(matched) if matched else None
+
+
+class UnionFind:
+    """Группы дублей. find(x) — меньший id группы: он и будет каноническим чанком.
+
+    Корень дерева выбирается по рангу, а не по id, и find идёт циклом со сжатием пути:
+    длинная цепочка пар (1~2, 2~3, ...) не упирается в предел рекурсии.
+    """
+
+    def __init__(self):
+        self.parent = {}
+        self.rank = {}
+        self.smallest = {}   # корень → меньший id группы
+
+    def _root(self, x):
+        root = self.parent.setdefault(x, x)
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def find(self, x):
+        root = self._root(x)
+        return self.smallest.get(root, root)
+
+    def union(self, x, y):
+        rx, ry = self._root(x), self._root(y)
+        if rx == ry:
+            return
+        if self.rank.get(rx, 0) < self.rank.get(ry, 0):
+            rx, ry = ry, rx
+        self.parent[ry] = rx
+        if self.rank.get(rx, 0) == self.rank.get(ry, 0):
+            self.rank[rx] = self.rank.get(rx, 0) + 1
+        self.smallest[rx] = min(self.smallest.get(rx, rx), self.smallest.pop(ry, ry))
+
+
+async def load_chunks(dataset_id, pool, batch_size=FETCH_BATCH):
+    """(ids, текущие duplicate_of, сигнатуры) всех чанков датасета; keyset по chunks.id."""
+    ids, marked, tasks = [], [], []
+    last_id = 0
+    async with async_session_maker() as session:
+        while True:
+            result = await session.execute(
+                select(Chunk.id, Chunk.chunk_text, Chunk.duplicate_of)
+                .where(Chunk.dataset_id == dataset_id)
+                .where(Chunk.id > last_id)
+                .order_by(Chunk.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            ids += [row.id for row in rows]
+            marked += [row.duplicate_of for row in rows]
+            texts = [row.chunk_text for row in rows]
+            # Сигнатуры считаются в пуле, пока читается следующая пачка
+            tasks.append(asyncio.ensure_future(
+                run_in_pool(pool, minhash_batch, texts) if pool else asyncio.to_thread(minhash_batch, texts)
+            ))
+            last_id = rows[-1].id
+    signatures = np.concatenate(await asyncio.gather(*tasks)) if tasks else np.empty((0, NUM_PERM), np.uint64)
+    return ids, marked, signatures
+
+
+async def load_vectors(chunk_ids):
+    vectors = {}
+    chunk_ids = list(chunk_ids)
+    async with async_session_maker() as session:
+        for i in range(0, len(chunk_ids), FETCH_BATCH):
+            result = await session.execute(
+                select(Embedding.chunk_id, Embedding.vector)
+                .where(Embedding.chunk_id.in_(chunk_ids[i:i + FETCH_BATCH]))
+            )
+            for row in result:
+                vector = np.asarray(row.vector, dtype=np.float32)
+                vectors[row.chunk_id] = vector / (np.linalg.norm(vector) or 1)
+    return vectors
+
+
+async def load_index(dataset_id: int, threshold: float = DEDUP_THRESHOLD, pool=None) -> LSHIndex:
+    index = LSHIndex(threshold)
+    ids, marked, signatures = await load_chunks(dataset_id, pool)
+    for chunk_id, current, signature in zip(ids, marked, signatures):
+        if current is None:
+            index.add(chunk_id, signature)
+    return index
+
+
+async def dedupe_new_chunks(session, dataset_id: int, index: LSHIndex, chunk_ids, pool=None):
+    """Помечает дубли среди новых чанков; возвращает id оставшихся (канонических)."""
+    if not chunk_ids:
+        return []
+    result = await session.execute(
+        select(Chunk.id, Chunk.chunk_text).where(Chunk.id.in_(chunk_ids)).order_by(Chunk.id)
+    )
+    rows = result.all()
+    texts = [row.chunk_text for row in rows]
+    signatures = await run_in_pool(pool, minhash_batch, texts) if pool else await asyncio.to_thread(minhash_batch, texts)
+
+    kept, updates = [], []
+    for row, signature in zip(rows, signatures):
+        canonical = index.match(signature)
+        if canonical is None:
+            index.add(row.id, signature)
+            kept.append(row.id)
+        else:
+            updates.append({"id": row.id, "duplicate_of": canonical})
+    if updates:
+        await session.execute(update(Chunk), updates)
+        await bump_version(session, dataset_id)
+        # Дублям не нужны ни enrich, ни embed — закрываем их задачи в той же транзакции
+        duplicates = [values["id"] for values in updates]
+        await skip(session, "enrich", duplicates)
+        await skip(session, "embed", duplicates)
+        await session.commit()
+    return kept
+
+
+async def dedupe_chunks(dataset_id: int, threshold: float = DEDUP_THRESHOLD, cosine: float | None = None,
+                        workers: int = CPU_WORKERS):
+    pool = make_process_pool(workers) if workers > 1 else None
+    try:
+        ids, marked, signatures = await load_chunks(dataset_id, pool)
+    finally:
+        if pool:
+            pool.shutdown()
+    if not ids:
+        print("🔍 Нет чанков для дедупликации.")
+        return
+    print(f"🔢 Сигнатур: {len(ids)}")
+
+    candidates = lsh_candidates(signatures)
+    pairs = [(i, j) for i, j in candidates if jaccard(signatures, i, j) >= threshold]
+    print(f"🧲 Кандидатов LSH: {len(candidates)}, выше порога Jaccard {threshold}: {len(pairs)}")
+
+    if cosine is not None and pairs:
+        vectors = await load_vectors({ids[i] for pair in pairs for i in pair})
+        before = len(pairs)
+        # Без вектора хотя бы у одного — решает MinHash
+        pairs = [
+            (i, j) for i, j in pairs
+            if ids[i] not in vectors or ids[j] not in vectors
+            or float(vectors[ids[i]] @ vectors[ids[j]]) >= cosine
+        ]
+        print(f"🧭 Подтверждено косинусом ≥ {cosine}: {len(pairs)} из {before}")
+
+    groups = UnionFind()
+    for i, j in pairs:
+        groups.union(ids[i], ids[j])
+
+    # Пересчитываем и старые пометки: дубль мог перестать быть дублем после правки текста
+    updates = []
+    for chunk_id, current in zip(ids, marked):
+        canonical = groups.find(chunk_id) if chunk_id in groups.parent else chunk_id
+        value = canonical if canonical != chunk_id else None
+        if current != value:
+            updates.append({"id": chunk_id, "duplicate_of": value})
+
+    async with async_session_maker() as session:
+        for i in range(0, len(updates), UPDATE_BATCH):
+            await session.execute(update(Chunk), updates[i:i + UPDATE_BATCH])
+        if updates:
+            await bump_version(session, dataset_id)
+        await session.commit()
+
+    duplicates = sum(1 for chunk_id in groups.parent if groups.find(chunk_id) != chunk_id)
+    print(f"🏁 Групп дублей: {len({groups.find(x) for x in groups.parent})}, помечено дублей: {duplicates}, "
+          f"изменено строк: {len(updates)}")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("❗ Укажи dataset_id")
+        sys.exit(1)
+
+    dataset_id = int(sys.argv[1])
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else DEDUP_THRESHOLD
+    cosine = float(sys.argv[3]) if len(sys.argv) > 3 else None
+    asyncio.run(dedupe_chunks(dataset_id, threshold, cosine))
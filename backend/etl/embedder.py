@@ -3,22 +3,39 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import asyncio
-import os
+import time
 from dotenv import load_dotenv
-from sqlalchemy.orm import selectinload
-from sqlalchemy import select
+from sqlalchemy import exists, select
+from sqlalchemy.dialects.postgresql import insert
 from openai import AsyncOpenAI
 
 # Импортируем модели и соединение с БД из централизованных модулей
-from models.models import Chunk, Embedding, DatasetSettings, Page, Link
+from models.models import Chunk, Dataset, Embedding, DatasetSettings
+from models.profiles import SETTINGS_EMBED
 from core.db import async_session_maker
+from etl.embedding_backends import make_backend
+from etl.embedding_cache import CacheStats, input_hash, lookup_vectors, store_vectors
+from etl.jobqueue import complete, finish, iter_claimed, release, seed
+from etl.llm import estimate_tokens
+from etl.workers import run_supervised
+from search.numpy_index import bump_version
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+# Повторы делаем сами (etl/llm.py), встроенные в SDK отключаем
+client = AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+
+# Без переопределения берутся значения бэкенда (etl/embedding_backends.py)
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "0")) or None   # пакетов в работе одновременно
+# Пакет набирается по токенам, а не по числу чанков (лимит API — 2048 входов и ~300k токенов)
+BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "0")) or None
+BATCH_MAX_INPUTS = 2048
+FETCH_BATCH = 1000  # кандидатов на один запрос к БД
+WRITE_BATCH = 500   # строк в одном INSERT ... VALUES (...), (...)
+LOOKUP_BATCH = 500  # хэшей на один запрос к кэшу эмбеддингов
 
-async def build_input(chunk: Chunk, settings: DatasetSettings):
+def build_input(chunk, settings: DatasetSettings):
     parts = [chunk.chunk_text]
     if getattr(settings, "use_author", False) and chunk.clean_author:
         parts.append(f"Author: {chunk.clean_author}")
@@ -26,41 +43,246 @@ async def build_input(chunk: Chunk, settings: DatasetSettings):
         parts.append(f"Summary: {chunk.summary}")
     return "\n".join(parts)
 
-async def embedder(dataset_id: int, batch_size: int = 50):
+def pending_chunks(dataset_id: int, *columns):
+    # Чанки датасета без эмбеддингов (кроме дублей): ix_chunks_canonical + NOT EXISTS по ключу embeddings
+    return (
+        select(*columns)
+        .where(Chunk.dataset_id == dataset_id)
+        .where(~exists().where(Embedding.chunk_id == Chunk.id))
+        .where(Chunk.duplicate_of.is_(None))
+    )
+
+async def iter_candidates(dataset_id: int, settings, batch_size=FETCH_BATCH, chunk_ids=None):
+    # → (chunk_id, input); keyset по chunks.id, читаются только нужные колонки
+    last_id = 0
+    async with async_session_maker() as session:
+        while True:
+            query = (
+                pending_chunks(dataset_id, Chunk.id, Chunk.chunk_text, Chunk.clean_author, Chunk.summary)
+                .where(Chunk.id > last_id)
+                .order_by(Chunk.id)
+                .limit(batch_size)
+            )
+            if chunk_ids is not None:
+                query = query.where(Chunk.id.in_(chunk_ids))
+            result = await session.execute(query)
+            rows = result.all()
+            if not rows:
+                return
+            for row in rows:
+                yield row.id, build_input(row, settings)
+            last_id = rows[-1].id
+
+async def iter_claimed_candidates(dataset_id: int, settings, chunk_ids=None):
+    # Кандидаты по захваченным задачам embed (etl/jobqueue.py): параллельный воркер их не получит
+    async for claimed in iter_claimed("embed", dataset_id, FETCH_BATCH, chunk_ids):
+        items = [item async for item in iter_candidates(dataset_id, settings, chunk_ids=claimed)]
+        # Уже векторизованные или помеченные дублями — работы нет, задачу закрываем
+        await finish("embed", set(claimed) - {chunk_id for chunk_id, _ in items})
+        for item in items:
+            yield item
+
+async def iter_streamed_candidates(dataset_id: int, settings, chunk_id_batches):
+    # Потоковый режим (etl/orchestrator.py): id новых чанков приходят пачками по мере чанкирования
+    async for chunk_ids in chunk_id_batches:
+        async for item in iter_claimed_candidates(dataset_id, settings, chunk_ids):
+            yield item
+
+async def split_cached(items, lookup, stats, results, followers, group_size=LOOKUP_BATCH):
+    """Попадания в кэш сразу уходят писателю; дальше по конвейеру идут только новые входы.
+    Повтор входа, который уже отправлен в API, ждёт его ответа в followers."""
+    group = []
+
+    async def flush():
+        hashes = [input_hash(text) for _, text in group]
+        cached = await lookup(list(set(hashes))) if lookup else {}
+        hits = []
+        for (chunk_id, text), h in zip(group, hashes):
+            if h in cached:
+                stats.hit(text)
+                hits.append({"chunk_id": chunk_id, "input": text, "vector": cached[h]})
+            elif h in followers:
+                stats.hit(text)
+                followers[h].append(chunk_id)
+            else:
+                stats.miss()
+                followers[h] = []
+                yield chunk_id, text
+        if hits:
+            await results.put((hits, {}))
+
+    async for item in items:
+        group.append(item)
+        if len(group) >= group_size:
+            async for miss in flush():
+                yield miss
+            group = []
+    if group:
+        async for miss in flush():
+            yield miss
+
+async def pack_batches(items, budget, max_inputs=BATCH_MAX_INPUTS):
+    batch, used = [], 0
+    async for chunk_id, text in items:
+        tokens = estimate_tokens(text)
+        if batch and (used + tokens > budget or len(batch) >= max_inputs):
+            yield batch, used
+            batch, used = [], 0
+        batch.append((chunk_id, text))
+        used += tokens
+    if batch:
+        yield batch, used
+
+async def embed_batch(backend, batch, tokens):
+    vectors = await backend.embed([text for _, text in batch], tokens)
+    return [
+        {"chunk_id": chunk_id, "input": text, "vector": vector}
+        for (chunk_id, text), vector in zip(batch, vectors)
+    ]
+
+async def write_embeddings(session, dataset_id, model, rows, fresh):
+    # Многострочный INSERT; уже векторизованные (параллельный запуск) тихо пропускаются
+    await store_vectors(session, model, fresh)
+    for i in range(0, len(rows), WRITE_BATCH):
+        await session.execute(
+            insert(Embedding)
+            .values([{**row, "dataset_id": dataset_id} for row in rows[i:i + WRITE_BATCH]])
+            .on_conflict_do_nothing(index_elements=[Embedding.chunk_id])
+        )
+    if rows:
+        await bump_version(session, dataset_id)
+    # Задачи embed закрываются вместе с векторами; упавшие пакеты уходят на повтор через release()
+    await complete(session, "embed", [row["chunk_id"] for row in rows])
+    await session.commit()
+
+async def embed_worker(queue, results, followers, backend, on_error=None):
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        batch, tokens = item
+        try:
+            rows = await embed_batch(backend, batch, tokens)
+        except Exception as e:
+            # Чанки (и их повторы) остаются без векторов; on_error отправляет их задачи на повтор
+            print(f"❌ Embedding error для {len(batch)} чанков: {e}")
+            chunk_ids = [chunk_id for chunk_id, _ in batch]
+            for _, text in batch:
+                chunk_ids += followers.pop(input_hash(text), [])
+            if on_error:
+                await on_error(chunk_ids, str(e))
+            continue
+
+        fresh = {}
+        for row in list(rows):
+            h = input_hash(row["input"])
+            fresh[h] = row["vector"]
+            rows += [{**row, "chunk_id": chunk_id} for chunk_id in followers.pop(h, [])]
+        await results.put((rows, fresh))
+
+async def results_writer(results, write):
+    done = 0
+    while True:
+        item = await results.get()
+        if item is None:
+            return done
+        rows, fresh = item
+        # Всё, что успело накопиться, пишем одним заходом
+        while not results.empty() and len(rows) < WRITE_BATCH:
+            more = results.get_nowait()
+            if more is None:
+                await write(rows, fresh)
+                return done + len(rows)
+            rows += more[0]
+            fresh = {**fresh, **more[1]}
+        await write(rows, fresh)
+        done += len(rows)
+        print(f"✅ {done} векторизовано")
+
+async def run_pipeline(items, write, backend, concurrency=None, batch_tokens=None, lookup=None, stats=None,
+                       on_error=None):
+    """items → кэш → пакеты по токенам → concurrency пакетов в бэкенде → write(rows, fresh).
+    Стадии работают одновременно; lookup(hashes) → {hash: vector} — кэш эмбеддингов,
+    on_error(chunk_ids, error) — о чанках упавшего пакета."""
+    concurrency = concurrency or backend.concurrency
+    batch_tokens = batch_tokens or backend.batch_tokens
+    stats = stats if stats is not None else CacheStats()
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    results = asyncio.Queue(maxsize=concurrency * 2)
+    followers = {}
+
+    workers = [
+        asyncio.create_task(embed_worker(queue, results, followers, backend, on_error))
+        for _ in range(concurrency)
+    ]
+    writer = asyncio.create_task(results_writer(results, write))
+
+    async def drive():
+        misses = split_cached(items, lookup, stats, results, followers)
+        async for batch, tokens in pack_batches(misses, batch_tokens):
+            await queue.put((batch, tokens))
+
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        await results.put(None)
+        return stats.hits + stats.misses, await writer
+
+    # Упавший write() не должен оставить воркеров и подачу висеть на полных очередях
+    return await run_supervised(drive(), [*workers, writer])
+
+async def embedder(dataset_id: int, concurrency: int | None = EMBED_CONCURRENCY, batch_tokens: int | None = BATCH_TOKENS,
+                   chunk_id_batches=None):
     async with async_session_maker() as session:
         # Получаем настройки
         settings_q = await session.execute(
-            select(DatasetSettings).where(DatasetSettings.dataset_id == dataset_id)
+            select(DatasetSettings)
+            .where(DatasetSettings.dataset_id == dataset_id)
+            .options(*SETTINGS_EMBED.options())
         )
         settings = settings_q.scalar_one_or_none()
-        embedding_model = "text-embedding-3-small"
-
-        # Чанки без эмбеддингов
-        result = await session.execute(
-            select(Chunk)
-            .options(selectinload(Chunk.page).selectinload(Page.link))
-            .where(~Chunk.id.in_(select(Embedding.chunk_id)))
+        embedding_settings = await session.scalar(
+            select(Dataset.embedding_settings).where(Dataset.id == dataset_id)
         )
-        all_chunks = [c for c in result.scalars() if c.page.link.dataset_id == dataset_id]
-        total = len(all_chunks)
-        print(f"🤖 Чанков без векторов: {total}")
-
-        for i in range(0, total, batch_size):
-            batch = all_chunks[i:i+batch_size]
-            inputs = [await build_input(chunk, settings) for chunk in batch]
-            response = await client.embeddings.create(input=inputs, model=embedding_model)
-            vectors = [v.embedding for v in response.data]
-
-            for chunk, inp, vec in zip(batch, inputs, vectors):
-                session.add(Embedding(
-                    chunk_id=chunk.id,
-                    input=inp,
-                    vector=vec
-                ))
+
+    backend = make_backend(embedding_settings, client)
+    print(f"🤖 Бэкенд: {backend.name}, модель: {backend.model}, размерность: {backend.dimensions or 'по умолчанию'}")
+
+    started = time.perf_counter()
+    stats = CacheStats()
+    key = backend.cache_key
+    if chunk_id_batches is None:
+        async with async_session_maker() as session:
+            await seed(session, "embed", dataset_id, pending_chunks(dataset_id, Chunk.id))
             await session.commit()
-            print(f"✅ {i + len(batch)}/{total} векторизовано")
+        items = iter_claimed_candidates(dataset_id, settings)
+    else:
+        items = iter_streamed_candidates(dataset_id, settings, chunk_id_batches)
+    try:
+        async with async_session_maker() as write_session, async_session_maker() as lookup_session:
+            total, done = await run_pipeline(
+                items,
+                lambda rows, fresh: write_embeddings(write_session, dataset_id, key, rows, fresh),
+                backend,
+                concurrency=concurrency,
+                batch_tokens=batch_tokens,
+                lookup=lambda hashes: lookup_vectors(lookup_session, key, hashes),
+                stats=stats,
+                on_error=lambda chunk_ids, error: release("embed", chunk_ids, error),
+            )
+    finally:
+        await backend.close()
+
+    if not total:
+        print("🔍 Нет чанков без векторов.")
+        return 0
+    elapsed = time.perf_counter() - started
+    print(f"🏁 Векторизовано {done} из {total} за {elapsed:.1f} c ({done / elapsed:.1f} векторов/с)")
+    print(stats.report())
+    return done
 
 if __name__ == "__main__":
-    import sys
     dataset_id = int(sys.argv[1]) if len(sys.argv) > 1 else 1
-    asyncio.run(embedder(dataset_id))
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else EMBED_CONCURRENCY
+    batch_tokens = int(sys.argv[3]) if len(sys.argv) > 3 else BATCH_TOKENS
+    asyncio.run(embedder(dataset_id, concurrency, batch_tokens))
@@ -0,0 +1,165 @@
+"""embedding_backends.py
+
+Бэкенды векторизации для etl/embedder.py.
+
+* OpenAIBackend — embeddings API (лимиты и повторы из etl/llm.py);
+* LocalBackend  — sentence-transformers в этом же процессе, на CPU, без сети.
+  Запросы от всех воркеров конвейера склеиваются в общие пакеты (динамический батчинг),
+  модель считает в отдельном потоке и не блокирует event loop.
+
+Бэкенд выбирается по Dataset.embedding_settings:
+
+    {"backend": "local", "model": "intfloat/multilingual-e5-small", "batch_size": 64, "device": "cpu"}
+    {"backend": "openai", "model": "text-embedding-3-small", "dimensions": 512}
+
+Без настроек — OpenAI text-embedding-3-small, 1536 измерений.
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+from etl.llm import RateLimiter, with_retries
+
+DEFAULT_BACKEND = "openai"
+DEFAULT_OPENAI_MODEL = "text-embedding-3-small"
+DEFAULT_LOCAL_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+LOCAL_BATCH_SIZE = 64
+LOCAL_MAX_WAIT = 0.01  # секунд ждём попутчиков для пакета модели
+
+
+class EmbeddingBackend(ABC):
+    """Общий интерфейс: embed(texts) → векторы в том же порядке."""
+
+    name = "base"
+    # Настройки конвейера по умолчанию для бэкенда
+    concurrency = 1
+    batch_tokens = 8000
+
+    def __init__(self, model: str, dimensions: int | None = None):
+        self.model = model
+        self.dimensions = dimensions
+
+    @property
+    def cache_key(self) -> str:
+        # Ключ в embedding_cache: одна модель с разной размерностью — разные векторы
+        return f"{self.model}:{self.dimensions}" if self.dimensions else self.model
+
+    @abstractmethod
+    async def embed(self, texts: list[str], tokens: int = 0) -> list[list[float]]:
+        ...
+
+    async def close(self):
+        pass
+
+
+class OpenAIBackend(EmbeddingBackend):
+    name = "openai"
+    concurrency = 4
+    batch_tokens = 8000
+
+    def __init__(self, client, model: str = DEFAULT_OPENAI_MODEL, dimensions: int | None = None, limiter=None):
+        super().__init__(model, dimensions)
+        self.client = client
+        self.limiter = limiter or RateLimiter()
+
+    async def embed(self, texts, tokens=0):
+        await self.limiter.acquire(tokens)
+        params = {"input": texts, "model": self.model}
+        if self.dimensions:
+            params["dimensions"] = self.dimensions
+        response = await with_retries(lambda: self.client.embeddings.create(**params))
+        # Порядок в ответе гарантирован полем index
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+class LocalBackend(EmbeddingBackend):
+    name = "local"
+    concurrency = 4        # воркеров конвейера; в модель всё равно идёт один пакет за раз
+    batch_tokens = 4000
+
+    def __init__(self, model: str = DEFAULT_LOCAL_MODEL, dimensions: int | None = None,
+                 batch_size: int = LOCAL_BATCH_SIZE, device: str = "cpu"):
+        super().__init__(model, dimensions)
+        self.batch_size = batch_size
+        self.device = device
+        self._model = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._queue = None
+        self._batcher = None
+
+    def _load(self):
+        if self._model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError as e:
+                raise RuntimeError("Для локального бэкенда нужен пакет sentence-transformers") from e
+            # truncate_dim обрезает Matryoshka-векторы до размерности датасета
+            self._model = SentenceTransformer(self.model, device=self.device, truncate_dim=self.dimensions)
+        return self._model
+
+    def _encode(self, texts):
+        vectors = self._load().encode(texts, batch_size=self.batch_size, normalize_embeddings=True)
+        return vectors.tolist()
+
+    async def embed(self, texts, tokens=0):
+        if self._batcher is None:
+            self._queue = asyncio.Queue()
+            self._batcher = asyncio.create_task(self._run_batcher())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _run_batcher(self):
+        # Склеиваем запросы разных воркеров в пакеты по batch_size текстов
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            size = len(pending[0][0])
+            deadline = loop.time() + LOCAL_MAX_WAIT
+            while size < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            texts = [text for batch, _ in pending for text in batch]
+            try:
+                vectors = await loop.run_in_executor(self._executor, self._encode, texts)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            start = 0
+            for batch, future in pending:
+                if not future.done():
+                    future.set_result(vectors[start:start + len(batch)])
+                start += len(batch)
+
+    async def close(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            self._batcher = None
+        self._executor.shutdown(wait=False)
+
+
+def make_backend(embedding_settings: dict | None, client=None) -> EmbeddingBackend:
+    settings = embedding_settings or {}
+    backend = settings.get("backend", DEFAULT_BACKEND)
+    dimensions = settings.get("dimensions")
+    if backend == "openai":
+        return OpenAIBackend(client, settings.get("model", DEFAULT_OPENAI_MODEL), dimensions)
+    if backend == "local":
+        return LocalBackend(
+            settings.get("model", DEFAULT_LOCAL_MODEL),
+            dimensions,
+            batch_size=settings.get("batch_size", LOCAL_BATCH_SIZE),
+            device=settings.get("device", "cpu"),
+        )
+    raise ValueError(f"Неизвестный бэкенд эмбеддингов: {backend}")
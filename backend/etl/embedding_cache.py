@@ -0,0 +1,65 @@
+"""embedding_cache.py
+
+Кэш векторов в таблице embedding_cache, ключ — (model, sha256(input)).
+
+Одинаковые входы (перепечатки, футеры, повторяющиеся чанки) векторизуются
+один раз — в том числе между датасетами и между запусками. Остальное —
+счётчики попаданий и сэкономленных токенов для отчёта.
+"""
+
+import hashlib
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from etl.llm import estimate_tokens
+from models.models import EmbeddingCache
+
+STORE_BATCH = 500
+
+
+def input_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+    def hit(self, text: str):
+        self.hits += 1
+        self.tokens_saved += estimate_tokens(text)
+
+    def miss(self):
+        self.misses += 1
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        ratio = self.hits / total if total else 0
+        return (f"🗄️ Кэш эмбеддингов: hit {self.hits}, miss {self.misses} ({ratio:.0%} попаданий), "
+                f"сэкономлено ~{self.tokens_saved} токенов")
+
+
+async def lookup_vectors(session, model: str, hashes) -> dict:
+    """{input_hash: vector} для уже известных входов."""
+    if not hashes:
+        return {}
+    result = await session.execute(
+        select(EmbeddingCache.input_hash, EmbeddingCache.vector)
+        .where(EmbeddingCache.model == model)
+        .where(EmbeddingCache.input_hash.in_(hashes))
+    )
+    return {row.input_hash: row.vector for row in result}
+
+
+async def store_vectors(session, model: str, fresh: dict):
+    # Без commit — пишется в одной транзакции с эмбеддингами
+    rows = [{"model": model, "input_hash": h, "vector": vector} for h, vector in fresh.items()]
+    for i in range(0, len(rows), STORE_BATCH):
+        await session.execute(
+            insert(EmbeddingCache)
+            .values(rows[i:i + STORE_BATCH])
+            .on_conflict_do_nothing(index_elements=[EmbeddingCache.model, EmbeddingCache.input_hash])
+        )
@@ -4,12 +4,20 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import asyncio
 import json
+import re
 from dotenv import load_dotenv
+from sqlalchemy import update
 from sqlalchemy.future import select
 
 # Импортируем модели и соединение с БД из централизованных модулей
-from models.models import Chunk, Page, Link, DatasetSettings
+from models.models import Chunk, DatasetSettings
+from models.profiles import SETTINGS_LLM
 from core.db import async_session_maker
+from etl.jobqueue import complete, fail, finish, iter_claimed, seed
+from etl.llm import RateLimiter, chat_completion, estimate_tokens, is_retryable
+from etl.workers import run_supervised
+from etl.llm_cache import cache
+from search.numpy_index import bump_version
 from openai import AsyncOpenAI
 
 # 🌍 ENV
@@ -17,9 +25,47 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 # 🚀 INIT
-client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+# Повторы делаем сами (etl/llm.py), встроенные в SDK отключаем
+client = AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0)
 
-async def enrich_chunk(chunk, summary_prompt, gpt_model, session):
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", "8"))
+FETCH_BATCH = 100   # чанков на один запрос к БД
+COMMIT_EVERY = 20   # результатов на один commit (чекпоинт)
+MAX_TOKENS = 300
+# Пакетный режим: несколько чанков в одном запросе, пока влезают в бюджет токенов (0 — по одному)
+BATCH_TOKENS = int(os.getenv("ENRICH_BATCH_TOKENS", "2000"))
+BATCH_MAX_CHUNKS = 10
+BATCH_MAX_OUTPUT = 3000
+
+def assess_quality(summary, topics):
+    # ✅ Проверка качества
+    if not summary or len(summary.split()) < 10:
+        return "needs_review"
+    if not topics or all(len(t) < 3 for t in topics):
+        return "needs_review"
+    if summary.lower().startswith(("в этом тексте", "данный текст")):
+        return "needs_review"
+    return "ok"
+
+def parse_fields(item):
+    """(summary, topics) из объекта ответа или None: summary — строка, topics — список строк."""
+    if not isinstance(item, dict):
+        return None
+    summary = item.get("summary")
+    topics = item.get("topics") or []
+    if not isinstance(summary, str) or not isinstance(topics, list) or not all(isinstance(t, str) for t in topics):
+        return None
+    return summary.strip(), topics
+
+def parse_reply(content):
+    # None — пустой ответ (фильтр, tool call), не JSON или поля не той формы
+    try:
+        return parse_fields(json.loads(content))
+    except (json.JSONDecodeError, TypeError):
+        return None
+
+async def enrich_chunk(chunk, summary_prompt, gpt_model, limiter):
+    """Возвращает поля для обновления чанка или {"id", "retry": ошибка}, если запрос стоит повторить."""
     prompt = f"""{summary_prompt}
 
 Вот текст:
@@ -32,79 +78,276 @@ async def enrich_chunk(chunk, summary_prompt, gpt_model, session):
 }}"""
 
     try:
-        response = await client.chat.completions.create(
+        content = await chat_completion(
+            client,
             model=gpt_model,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.3,
-            max_tokens=300,
+            max_tokens=MAX_TOKENS,
+            limiter=limiter,
+            validate=lambda reply: parse_reply(reply) is not None,
         )
-        content = response.choices[0].message.content
-        try:
-            parsed = json.loads(content)
-        except json.JSONDecodeError:
-            print(f"❌ JSON decode error в chunk {chunk.id}:\n{content}")
-            chunk.quality = "needs_review"
-            session.add(chunk)
-            return
+    except Exception as e:
+        print(f"❌ GPT error в chunk {chunk.id}: {e}")
+        if is_retryable(e):
+            return {"id": chunk.id, "retry": str(e)}
+        return {"id": chunk.id, "quality": "needs_review"}
 
-        summary = parsed.get("summary", "").strip()
-        topics = parsed.get("topics", [])
+    fields = parse_reply(content)
+    if fields is None:
+        print(f"❌ JSON decode error в chunk {chunk.id}:\n{content}")
+        return {"id": chunk.id, "quality": "needs_review"}
+    summary, topics = fields
 
-        chunk.summary = summary
-        chunk.chunk_meta_data = {
-            **(chunk.chunk_meta_data or {}),
-            "topics": topics
-        }
+    quality = assess_quality(summary, topics)
+    print(f"✅ enriched chunk {chunk.id}, quality = {quality}")
+    return {
+        "id": chunk.id,
+        "summary": summary,
+        "chunk_meta_data": {**(chunk.chunk_meta_data or {}), "topics": topics},
+        "quality": quality,
+    }
 
-        # ✅ Проверка качества
-        if not summary or len(summary.split()) < 10:
-            chunk.quality = "needs_review"
-        elif not topics or all(len(t) < 3 for t in topics):
-            chunk.quality = "needs_review"
-        elif summary.lower().startswith(("в этом тексте", "данный текст")):
-            chunk.quality = "needs_review"
-        else:
-            chunk.quality = "ok"
+def build_batch_prompt(chunks, summary_prompt):
+    parts = [
+        summary_prompt,
+        "",
+        "Ниже несколько фрагментов текста, у каждого свой chunk_id. Обработай каждый фрагмент отдельно.",
+    ]
+    for chunk in chunks:
+        parts += ["", f"### chunk_id={chunk.id}", chunk.chunk_text]
+    parts += [
+        "",
+        "Ответь JSON-массивом, по одному объекту на каждый фрагмент:",
+        '[{"chunk_id": 1, "summary": "...", "topics": ["...", "..."]}]',
+    ]
+    return "\n".join(parts)
 
-        session.add(chunk)
-        print(f"✅ enriched chunk {chunk.id}, quality = {chunk.quality}")
+def parse_batch_reply(content, chunks):
+    """Разбирает ответ на пакет: {chunk_id: (summary, topics)} только для валидных элементов."""
+    match = re.search(r"\[.*\]", content or "", re.S)
+    try:
+        items = json.loads(match.group(0) if match else content)
+    except (json.JSONDecodeError, TypeError):
+        return {}
+    if isinstance(items, dict):
+        items = items.get("results") or items.get("chunks") or []
+    if not isinstance(items, list):
+        return {}
 
+    expected = {chunk.id for chunk in chunks}
+    parsed = {}
+    for item in items:
+        fields = parse_fields(item)
+        if fields is None:
+            continue
+        try:
+            chunk_id = int(item.get("chunk_id"))
+        except (TypeError, ValueError):
+            continue
+        if chunk_id in expected:
+            parsed[chunk_id] = fields
+    return parsed
+
+async def enrich_batch(chunks, summary_prompt, gpt_model, limiter):
+    """Один запрос на пакет; чанки без валидного ответа догоняются поштучно."""
+    if len(chunks) == 1:
+        return [await enrich_chunk(chunks[0], summary_prompt, gpt_model, limiter)]
+
+    prompt = build_batch_prompt(chunks, summary_prompt)
+    max_tokens = min(BATCH_MAX_OUTPUT, MAX_TOKENS * len(chunks))
+    try:
+        content = await chat_completion(
+            client,
+            model=gpt_model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+            max_tokens=max_tokens,
+            limiter=limiter,
+            # Кэшируем только ответ на весь пакет: частичный догоняется поштучно
+            validate=lambda reply: len(parse_batch_reply(reply, chunks)) == len(chunks),
+        )
+        parsed = parse_batch_reply(content, chunks)
     except Exception as e:
-        print(f"❌ GPT error в chunk {chunk.id}: {e}")
-        chunk.quality = "needs_review"
-        session.add(chunk)
+        print(f"❌ GPT error в пакете {[c.id for c in chunks]}: {e}")
+        parsed = {}
 
-async def enrich_chunks(dataset_id: int, batch_size: int = 10):
+    results = []
+    leftovers = []
+    for chunk in chunks:
+        if chunk.id not in parsed:
+            leftovers.append(chunk)
+            continue
+        summary, topics = parsed[chunk.id]
+        results.append({
+            "id": chunk.id,
+            "summary": summary,
+            "chunk_meta_data": {**(chunk.chunk_meta_data or {}), "topics": topics},
+            "quality": assess_quality(summary, topics),
+        })
+    print(f"✅ enriched пакет из {len(chunks)}, без ответа: {len(leftovers)}")
+
+    for chunk in leftovers:
+        results.append(await enrich_chunk(chunk, summary_prompt, gpt_model, limiter))
+    return results
+
+async def pack_batches(chunks, budget, max_chunks=BATCH_MAX_CHUNKS):
+    # Общий промпт оплачиваем один раз на пакет; длинные чанки уходят поодиночке
+    batch, used = [], 0
+    async for chunk in chunks:
+        tokens = estimate_tokens(chunk.chunk_text)
+        if batch and (used + tokens > budget or len(batch) >= max_chunks):
+            yield batch
+            batch, used = [], 0
+        batch.append(chunk)
+        used += tokens
+    if batch:
+        yield batch
+
+def pending_chunks(dataset_id, *columns):
+    # Чанки без summary, которые ещё не отправлены на ревью и не помечены дублями —
+    # ровно условие частичного индекса ix_chunks_pending_enrich
+    return (
+        select(*columns)
+        .where(Chunk.dataset_id == dataset_id)
+        .where(Chunk.summary.is_(None))
+        .where(Chunk.quality.is_(None))
+        .where(Chunk.duplicate_of.is_(None))
+    )
+
+async def iter_pending_chunks(dataset_id, batch_size=FETCH_BATCH, chunk_ids=None):
+    # Keyset по chunks.id; прогресс пишется в БД, поэтому прерванный запуск продолжается с того же места
+    last_id = 0
+    async with async_session_maker() as session:
+        while True:
+            query = (
+                pending_chunks(dataset_id, Chunk.id, Chunk.chunk_text, Chunk.chunk_meta_data)
+                .where(Chunk.id > last_id)
+                .order_by(Chunk.id)
+                .limit(batch_size)
+            )
+            if chunk_ids is not None:
+                query = query.where(Chunk.id.in_(chunk_ids))
+            result = await session.execute(query)
+            rows = result.all()
+            if not rows:
+                return
+            for row in rows:
+                yield row
+            last_id = rows[-1].id
+
+async def iter_claimed_chunks(dataset_id, chunk_ids=None):
+    # Чанки по захваченным задачам enrich (etl/jobqueue.py): параллельный воркер их не получит.
+    # Новая пачка захватывается, только когда конвейер дочитал предыдущую.
+    async for claimed in iter_claimed("enrich", dataset_id, FETCH_BATCH, chunk_ids):
+        rows = [row async for row in iter_pending_chunks(dataset_id, chunk_ids=claimed)]
+        # Уже обогащённые или помеченные дублями — работы нет, задачу закрываем
+        await finish("enrich", set(claimed) - {row.id for row in rows})
+        for row in rows:
+            yield row
+
+async def iter_streamed_chunks(dataset_id, chunk_id_batches):
+    # Потоковый режим (etl/orchestrator.py): id новых чанков приходят пачками по мере чанкирования
+    async for chunk_ids in chunk_id_batches:
+        async for row in iter_claimed_chunks(dataset_id, chunk_ids):
+            yield row
+
+async def enrich_worker(queue, results, summary_prompt, gpt_model, limiter):
+    while True:
+        batch = await queue.get()
+        if batch is None:
+            return
+        for update_values in await enrich_batch(batch, summary_prompt, gpt_model, limiter):
+            await results.put(update_values)
+
+async def results_writer(dataset_id, results):
+    # Единственный писатель: копит результаты и коммитит пачками — это и есть чекпоинт
+    done = 0
+    async with async_session_maker() as session:
+        stop = False
+        while not stop:
+            item = await results.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < COMMIT_EVERY and not results.empty():
+                item = results.get_nowait()
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            # Повторяемые ошибки API чанк не трогают: задача уходит на повтор с задержкой
+            retry = [values for values in batch if "retry" in values]
+            batch = [values for values in batch if "retry" not in values]
+            for values in retry:
+                await fail(session, "enrich", [values["id"]], values["retry"])
+            # Разные наборы полей (успех / ошибка) — отдельными executemany
+            for keys in {tuple(sorted(values)) for values in batch}:
+                rows = [values for values in batch if tuple(sorted(values)) == keys]
+                await session.execute(update(Chunk), rows)
+            if batch:
+                await bump_version(session, dataset_id)
+            # Задачи закрываются в одной транзакции с результатом
+            await complete(session, "enrich", [values["id"] for values in batch])
+            await session.commit()
+            done += len(batch)
+            print(f"💾 Сохранено: {done}")
+    return done
+
+async def enrich_chunks(dataset_id: int, concurrency: int = ENRICH_CONCURRENCY, batch_tokens: int = BATCH_TOKENS,
+                        chunk_id_batches=None):
     async with async_session_maker() as session:
         # Загружаем настройки
         settings_result = await session.execute(
-            select(DatasetSettings).where(DatasetSettings.dataset_id == dataset_id)
+            select(DatasetSettings)
+            .where(DatasetSettings.dataset_id == dataset_id)
+            .options(*SETTINGS_LLM.options())
         )
         settings = settings_result.scalar_one_or_none()
-        if not settings:
-            print(f"❌ Настройки не найдены для dataset_id={dataset_id}")
-            return
+    if not settings:
+        print(f"❌ Настройки не найдены для dataset_id={dataset_id}")
+        return 0
 
-        # Загружаем чанки без summary
-        result = await session.execute(
-            select(Chunk)
-            .join(Chunk.page)
-            .join(Page.link)
-            .where(Link.dataset_id == dataset_id)
-            .where(Chunk.summary.is_(None))
-            .limit(batch_size)
-        )
-        chunks = result.scalars().all()
+    limiter = RateLimiter()
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    results = asyncio.Queue()
 
-        if not chunks:
-            print("🔍 Нет чанков для enrichment.")
-            return
+    workers = [
+        asyncio.create_task(enrich_worker(queue, results, settings.summary_prompt, settings.gpt_model, limiter))
+        for _ in range(concurrency)
+    ]
+    writer = asyncio.create_task(results_writer(dataset_id, results))
+
+    if chunk_id_batches is None:
+        async with async_session_maker() as session:
+            await seed(session, "enrich", dataset_id, pending_chunks(dataset_id, Chunk.id))
+            await session.commit()
+        chunks = iter_claimed_chunks(dataset_id)
+    else:
+        chunks = iter_streamed_chunks(dataset_id, chunk_id_batches)
+
+    async def drive():
+        total = 0
+        async for batch in pack_batches(chunks, batch_tokens):
+            await queue.put(batch)
+            total += len(batch)
+
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        await results.put(None)
+        return total, await writer
 
-        for chunk in chunks:
-            await enrich_chunk(chunk, settings.summary_prompt, settings.gpt_model, session)
+    # Упавший воркер или писатель не должен оставить подачу висеть на полной очереди
+    total, done = await run_supervised(drive(), [*workers, writer])
 
-        await session.commit()
-        print("🏁 Обогащение завершено!")
+    if not total:
+        print("🔍 Нет чанков для enrichment.")
+        return 0
+    print(f"🏁 Обогащение завершено! Обработано {done} из {total}")
+    print(cache.report())
+    return done
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
@@ -112,4 +355,6 @@ if __name__ == "__main__":
         sys.exit(1)
 
     dataset_id = int(sys.argv[1])
-    asyncio.run(enrich_chunks(dataset_id))
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else ENRICH_CONCURRENCY
+    batch_tokens = int(sys.argv[3]) if len(sys.argv) > 3 else BATCH_TOKENS
+    asyncio.run(enrich_chunks(dataset_id, concurrency, batch_tokens))
@@ -0,0 +1,119 @@
+"""extraction.py
+
+Единый разбор страницы: HTML парсится один раз в lxml-дерево,
+из него берутся метаданные (title/date/author/category/language) и чистый текст.
+
+Функции верхнего уровня — чтобы их можно было отправлять в пул процессов.
+"""
+
+import re
+
+import trafilatura
+from dateutil import parser as dateparser
+from langdetect import detect
+from lxml import etree
+from lxml import html as lxml_html
+
+MIN_TEXT_LEN = 50
+
+TEXT_XPATH = etree.XPath(
+    "//text()[not(ancestor::script) and not(ancestor::style) and not(ancestor::noscript)]"
+)
+
+
+def parse_custom_date(date_str):
+    try:
+        date_str = ' '.join(date_str.split())
+        date_str = re.sub(r'^(Updated|Published|Posted|Date):?\s*', '', date_str)
+        return dateparser.parse(date_str)
+    except Exception:
+        return None
+
+
+def parse_tree(html: str):
+    try:
+        return lxml_html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+
+
+def _meta_content(tree, xpath):
+    values = tree.xpath(xpath)
+    return values[0].strip() if values and values[0].strip() else ''
+
+
+def extract_text(tree) -> str:
+    # trafilatura сам копирует переданное дерево, так что его можно переиспользовать
+    clean = trafilatura.extract(tree)
+    if clean and len(clean.strip()) > MIN_TEXT_LEN:
+        return clean.strip()
+    # Fallback: весь видимый текст документа
+    text = ' '.join(t.strip() for t in TEXT_XPATH(tree) if t.strip())
+    return text if len(text) > MIN_TEXT_LEN else ""
+
+
+def extract_meta(tree, data):
+    # Title
+    title = tree.find('.//title')
+    if title is not None and title.text and title.text.strip():
+        data['title'] = title.text.strip()
+        data['meta_data']['title_source'] = 'title'
+
+    # Date
+    published = _meta_content(tree, '//meta[@property="article:published_time"]/@content')
+    if published:
+        parsed = parse_custom_date(published)
+        # Неразобранную строку сохраняем как есть — её дочистит meta_cleaner
+        data['raw_date'] = parsed.isoformat() if parsed else published
+        data['meta_data']['date_source'] = 'article:published_time'
+
+    # Author
+    author = _meta_content(tree, '//meta[@name="author"]/@content')
+    if author:
+        data['raw_author'] = author
+        data['meta_data']['author_source'] = 'meta[name=author]'
+
+    # Category
+    category = _meta_content(tree, '//meta[@name="category"]/@content')
+    if category:
+        data['raw_category'] = category
+        data['meta_data']['category_source'] = 'meta[name=category]'
+
+    # Language (по тексту определяем позже, когда он уже извлечён)
+    html_lang = tree.get('lang') if tree.tag == 'html' else _meta_content(tree, '//html/@lang')
+    if html_lang:
+        data['language'] = html_lang.split('-')[0]
+        data['meta_data']['language_source'] = 'html[lang]'
+
+
+def extract_page(html, url):
+    data = {
+        'url': url,
+        'title': '',
+        'raw_date': '',
+        'raw_author': '',
+        'raw_category': '',
+        'language': '',
+        'clean_text': '',
+        'meta_data': {}
+    }
+
+    tree = parse_tree(html)
+    if tree is None:
+        data['meta_data']['parse_error'] = 'empty document'
+        return data
+
+    extract_meta(tree, data)
+    data['clean_text'] = extract_text(tree)
+
+    if not data['language'] and data['clean_text']:
+        try:
+            data['language'] = detect(data['clean_text'])
+            data['meta_data']['language_source'] = 'langdetect'
+        except Exception as e:
+            data['meta_data']['language_error'] = str(e)
+
+    if data['language']:
+        data['meta_data']['language'] = data['language']
+
+    return data
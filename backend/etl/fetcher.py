@@ -0,0 +1,171 @@
+"""fetcher.py
+
+Движок параллельного скачивания страниц.
+
+* Общий лимит запросов «в полёте» (max_in_flight воркеров).
+* Для каждого хоста — свой лимит параллельности и token bucket (вежливость).
+* Хосты обслуживаются по кругу, поэтому один большой сайт не забивает очередь,
+  а общая скорость растёт с числом разных доменов.
+"""
+
+import asyncio
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import aiohttp
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0',
+}
+
+
+async def fetch_html(session, url):
+    try:
+        async with session.get(url, headers=DEFAULT_HEADERS, timeout=30) as resp:
+            html = await resp.text()
+            return resp.status, html
+    except Exception as e:
+        print(f"[ERROR] {url}: {e}")
+        return None, None
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не больше capacity про запас."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Сколько секунд ждать до следующего токена (0 — можно сейчас)."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        if self.rate > 0:
+            self.tokens -= 1
+
+
+class HostState:
+    def __init__(self, rate: float, burst: float):
+        self.pending = deque()
+        self.active = 0
+        self.scheduled = 0
+        self.bucket = TokenBucket(rate, burst)
+        self.fetched = 0
+
+
+class Fetcher:
+    """Пул воркеров с бюджетами по хостам.
+
+    on_result(item, status, html) вызывается для каждого item сразу после загрузки.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        max_in_flight: int = 32,
+        per_host_concurrency: int = 2,
+        per_host_rate: float = 1.0,
+        per_host_burst: float = 1.0,
+    ):
+        self.session = session
+        self.max_in_flight = max_in_flight
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_rate = per_host_rate
+        self.per_host_burst = per_host_burst
+        self.hosts: dict[str, HostState] = {}
+
+    def _schedule(self, ready: asyncio.Queue, host: str):
+        # Хост стоит в очереди готовых не больше раз, чем у него свободных слотов
+        st = self.hosts[host]
+        free = self.per_host_concurrency - st.active - st.scheduled
+        want = len(st.pending) - st.scheduled
+        for _ in range(max(0, min(free, want))):
+            st.scheduled += 1
+            ready.put_nowait(host)
+
+    async def _worker(self, ready: asyncio.Queue, url_of, on_result, done: asyncio.Event):
+        loop = asyncio.get_running_loop()
+        while True:
+            host = await ready.get()
+            if host is None:
+                return
+            st = self.hosts[host]
+
+            wait = st.bucket.delay()
+            if wait > 0:
+                # Бюджет хоста исчерпан — возвращаем его в круг позже, слот воркера не держим
+                loop.call_later(wait, ready.put_nowait, host)
+                continue
+
+            st.scheduled -= 1
+            if not st.pending:
+                continue
+            item = st.pending.popleft()
+            st.bucket.take()
+            st.active += 1
+            try:
+                status, html = await fetch_html(self.session, url_of(item))
+                await on_result(item, status, html)
+            except Exception as e:
+                print(f"[ERROR] {url_of(item)}: {e}")
+            finally:
+                st.active -= 1
+                st.fetched += 1
+                self._remaining -= 1
+                self._schedule(ready, host)
+                if self._remaining == 0:
+                    done.set()
+
+    async def run(self, items, on_result, url_of=lambda item: item):
+        items = list(items)
+        if not items:
+            return
+        self._remaining = len(items)
+        for item in items:
+            host = host_of(url_of(item))
+            if host not in self.hosts:
+                self.hosts[host] = HostState(self.per_host_rate, self.per_host_burst)
+            self.hosts[host].pending.append(item)
+
+        ready: asyncio.Queue = asyncio.Queue()
+        for host in self.hosts:
+            self._schedule(ready, host)
+
+        done = asyncio.Event()
+        workers = [
+            asyncio.create_task(self._worker(ready, url_of, on_result, done))
+            for _ in range(self.max_in_flight)
+        ]
+        try:
+            await done.wait()
+        finally:
+            for _ in workers:
+                ready.put_nowait(None)
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def stats(self) -> dict[str, int]:
+        return {host: st.fetched for host, st in self.hosts.items()}
+
+
+def make_session(max_in_flight: int = 32, per_host_concurrency: int = 2) -> aiohttp.ClientSession:
+    timeout = aiohttp.ClientTimeout(total=60)
+    connector = aiohttp.TCPConnector(limit=max_in_flight, limit_per_host=per_host_concurrency, ssl=False)
+    return aiohttp.ClientSession(timeout=timeout, connector=connector)
@@ -12,6 +12,7 @@ import re
 # Импортируем модели и соединение с БД из централизованных модулей
 from models.models import Link
 from core.db import get_db
+from etl.jobqueue import enqueue
 
 router = APIRouter()
 
@@ -34,6 +35,8 @@ async def _insert_links(dataset_id: int, urls: list[str], session: AsyncSession)
 
     session.add_all(new_links)
     await session.flush()
+    # Каждая новая ссылка — задача fetch (etl/jobqueue.py)
+    await enqueue(session, "fetch", dataset_id, [link.id for link in new_links])
     return len(new_links)
 
 # 🌐 FastAPI-роут (если нужен)
@@ -0,0 +1,210 @@
+"""jobqueue.py
+
+Очередь работы стадий ETL в таблице jobs — одна строка на (стадия, элемент):
+
+    fetch  → links.id        chunk → pages.id
+    enrich → chunks.id       embed → chunks.id
+
+* seed() ставит в очередь всё, что подходит под «старый» предикат стадии
+  (status = 'queued', summary IS NULL, ...). ON CONFLICT — повторный seed безопасен,
+  а выполненная задача, элемент которой снова требует работы, переоткрывается.
+* claim() захватывает пачку через FOR UPDATE SKIP LOCKED: параллельные воркеры
+  (процессы, машины) никогда не получают один и тот же элемент.
+* visible_at — таймаут видимости: захваченная строка снова доступна после LEASE секунд,
+  если воркер умер и не отчитался. Каждый захват увеличивает attempts; после MAX_ATTEMPTS
+  задача уходит в dead (dead letter) и больше не выдаётся.
+* complete()/fail() — без commit: отчёт пишется в одной транзакции с результатом стадии.
+  complete() и fail() трогают только задачи, захваченные этим воркером: если аренда
+  истекла и задачу перехватил другой, поздний отчёт первого её не закроет и не сбросит. skip() — для задач, работа
+  по которым больше не нужна (дубли), не дожидаясь захвата.
+
+Запуск (сводка по датасету; --retry-dead возвращает dead-задачи в очередь):
+    python etl/jobqueue.py <dataset_id> [--retry-dead]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import socket
+
+from sqlalchemy import and_, case, func, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+# Импортируем модели и соединение с БД из централизованных модулей
+from models.models import Job
+from core.db import async_session_maker
+
+STAGES = ("fetch", "chunk", "enrich", "embed")
+LEASE = int(os.getenv("JOB_LEASE_SECONDS", "600"))   # таймаут видимости захваченной задачи
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+BACKOFF = 30            # секунд до повтора после первой ошибки, дальше ×2
+MAX_BACKOFF = 3600
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+LIVE = ("pending", "running")
+
+
+def seconds(expr):
+    return func.make_interval(0, 0, 0, 0, 0, 0, expr)
+
+
+def reopen_done(stmt):
+    # Выполненная задача, элемент которой снова требует работы, переоткрывается; dead не трогаем
+    return stmt.on_conflict_do_update(
+        constraint="uq_jobs_stage_item",
+        set_={"status": "pending", "attempts": 0, "visible_at": func.now(), "updated_at": func.now()},
+        where=Job.status == "done",
+    )
+
+
+async def seed(session, stage: str, dataset_id: int, item_ids) -> None:
+    """item_ids — select(...) с id элементов; без commit."""
+    source = item_ids.subquery()
+    await session.execute(reopen_done(
+        insert(Job).from_select(
+            ["stage", "dataset_id", "item_id"],
+            select(literal(stage), literal(dataset_id), source.c[0]),
+        )
+    ))
+
+
+async def enqueue(session, stage: str, dataset_id: int, item_ids) -> None:
+    # Новые элементы, только что записанные предыдущей стадией; без commit
+    rows = [{"stage": stage, "dataset_id": dataset_id, "item_id": item_id} for item_id in item_ids]
+    if rows:
+        await session.execute(reopen_done(insert(Job).values(rows)))
+
+
+async def claim(session, stage: str, dataset_id: int, limit: int, item_ids=None, lease: int = LEASE) -> list[int]:
+    """Захватывает до limit задач (или только из item_ids); возвращает id элементов. Commit — за вызывающим."""
+    # Задачи, исчерпавшие попытки и брошенные воркером, — в dead letter
+    await session.execute(
+        update(Job)
+        .where(Job.stage == stage, Job.dataset_id == dataset_id)
+        .where(Job.status == "running", Job.visible_at <= func.now(), Job.attempts >= MAX_ATTEMPTS)
+        .values(status="dead", last_error=func.coalesce(Job.last_error, "lease expired"), updated_at=func.now())
+    )
+
+    available = (
+        select(Job.id)
+        .where(Job.stage == stage, Job.dataset_id == dataset_id)
+        .where(Job.status.in_(LIVE), Job.visible_at <= func.now())
+        .order_by(Job.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if item_ids is not None:
+        available = available.where(Job.item_id.in_(item_ids))
+    result = await session.execute(
+        update(Job)
+        .where(Job.id.in_(available))
+        .values(
+            status="running",
+            attempts=Job.attempts + 1,
+            visible_at=func.now() + seconds(lease),
+            locked_by=WORKER_ID,
+            updated_at=func.now(),
+        )
+        .returning(Job.item_id)
+    )
+    return sorted(result.scalars())
+
+
+async def complete(session, stage: str, item_ids) -> None:
+    if item_ids:
+        await session.execute(
+            update(Job)
+            .where(Job.stage == stage, Job.item_id.in_(list(item_ids)))
+            .where(Job.status == "running", Job.locked_by == WORKER_ID)
+            .values(status="done", locked_by=None, last_error=None, updated_at=func.now())
+        )
+
+
+async def skip(session, stage: str, item_ids) -> None:
+    # Работа по элементам не нужна: закрываем ожидающие задачи и свои захваченные; без commit
+    if item_ids:
+        await session.execute(
+            update(Job)
+            .where(Job.stage == stage, Job.item_id.in_(list(item_ids)))
+            .where(or_(Job.status == "pending", and_(Job.status == "running", Job.locked_by == WORKER_ID)))
+            .values(status="done", locked_by=None, last_error=None, updated_at=func.now())
+        )
+
+
+async def fail(session, stage: str, item_ids, error: str) -> None:
+    # Повтор с экспоненциальной задержкой; последняя попытка — в dead
+    if item_ids:
+        delay = func.least(BACKOFF * func.power(2, Job.attempts - 1), MAX_BACKOFF)
+        await session.execute(
+            update(Job)
+            .where(Job.stage == stage, Job.item_id.in_(list(item_ids)))
+            .where(Job.status == "running", Job.locked_by == WORKER_ID)
+            .values(
+                status=case((Job.attempts >= MAX_ATTEMPTS, "dead"), else_="pending"),
+                visible_at=func.now() + seconds(delay),
+                locked_by=None,
+                last_error=error[:2000],
+                updated_at=func.now(),
+            )
+        )
+
+
+async def finish(stage: str, item_ids) -> None:
+    # Отчёт вне транзакции стадии: элементы, которым работа уже не нужна
+    if item_ids:
+        async with async_session_maker() as session:
+            await complete(session, stage, item_ids)
+            await session.commit()
+
+
+async def release(stage: str, item_ids, error: str) -> None:
+    # fail() вне транзакции стадии: пакет упал до записи результата
+    if item_ids:
+        async with async_session_maker() as session:
+            await fail(session, stage, item_ids, error)
+            await session.commit()
+
+
+async def iter_claimed(stage: str, dataset_id: int, batch_size: int, item_ids=None):
+    """Пачки захваченных id; новая пачка захватывается, только когда стадия дочитала предыдущую."""
+    async with async_session_maker() as session:
+        while True:
+            claimed = await claim(session, stage, dataset_id, batch_size, item_ids)
+            await session.commit()
+            if not claimed:
+                return
+            yield claimed
+
+
+async def report(dataset_id: int, retry_dead: bool = False):
+    async with async_session_maker() as session:
+        if retry_dead:
+            result = await session.execute(
+                update(Job)
+                .where(Job.dataset_id == dataset_id, Job.status == "dead")
+                .values(status="pending", attempts=0, visible_at=func.now(), updated_at=func.now())
+            )
+            await session.commit()
+            print(f"♻️ Возвращено в очередь dead-задач: {result.rowcount}")
+
+        result = await session.execute(
+            select(Job.stage, Job.status, func.count())
+            .where(Job.dataset_id == dataset_id)
+            .group_by(Job.stage, Job.status)
+        )
+        counts = {(row.stage, row.status): row[2] for row in result}
+
+    statuses = ("pending", "running", "done", "dead")
+    print(f"{'stage':<8}" + "".join(f"{status:>10}" for status in statuses))
+    for stage in STAGES:
+        print(f"{stage:<8}" + "".join(f"{counts.get((stage, status), 0):>10}" for status in statuses))
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("❗ Укажи dataset_id")
+        sys.exit(1)
+
+    dataset_id = int(sys.argv[1])
+    asyncio.run(report(dataset_id, retry_dead="--retry-dead" in sys.argv[2:]))
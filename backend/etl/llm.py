@@ -0,0 +1,133 @@
+"""llm.py
+
+Общие утилиты для вызовов OpenAI из ETL:
+
+* RateLimiter — бюджеты запросов и токенов в минуту (RPM/TPM);
+* with_retries — повтор с экспоненциальной задержкой на 429/5xx и сетевых ошибках;
+* chat_completion — вызов chat API через кэш ответов (etl/llm_cache.py); validate= отсекает
+  от кэша ответы, которые вызывающий всё равно отбросит (битый JSON, неполный пакет).
+
+Базовый URL берётся из OPENAI_BASE_URL, так что всё можно гонять против
+локального фейкового сервера (scripts/fake_openai.py).
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+
+from openai import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+
+from etl.llm_cache import cache
+
+RPM_LIMIT = int(os.getenv("OPENAI_RPM", "500"))
+TPM_LIMIT = int(os.getenv("OPENAI_TPM", "200000"))
+
+MAX_ATTEMPTS = 6
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+
+
+def estimate_tokens(text: str) -> int:
+    # Грубая оценка без загрузки токенизатора: ~3 символа на токен (для кириллицы с запасом)
+    return len(text) // 3 + 1
+
+
+class RateLimiter:
+    """Два token bucket'а на минуту: по запросам и по токенам."""
+
+    def __init__(self, rpm: int = RPM_LIMIT, tpm: int = TPM_LIMIT):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = float(rpm)
+        self.tokens = float(tpm)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, tokens: int):
+        tokens = min(tokens, self.tpm)
+        # Под локом — чтобы крупный запрос не «голодал» за мелкими
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.requests >= 1 and self.tokens >= tokens:
+                    self.requests -= 1
+                    self.tokens -= tokens
+                    return
+                wait_requests = (1 - self.requests) * 60 / self.rpm if self.requests < 1 else 0
+                wait_tokens = (tokens - self.tokens) * 60 / self.tpm if self.tokens < tokens else 0
+                await asyncio.sleep(max(wait_requests, wait_tokens))
+
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, (RateLimitError, APIConnectionError, APITimeoutError)):
+        return True
+    return isinstance(e, APIStatusError) and e.status_code >= 500
+
+
+def retry_delay(e: Exception, attempt: int) -> float:
+    # Если сервер подсказал Retry-After — слушаемся его
+    response = getattr(e, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), MAX_DELAY)
+        except ValueError:
+            pass
+    return min(MAX_DELAY, BASE_DELAY * 2 ** attempt) * (0.5 + random.random() / 2)
+
+
+async def with_retries(call, max_attempts: int = MAX_ATTEMPTS):
+    """call — функция без аргументов, возвращающая корутину запроса."""
+    for attempt in range(max_attempts):
+        try:
+            return await call()
+        except Exception as e:
+            if not is_retryable(e) or attempt == max_attempts - 1:
+                raise
+            delay = retry_delay(e, attempt)
+            print(f"⏳ {type(e).__name__}, повтор через {delay:.1f} c ({attempt + 1}/{max_attempts - 1})")
+            await asyncio.sleep(delay)
+
+
+def is_json(content) -> bool:
+    try:
+        json.loads(content)
+    except (json.JSONDecodeError, TypeError):
+        return False
+    return True
+
+
+async def chat_completion(client, model, messages, temperature=None, max_tokens=None, limiter=None, use_cache=True,
+                          validate=None):
+    """Текст ответа модели; одинаковые запросы берутся из кэша без обращения к API и лимитеру.
+    validate(content) → bool: в кэш попадают только прошедшие проверку ответы, иначе битый ответ
+    повторялся бы из кэша в каждом следующем запуске."""
+    key = cache.make_key(model, messages, temperature, max_tokens)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None and (validate is None or validate(cached)):
+            return cached
+
+    params = {"model": model, "messages": messages}
+    if temperature is not None:
+        params["temperature"] = temperature
+    if max_tokens is not None:
+        params["max_tokens"] = max_tokens
+
+    if limiter is not None:
+        prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+        await limiter.acquire(prompt_tokens + (max_tokens or 0))
+    response = await with_retries(lambda: client.chat.completions.create(**params))
+    content = response.choices[0].message.content
+    if use_cache and content is not None and (validate is None or validate(content)):
+        cache.put(key, model, content)
+    return content
@@ -0,0 +1,101 @@
+"""llm_cache.py
+
+Персистентный кэш ответов LLM в локальном SQLite-файле.
+
+Ключ — sha256 от (model, messages, temperature, max_tokens): одинаковый промпт
+(например, один и тот же raw_author на тысячах страниц) оплачивается один раз.
+Записи живут TTL и вытесняются по давности использования, если их больше MAX_ENTRIES.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "llm_cache.sqlite3")
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", DEFAULT_PATH)
+TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_DAYS", "30")) * 24 * 3600
+MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "200000"))
+EVICT_EVERY = 1000  # записей между проверками размера
+
+
+class LLMCache:
+    def __init__(self, path: str = CACHE_PATH, ttl: int = TTL_SECONDS, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    used_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_used_at ON llm_cache (used_at)")
+            self.evict()
+        return self._conn
+
+    @staticmethod
+    def make_key(model, messages, temperature=None, max_tokens=None) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+            ensure_ascii=False, sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        now = time.time()
+        row = self.conn.execute(
+            "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or now - row[1] > self.ttl:
+            self.misses += 1
+            return None
+        self.conn.execute("UPDATE llm_cache SET used_at = ? WHERE key = ?", (now, key))
+        self.conn.commit()
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, model: str, response: str):
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, used_at) VALUES (?, ?, ?, ?, ?)",
+            (key, model, response, now, now),
+        )
+        self.conn.commit()
+        self._puts += 1
+        if self._puts % EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        conn = self._conn
+        conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl,))
+        conn.execute(
+            """DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_entries,),
+        )
+        conn.commit()
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        ratio = self.hits / total if total else 0
+        return f"🗄️ LLM-кэш: hit {self.hits}, miss {self.misses} ({ratio:.0%} попаданий)"
+
+
+cache = LLMCache()
@@ -3,80 +3,164 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import asyncio
-from datetime import datetime
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
-from sqlalchemy import select, or_
+from sqlalchemy import Text, column, select, update, values
 
 # Импортируем модели и соединение с БД из централизованных модулей
 from models.models import Page, Link, DatasetSettings
 from core.db import async_session_maker
+from etl.date_normalizer import DateNormalizer
+from etl.llm import chat_completion
+from etl.llm_cache import cache
 
 # Загружаем переменные окружения
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 # Настраиваем OpenAI
-client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+client = AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+
+CLEAN_CONCURRENCY = int(os.getenv("CLEAN_CONCURRENCY", "8"))
+UPDATE_BATCH = 1000  # значений в одном UPDATE ... FROM (VALUES ...)
+DATE_BATCH = 1000
+
+# поле → (raw, clean, needs_review)
+TEXT_FIELDS = {
+    "author": (Page.raw_author, Page.clean_author, Page.author_needs_review),
+    "category": (Page.raw_category, Page.clean_category, Page.category_needs_review),
+}
 
 async def gpt_clean(text: str, prompt: str, model: str) -> str:
-    response = await client.chat.completions.create(
+    # Одинаковые значения (один автор на тысячах страниц) отвечаются из кэша
+    content = await chat_completion(
+        client,
         model=model,
         messages=[{"role": "user", "content": prompt.format(text=text)}],
         max_tokens=32,
-        temperature=0
+        temperature=0,
+        validate=lambda reply: bool(reply.strip()),
     )
-    return response.choices[0].message.content.strip()
+    return content.strip()
 
-async def process_pages(dataset_id: int):
-    async with async_session_maker() as session:
-        # Получаем настройки
-        settings_q = await session.execute(
-            select(DatasetSettings).where(DatasetSettings.dataset_id == dataset_id)
-        )
-        settings = settings_q.scalar_one_or_none()
-        model = settings.gpt_model if settings else "gpt-3.5-turbo"
-        prompt = "Приведи в чистый и короткий вид: \"{text}\""
+def dataset_links(dataset_id):
+    return select(Link.id).where(Link.dataset_id == dataset_id)
+
+async def resolve_values(raw_values, prompt, model, concurrency=CLEAN_CONCURRENCY):
+    # Каждое уникальное значение отправляется в GPT один раз, не больше concurrency одновременно
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def resolve(raw):
+        async with semaphore:
+            try:
+                return raw, await gpt_clean(raw, prompt, model)
+            except Exception as e:
+                print(f"❌ GPT error для «{raw[:40]}»: {e}")
+                return raw, None
+
+    resolved = await asyncio.gather(*[resolve(raw) for raw in raw_values])
+    return {raw: clean for raw, clean in resolved if clean}
+
+async def clean_text_field(session, dataset_id, field, prompt, model):
+    raw_col, clean_col, review_col = TEXT_FIELDS[field]
 
-        # Получаем страницы с неочищенными полями
+    # 1. Уникальные сырые значения по датасету
+    result = await session.execute(
+        select(raw_col)
+        .distinct()
+        .where(Page.link_id.in_(dataset_links(dataset_id)))
+        .where(clean_col.is_(None))
+        .where(raw_col.isnot(None))
+        .where(raw_col != "")
+        .where(~review_col)
+    )
+    raw_values = result.scalars().all()
+    if not raw_values:
+        return 0
+    print(f"🧼 {field}: уникальных значений — {len(raw_values)}")
+
+    # 2. По одному вызову GPT на значение
+    resolved = await resolve_values(raw_values, prompt, model)
+
+    # 3. Запись set-based: UPDATE pages SET clean = v.clean FROM (VALUES ...) v WHERE raw = v.raw
+    items = list(resolved.items())
+    updated = 0
+    for i in range(0, len(items), UPDATE_BATCH):
+        mapping = values(column("raw", Text), column("clean", Text), name="v").data(items[i:i + UPDATE_BATCH])
         result = await session.execute(
-            select(Page)
-            .join(Link, Link.id == Page.link_id)
-            .where(Link.dataset_id == dataset_id)
-            .where(
-                or_(
-                    Page.clean_author.is_(None) & Page.raw_author.isnot(None) & (~Page.author_needs_review),
-                    Page.clean_date.is_(None) & Page.raw_date.isnot(None) & (~Page.date_needs_review),
-                    Page.clean_category.is_(None) & Page.raw_category.isnot(None) & (~Page.category_needs_review)
-                )
-            )
-            .limit(20)
+            update(Page)
+            .where(raw_col == mapping.c.raw)
+            .where(clean_col.is_(None))
+            .where(~review_col)
+            .where(Page.link_id.in_(dataset_links(dataset_id)))
+            .values({clean_col: mapping.c.clean})
+            .execution_options(synchronize_session=False)
         )
-        pages = result.scalars().all()
+        updated += result.rowcount
+    print(f"✅ {field}: обновлено страниц — {updated}")
+    return updated
 
-        if not pages:
-            print("✅ Нет страниц для очистки.")
-            return
+DATE_PROMPT = "Преобразуй дату в формат ISO 8601 (YYYY-MM-DD). Ответь только датой или NONE: \"{text}\""
+
+async def write_dates(session, updates):
+    for keys in ({"id", "clean_date", "date_needs_review"}, {"id", "date_needs_review"}):
+        batch = [u for u in updates if set(u) == keys]
+        for i in range(0, len(batch), DATE_BATCH):
+            await session.execute(update(Page), batch[i:i + DATE_BATCH])
+
+async def clean_dates(session, dataset_id, model):
+    # Ещё не нормализованные даты датасета; отправленные на ревью не трогаем —
+    # иначе каждый запуск заново гонял бы их в GPT и мог снять флаг ревью
+    result = await session.execute(
+        select(Page.id, Page.url, Page.raw_date)
+        .where(Page.link_id.in_(dataset_links(dataset_id)))
+        .where(Page.clean_date.is_(None))
+        .where(Page.raw_date.isnot(None))
+        .where(Page.raw_date != "")
+        .where(~Page.date_needs_review)
+    )
+    rows = result.all()
+    if not rows:
+        return
 
-        for page in pages:
-            print(f"🧼 Страница: {page.url}")
-            if page.raw_author and not page.clean_author and not page.author_needs_review:
-                page.clean_author = await gpt_clean(page.raw_author, prompt, model)
+    # 1. Правила (с кэшем шаблона по домену)
+    normalizer = DateNormalizer()
+    parsed, residue = normalizer.parse_many(rows)
+    await write_dates(session, [
+        {"id": page_id, "clean_date": value, "date_needs_review": False}
+        for page_id, value in parsed.items()
+    ])
+    print(f"📅 Дат: {len(rows)}, правилами: {len(parsed)}, остаток для GPT: {len(residue)}")
 
-            if page.raw_date and not page.clean_date and not page.date_needs_review:
-                try:
-                    parsed_date = datetime.fromisoformat(page.raw_date)
-                    page.clean_date = parsed_date
-                except Exception:
-                    page.date_needs_review = True
+    # 2. Остаток — в GPT по уникальным строкам, ответ снова через правила
+    resolved = await resolve_values({raw for _, raw in residue}, DATE_PROMPT, model)
+    updates = []
+    for page_id, raw in residue:
+        value = normalizer.parse(resolved.get(raw))
+        if value is None:
+            updates.append({"id": page_id, "date_needs_review": True})
+        else:
+            updates.append({"id": page_id, "clean_date": value, "date_needs_review": False})
+    await write_dates(session, updates)
+    print(f"📅 Нормализатор: {normalizer.stats}, шаблонов по доменам: {len(normalizer.domain_patterns)}")
 
-            if page.raw_category and not page.clean_category and not page.category_needs_review:
-                page.clean_category = await gpt_clean(page.raw_category, prompt, model)
+async def process_pages(dataset_id: int):
+    async with async_session_maker() as session:
+        # Получаем настройки
+        settings_q = await session.execute(
+            select(DatasetSettings.gpt_model).where(DatasetSettings.dataset_id == dataset_id)
+        )
+        model = settings_q.scalar_one_or_none() or "gpt-3.5-turbo"
+        prompt = "Приведи в чистый и короткий вид: \"{text}\""
 
-            session.add(page)
+        updated = 0
+        for field in TEXT_FIELDS:
+            updated += await clean_text_field(session, dataset_id, field, prompt, model)
+        await clean_dates(session, dataset_id, model)
 
         await session.commit()
-        print("✅ Все страницы обработаны.")
+        print(f"✅ Все страницы обработаны. Обновлено полей: {updated}")
+        print(cache.report())
 
 if __name__ == "__main__":
     dataset_id = int(sys.argv[1]) if len(sys.argv) > 1 else 1
@@ -0,0 +1,199 @@
+"""orchestrator.py
+
+Потоковый конвейер в одном процессе: стадии etl/* вызываются как async-функции
+и связаны ограниченными очередями. Страница идёт дальше сразу после записи в БД,
+не дожидаясь, пока скачается весь датасет:
+
+    fetch → parse → persist ─page_ids─▶ chunk → dedupe ─chunk_ids─┬─▶ enrich
+                                                                  └─▶ embed
+    meta_cleaner — по всему датасету, как только скачивание закончено.
+
+clean_text считается при парсинге (etl/extraction.py), отдельной стадии очистки нет.
+Очереди ограничены: медленная стадия притормаживает предыдущие, память не растёт.
+Пул процессов общий — парсинг HTML, нарезка на чанки и MinHash.
+
+В конце печатается по каждой стадии: сколько элементов, за какое время,
+сколько в секунду и через сколько секунд после старта пришла первая пачка.
+
+Запуск:
+    python etl/orchestrator.py <dataset_id> [--no-dedupe]
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import time
+
+from core.db import async_session_maker
+from etl import raw_html_extractor
+from etl.chunker import chunk_pages, get_chunk_settings
+from etl.deduper import DEDUP_THRESHOLD, dedupe_new_chunks, load_index
+from etl.embedder import embedder
+from etl.enricher import enrich_chunks
+from etl.meta_cleaner import process_pages
+from etl.workers import make_process_pool
+
+PAGES_QUEUE_SIZE = 8    # пачек page_ids (по PERSIST_BATCH страниц), ждущих чанкирования
+CHUNKS_QUEUE_SIZE = 8   # пачек chunk_ids на каждую из веток enrich / embed
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.started = None
+        self.first = None
+        self.finished = None
+
+    def start(self):
+        self.started = time.perf_counter()
+
+    def add(self, count: int):
+        if self.first is None:
+            self.first = time.perf_counter()
+        self.items += count
+
+    def finish(self, items: int | None = None):
+        # enrich / embed: в items — сделанное стадией, а не полученное из очереди
+        self.finished = time.perf_counter()
+        if items is not None:
+            self.items = items
+
+    def report(self, origin: float) -> str:
+        if self.started is None:
+            return f"{self.name:<8} {'пропущена':>8}"
+        wall = (self.finished or time.perf_counter()) - self.started
+        rate = self.items / wall if wall > 0 else 0
+        first = f"{self.first - origin:.1f} c" if self.first is not None else "—"
+        return f"{self.name:<8} {self.items:>8} {wall:8.1f} c {rate:10.1f}/с   первая пачка через {first}"
+
+
+async def drain(queue: asyncio.Queue, stats: StageStats):
+    # Пачки id из очереди до sentinel None
+    while True:
+        ids = await queue.get()
+        if ids is None:
+            return
+        stats.add(len(ids))
+        yield ids
+
+
+async def fetch_stage(dataset_id, pages, stats, pool, on_fetched):
+    stats["fetch"].start()
+
+    async def on_saved(page_ids):
+        stats["fetch"].add(len(page_ids))
+        await pages.put(page_ids)
+
+    await raw_html_extractor.main(dataset_id, on_saved=on_saved, pool=pool)
+    stats["fetch"].finish()
+    await pages.put(None)
+    on_fetched.set()
+
+
+async def chunk_stage(dataset_id, pages, outputs, stats, pool, loading_index):
+    index = None
+    if loading_index is not None:
+        # Индекс строится параллельно со скачиванием; ждём его до первой записи чанков,
+        # иначе load_index мог бы прочитать новые чанки и счесть их дублями самих себя
+        index = await loading_index
+        stats["dedupe"].start()
+    stats["chunk"].start()
+    async with async_session_maker() as session:
+        chunk_size, chunk_overlap = await get_chunk_settings(session, dataset_id)
+        while True:
+            page_ids = await pages.get()
+            if page_ids is None:
+                break
+            chunk_ids = await chunk_pages(session, dataset_id, page_ids, chunk_size, chunk_overlap, pool)
+            stats["chunk"].add(len(chunk_ids))
+            if index is not None and chunk_ids:
+                chunk_ids = await dedupe_new_chunks(session, dataset_id, index, chunk_ids, pool)
+                stats["dedupe"].add(len(chunk_ids))
+            if chunk_ids:
+                for queue in outputs:
+                    await queue.put(chunk_ids)
+    stats["chunk"].finish()
+    if index is not None:
+        stats["dedupe"].finish()
+    for queue in outputs:
+        await queue.put(None)
+
+
+async def enrich_stage(dataset_id, chunks, stats):
+    stats["enrich"].start()
+    batches = drain(chunks, stats["enrich"])
+    done = await enrich_chunks(dataset_id, chunk_id_batches=batches)
+    # Стадия могла выйти раньше (нет настроек) — дочитываем очередь, чтобы не встал chunk
+    async for _ in batches:
+        pass
+    stats["enrich"].finish(done)
+
+
+async def embed_stage(dataset_id, chunks, stats):
+    stats["embed"].start()
+    batches = drain(chunks, stats["embed"])
+    done = await embedder(dataset_id, chunk_id_batches=batches)
+    async for _ in batches:
+        pass
+    stats["embed"].finish(done)
+
+
+async def meta_stage(dataset_id, on_fetched, stats):
+    # Авторы/категории/даты чистятся по датасету целиком, поэтому ждём конца скачивания
+    await on_fetched.wait()
+    stats["meta"].start()
+    await process_pages(dataset_id)
+    stats["meta"].finish()
+
+
+async def run_pipeline(dataset_id: int, dedupe: bool = True, threshold: float = DEDUP_THRESHOLD):
+    origin = time.perf_counter()
+    stats = {name: StageStats(name) for name in ("fetch", "chunk", "dedupe", "enrich", "embed", "meta")}
+
+    pages = asyncio.Queue(maxsize=PAGES_QUEUE_SIZE)
+    to_enrich = asyncio.Queue(maxsize=CHUNKS_QUEUE_SIZE)
+    to_embed = asyncio.Queue(maxsize=CHUNKS_QUEUE_SIZE)
+    on_fetched = asyncio.Event()
+
+    pool = make_process_pool()
+    try:
+        # Сигнатуры уже известных чанков (читает весь датасет): строятся, пока идёт
+        # скачивание, новые пачки потом сверяются только с ними
+        loading_index = asyncio.create_task(load_index(dataset_id, threshold, pool)) if dedupe else None
+
+        tasks = [
+            asyncio.create_task(fetch_stage(dataset_id, pages, stats, pool, on_fetched)),
+            asyncio.create_task(chunk_stage(dataset_id, pages, [to_enrich, to_embed], stats, pool, loading_index)),
+            asyncio.create_task(enrich_stage(dataset_id, to_enrich, stats)),
+            asyncio.create_task(embed_stage(dataset_id, to_embed, stats)),
+            asyncio.create_task(meta_stage(dataset_id, on_fetched, stats)),
+        ]
+        if loading_index is not None:
+            tasks.append(loading_index)
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Упавшая стадия не должна оставить соседей висеть на полной очереди
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    finally:
+        pool.shutdown()
+
+    print(f"\n📊 Конвейер dataset_id={dataset_id} за {time.perf_counter() - origin:.1f} c")
+    for stage in stats.values():
+        print(f"  {stage.report(origin)}")
+    return stats
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("❗ Укажи dataset_id")
+        sys.exit(1)
+
+    dataset_id = int(sys.argv[1])
+    asyncio.run(run_pipeline(dataset_id, dedupe="--no-dedupe" not in sys.argv[2:]))
@@ -9,6 +9,7 @@ from sqlalchemy import select, update
 
 # Импортируем модели и соединение с БД из централизованных модулей
 from models.models import Dataset
+from models.profiles import DATASET_PROMPTS
 from core.db import async_session_maker
 from dotenv import load_dotenv
 
@@ -55,7 +56,7 @@ async def generate_prompts(dataset: Dataset):
 
 async def run(dataset_id: int):
     async with async_session_maker() as session:
-        result = await session.execute(select(Dataset).where(Dataset.id == dataset_id))
+        result = await session.execute(select(Dataset).where(Dataset.id == dataset_id).options(*DATASET_PROMPTS.options()))
         dataset = result.scalar()
 
         if not dataset:
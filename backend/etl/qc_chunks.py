@@ -10,11 +10,14 @@ from rich import print as rprint
 from dotenv import load_dotenv
 
 # Импортируем модели и соединение с БД из централизованных модулей
-from models.models import Chunk, Page, Link, DatasetSettings
+from models.models import Chunk, DatasetSettings
+from models.profiles import CHUNK_QC
 from core.db import async_session_maker
+from etl.llm import chat_completion, is_json
+from etl.llm_cache import cache
 
 load_dotenv()
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
 
 async def run_qc(dataset_id: int):
     async with async_session_maker() as session:
@@ -27,9 +30,8 @@ async def run_qc(dataset_id: int):
         # Берём 10 случайных чанков
         result = await session.execute(
             select(Chunk)
-            .join(Page, Page.id == Chunk.page_id)
-            .join(Link, Link.id == Page.link_id)
-            .where(Link.dataset_id == dataset_id)
+            .where(Chunk.dataset_id == dataset_id)
+            .options(*CHUNK_QC.options())
             .order_by(func.random())
             .limit(10)
         )
@@ -58,8 +60,8 @@ async def run_qc(dataset_id: int):
 
         # GPT вызов
         rprint(f"[bold magenta]🤖 Модель:[/bold magenta] {model}")
-        response = await client.chat.completions.create(model=model, messages=prompt)
-        reply = response.choices[0].message.content.strip()
+        reply = (await chat_completion(client, model=model, messages=prompt, validate=is_json)).strip()
+        rprint(cache.report())
 
         try:
             parsed = json.loads(reply)
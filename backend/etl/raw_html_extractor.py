@@ -3,155 +3,200 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import asyncio
-import aiohttp
-import trafilatura
-from bs4 import BeautifulSoup
-from dateutil import parser as dateparser
-from langdetect import detect
-import re
 from datetime import datetime
 
 from sqlalchemy.future import select
 
 # Импортируем модели и соединение с БД из централизованных модулей
 from models.models import Link, Page
+from models.profiles import LINK_FETCH
 from core.db import async_session_maker
-
-# ======= HELPERS =======
-def parse_custom_date(date_str):
-    try:
-        date_str = ' '.join(date_str.split())
-        date_str = re.sub(r'^(Updated|Published|Posted|Date):?\s*', '', date_str)
-        return dateparser.parse(date_str)
-    except Exception:
-        return None
-
-def parse_meta(html, url):
-    soup = BeautifulSoup(html, 'lxml')
-    data = {
-        'url': url,
-        'title': '',
-        'raw_date': '',
-        'raw_author': '',
-        'raw_category': '',
-        'language': '',
-        'meta_data': {}
-    }
-
-    # Title
-    if soup.title and soup.title.string:
-        data['title'] = soup.title.string.strip()
-        data['meta_data']['title_source'] = 'title'
-
-    # Date
-    meta_date = soup.find('meta', property='article:published_time')
-    if meta_date and meta_date.get('content'):
-        parsed = parse_custom_date(meta_date['content'])
-        if parsed:
-            data['raw_date'] = parsed.isoformat()
-            data['meta_data']['date_source'] = 'article:published_time'
-
-    # Author
-    meta_author = soup.find('meta', attrs={'name': 'author'})
-    if meta_author and meta_author.get('content'):
-        data['raw_author'] = meta_author['content'].strip()
-        data['meta_data']['author_source'] = 'meta[name=author]'
-
-    # Category
-    meta_category = soup.find('meta', attrs={'name': 'category'})
-    if meta_category and meta_category.get('content'):
-        data['raw_category'] = meta_category['content'].strip()
-        data['meta_data']['category_source'] = 'meta[name=category]'
-
-    # Language
-    html_lang = soup.find('html')
-    if html_lang and html_lang.get('lang'):
-        data['language'] = html_lang['lang'].split('-')[0]
-        data['meta_data']['language_source'] = 'html[lang]'
-    else:
-        try:
-            body = trafilatura.extract(html) or ''
-            data['language'] = detect(body)
-            data['meta_data']['language_source'] = 'langdetect'
-        except Exception as e:
-            data['meta_data']['language_error'] = str(e)
-
-    return data
-
-async def fetch_html(session, url):
-    headers = {
-        'User-Agent': 'Mozilla/5.0',
-    }
-    try:
-        async with session.get(url, headers=headers, timeout=30) as resp:
-            html = await resp.text()
-            return resp.status, html
-    except Exception as e:
-        print(f"[ERROR] {url}: {e}")
-        return None, None
+from blobstore import get_blob_store, pack_html
+from etl.extraction import extract_page
+from etl.fetcher import Fetcher, make_session
+from etl.jobqueue import complete, enqueue, fail, iter_claimed, seed
+from etl.workers import CPU_WORKERS, make_process_pool, run_in_pool, run_supervised
+
+MAX_IN_FLIGHT = 32          # общий лимит запросов «в полёте»
+PER_HOST_CONCURRENCY = 2    # одновременных запросов к одному хосту
+PER_HOST_RATE = 1.0         # запросов в секунду на хост
+PARSE_QUEUE_SIZE = 64       # скачанные страницы, ждущие парсинга
+PERSIST_QUEUE_SIZE = 64     # распарсенные страницы, ждущие записи в БД
+PERSIST_BATCH = 20          # страниц на один commit
+FETCH_CLAIM = 200           # ссылок на один захват из очереди jobs
+
+# ======= STAGES =======
+def parse_and_pack(html, url):
+    # Один заход в пул: метаданные + clean_text и сжатый raw HTML для хранилища blob-ов
+    return extract_page(html, url), pack_html(html)
+
+def build_page(link, url, raw_html_sha, meta):
+    # --- Review эвристики
+    author_needs_review = not meta['raw_author'] or meta['raw_author'].isdigit()
+    # Непустую дату разбирает meta_cleaner (etl/date_normalizer.py) и сам решает про ревью
+    date_needs_review = not meta['raw_date']
+    category_needs_review = not meta.get('raw_category')
+
+    return Page(
+        link_id=link.id,
+        url=url,
+        title=meta['title'],
+        raw_html_sha=raw_html_sha,
+        raw_author=meta['raw_author'],
+        raw_date=meta['raw_date'],
+        raw_category=meta['raw_category'],
+        meta_data=meta['meta_data'],
+        clean_text=meta['clean_text'] or None,
+        clean_author=None,
+        clean_date=None,
+        clean_category=None,
+        author_needs_review=author_needs_review,
+        date_needs_review=date_needs_review,
+        category_needs_review=category_needs_review,
+    )
+
+async def parse_worker(pool, parse_queue, persist_queue):
+    # Парсинг (метаданные + clean_text за один проход) идёт в пуле процессов,
+    # event loop только ждёт результат
+    while True:
+        item = await parse_queue.get()
+        if item is None:
+            return
+        link, status, html = item
+        meta = packed = None
+        if html and status == 200:
+            try:
+                meta, packed = await run_in_pool(pool, parse_and_pack, html, link.url)
+            except Exception as e:
+                print(f"  ❌ Ошибка парсинга {link.url}: {e}")
+                status = "error_parse"
+        # Дальше по конвейеру идёт сжатый HTML, а не исходная строка
+        await persist_queue.put((link, status, packed, meta))
+
+def is_permanent(status):
+    # 4xx (кроме таймаута и лимита) повтором не лечится — задачу закрываем, ссылка остаётся error_fetch
+    return isinstance(status, int) and 400 <= status < 500 and status not in (408, 429)
+
+async def persist_worker(db, persist_queue, dataset_id, on_saved=None):
+    # Единственный писатель в сессию; коммитим пачками вместе с отчётом в очередь jobs.
+    # on_saved(page_ids) — следующей стадии (etl/orchestrator.py) после каждого commit
+    saved = 0
+    stop = False
+    while not stop:
+        item = await persist_queue.get()
+        if item is None:
+            break
+        batch = [item]
+        while len(batch) < PERSIST_BATCH and not persist_queue.empty():
+            item = persist_queue.get_nowait()
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+
+        pages = []
+        blobs = []
+        done = []
+        failed = {}  # ошибка → id ссылок
+        for link, status, packed, meta in batch:
+            link.last_attempt_at = datetime.utcnow()
+            if status == "error_parse":
+                link.status = "error_parse"
+                failed.setdefault("parse error", []).append(link.id)
+                continue
+            link.http_code = status
+            if meta is None:
+                link.status = "error_fetch"
+                print(f"  ❌ Ошибка загрузки: {link.url}")
+                if is_permanent(status):
+                    done.append(link.id)
+                else:
+                    failed.setdefault(f"fetch error: HTTP {status}", []).append(link.id)
+                continue
+            page = build_page(link, link.url, packed.sha, meta)
+            db.add(page)
+            pages.append(page)
+            blobs.append(packed)
+            done.append(link.id)
+            link.status = "fetched"
+            saved += 1
+            print(f"  ✅ Сохранено: {meta['title'][:60] if meta['title'] else link.url[:60]}")
+
+        await get_blob_store().put_many(db, blobs)
+        await db.flush()
+        page_ids = [page.id for page in pages]
+        await enqueue(db, "chunk", dataset_id, page_ids)
+        await complete(db, "fetch", done)
+        for error, link_ids in failed.items():
+            await fail(db, "fetch", link_ids, error)
+        await db.commit()
+        if on_saved and page_ids:
+            await on_saved(page_ids)
+    return saved
+
+async def fetch_links(db, dataset_id, links, fetcher, pool, on_saved=None):
+    # fetch → parse → persist для одной захваченной пачки, между стадиями ограниченные очереди
+    parse_queue = asyncio.Queue(maxsize=PARSE_QUEUE_SIZE)
+    persist_queue = asyncio.Queue(maxsize=PERSIST_QUEUE_SIZE)
+
+    async def on_fetched(link, status, html):
+        await parse_queue.put((link, status, html))
+
+    parsers = [
+        asyncio.create_task(parse_worker(pool, parse_queue, persist_queue))
+        for _ in range(CPU_WORKERS)
+    ]
+    persister = asyncio.create_task(persist_worker(db, persist_queue, dataset_id, on_saved))
+
+    async def drive():
+        await fetcher.run(links, on_fetched, url_of=lambda link: link.url)
+        for _ in parsers:
+            await parse_queue.put(None)
+        await asyncio.gather(*parsers)
+        await persist_queue.put(None)
+        return await persister
+
+    # Упавший парсер или писатель не должен оставить скачивание висеть на полной очереди
+    return await run_supervised(drive(), [*parsers, persister])
 
 # ======= MAIN =======
-async def main(dataset_id: int):
+async def main(dataset_id: int, on_saved=None, pool=None):
     print(f"🔍 Загружаем queued ссылки для dataset_id={dataset_id} ...")
     async with async_session_maker() as db:
-        result = await db.execute(
-            select(Link).where(Link.dataset_id == dataset_id, Link.status == "queued")
-        )
-        links = result.scalars().all()
-
-        if not links:
-            print("⚠️ Нет queued ссылок для обработки.")
-            return
-
-        print(f"🕸️ Всего ссылок для скачивания: {len(links)}")
-        timeout = aiohttp.ClientTimeout(total=60)
-        connector = aiohttp.TCPConnector(limit=5, ssl=False)
-
-        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
-            for link in links:
-                url = link.url
-                print(f"➡️ Качаю: {url}")
-                status, html = await fetch_html(session, url)
-                link.last_attempt_at = datetime.utcnow()
-                link.http_code = status
-
-                if not html or status != 200:
-                    link.status = "error_fetch"
-                    await db.commit()
-                    print(f"  ❌ Ошибка загрузки")
-                    continue
-
-                meta = parse_meta(html, url)
-
-                # --- Review эвристики
-                author_needs_review = not meta['raw_author'] or meta['raw_author'].isdigit()
-                date_needs_review = not meta['raw_date'] or "T" not in meta['raw_date']
-                category_needs_review = not meta.get('raw_category')
-
-                page = Page(
-                    link_id=link.id,
-                    url=url,
-                    title=meta['title'],
-                    raw_html=html,
-                    raw_author=meta['raw_author'],
-                    raw_date=meta['raw_date'],
-                    raw_category=meta['raw_category'],
-                    meta_data=meta['meta_data'],
-                    clean_text=None,
-                    clean_author=None,
-                    clean_date=None,
-                    clean_category=None,
-                    author_needs_review=author_needs_review,
-                    date_needs_review=date_needs_review,
-                    category_needs_review=category_needs_review,
-                )
-                db.add(page)
-                link.status = "fetched"
-                await db.commit()
-                print(f"  ✅ Сохранено: {meta['title'][:60] if meta['title'] else url[:60]}")
-                await asyncio.sleep(1)
-
+        # Ссылки, добавленные в обход _insert_links, тоже получают задачи
+        await seed(db, "fetch", dataset_id, select(Link.id).where(Link.dataset_id == dataset_id, Link.status == "queued"))
+        await db.commit()
+
+    claimed = 0
+    saved = 0
+    own_pool = pool is None
+    pool = pool or make_process_pool()
+    try:
+        async with make_session(MAX_IN_FLIGHT, PER_HOST_CONCURRENCY) as session:
+            fetcher = Fetcher(
+                session,
+                max_in_flight=MAX_IN_FLIGHT,
+                per_host_concurrency=PER_HOST_CONCURRENCY,
+                per_host_rate=PER_HOST_RATE,
+            )
+            # Ссылки берутся пачками из очереди jobs: параллельный воркер получит другие
+            async for link_ids in iter_claimed("fetch", dataset_id, FETCH_CLAIM):
+                claimed += len(link_ids)
+                print(f"🕸️ Захвачено ссылок: {len(link_ids)} (всего {claimed})")
+                async with async_session_maker() as db:
+                    result = await db.execute(select(Link).where(Link.id.in_(link_ids)).options(*LINK_FETCH.options()))
+                    saved += await fetch_links(db, dataset_id, result.scalars().all(), fetcher, pool, on_saved)
+    finally:
+        if own_pool:
+            pool.shutdown()
+
+    if not claimed:
+        print("⚠️ Нет queued ссылок для обработки.")
+        return 0
+
+    print(f"🌐 Хостов: {len(fetcher.hosts)}, сохранено страниц: {saved}")
     print("✅ Все ссылки обработаны!")
+    return saved
 
 if __name__ == "__main__":
     import sys
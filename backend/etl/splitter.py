@@ -0,0 +1,30 @@
+"""splitter.py
+
+Общая фабрика сплиттеров для чанкера и API-превью.
+
+Построение TextSplitter (загрузка BPE tiktoken) дорогое, поэтому экземпляры
+кэшируются по (модель токенизатора, chunk_size, chunk_overlap) — в каждом процессе свой кэш.
+"""
+
+import re
+from functools import lru_cache
+
+from semantic_text_splitter import TextSplitter
+
+TOKENIZER_MODEL = "gpt-3.5-turbo"
+DEFAULT_CHUNK_SIZE = 512
+DEFAULT_CHUNK_OVERLAP = 50
+
+
+def flatten(text):
+    return re.sub(r'\s+', ' ', text.replace('\n', ' ')).strip()
+
+
+@lru_cache(maxsize=32)
+def get_splitter(model: str, chunk_size: int, chunk_overlap: int) -> TextSplitter:
+    # ValueError, если overlap >= chunk_size
+    return TextSplitter.from_tiktoken_model(model, chunk_size, overlap=chunk_overlap)
+
+
+def split_text(text, model, chunk_size, chunk_overlap):
+    return get_splitter(model, chunk_size, chunk_overlap).chunks(flatten(text))
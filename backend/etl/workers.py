@@ -0,0 +1,42 @@
+"""workers.py
+
+Пул процессов для CPU-тяжёлых шагов ETL (парсинг HTML и т.п.),
+чтобы они не блокировали event loop со скачиванием и записью в БД.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+CPU_WORKERS = os.cpu_count() or 1
+
+
+def make_process_pool(workers: int | None = None, initializer=None, initargs=()) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=workers or CPU_WORKERS,
+        initializer=initializer,
+        initargs=initargs,
+    )
+
+
+async def run_in_pool(pool, fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, fn, *args)
+
+
+async def run_supervised(driver, tasks):
+    """driver — корутина, которая ведёт стадии (кормит очереди, ставит sentinel, ждёт воркеров);
+    tasks — задачи воркеров. Первая ошибка в любой из них отменяет остальные и пробрасывается:
+    иначе соседи навсегда встают на полной очереди."""
+    main = asyncio.ensure_future(driver)
+    everything = [main, *tasks]
+    try:
+        done, _ = await asyncio.wait(everything, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+        return main.result()
+    finally:
+        for task in everything:
+            task.cancel()
+        await asyncio.gather(*everything, return_exceptions=True)
@@ -23,6 +23,7 @@ print(f"🚨 DATABASE_URL = {DATABASE_URL}")
 
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy import func
 from sqlalchemy.future import select
 from models import Dataset, Link, Chunk, Embedding, Page, DatasetSettings
 from etl.insert_links import _insert_links
@@ -76,6 +77,7 @@ def run_stage(script: str, args: list[str]):
         "raw_html_extractor": "📅 Скачивание",
         "clean_text_extractor": "🧹 Очистка",
         "chunker": "🧹 Чанки",
+        "deduper": "🔄 Дубли",
         "qc_chunks": "🪪 QC",
         "meta_cleaner": "🧼 Метаданные",
         "enricher": "🧠 Обогащение",
@@ -92,22 +94,25 @@ def run_stage(script: str, args: list[str]):
 
 async def print_summary(dataset_id: int):
     async with Session() as session:
-        links = (await session.execute(select(Link).where(Link.dataset_id == dataset_id))).scalars().all()
-        chunks = (await session.execute(
-            select(Chunk).join(Chunk.page).join(Page.link).where(Link.dataset_id == dataset_id)
-        )).scalars().all()
-        embeddings = (await session.execute(
-            select(Embedding).join(Embedding.chunk).join(Chunk.page).join(Page.link).where(Link.dataset_id == dataset_id)
-        )).scalars().all()
-
-        bad_links = [l for l in links if l.status == "error_fetch"]
+        # Только счётчики: ни векторы, ни тексты для сводки не нужны
+        links = await session.scalar(select(func.count(Link.id)).where(Link.dataset_id == dataset_id))
+        bad_links = await session.scalar(
+            select(func.count(Link.id)).where(Link.dataset_id == dataset_id, Link.status == "error_fetch")
+        )
+        chunks = await session.scalar(
+            select(func.count(Chunk.id)).where(Chunk.dataset_id == dataset_id)
+        )
+        embeddings = await session.scalar(
+            select(func.count(Embedding.chunk_id)).where(Embedding.dataset_id == dataset_id)
+        )
+
         print(f"""
 📊 Результаты пайплайна
 🗂 Dataset ID:      {dataset_id}
-🔗 Ссылок всего:    {len(links)}
-❌ Ошибок fetch:     {len(bad_links)}
-🧹 Чанков:          {len(chunks)}
-📈 Эмбеддингов:     {len(embeddings)}
+🔗 Ссылок всего:    {links}
+❌ Ошибок fetch:     {bad_links}
+🧹 Чанков:          {chunks}
+📈 Эмбеддингов:     {embeddings}
 """)
 
 async def main():
@@ -118,6 +123,7 @@ async def main():
         run_stage("raw_html_extractor", [str(dataset_id)])
         run_stage("clean_text_extractor", [str(dataset_id)])
         run_stage("chunker", [str(dataset_id)])
+        run_stage("deduper", [str(dataset_id)])
         run_stage("qc_chunks", [str(dataset_id)])
         run_stage("meta_cleaner", [str(dataset_id)])
         run_stage("enricher", [str(dataset_id)])
@@ -3,7 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 # Импорт роутеров
-from api.routes import users, auth, links, pages, chunks, embeddings, datasets
+from api.routes import users, auth, links, pages, chunks, embeddings, datasets, search
 
 app = FastAPI(title="CCE API")
 
@@ -24,6 +24,7 @@ app.include_router(pages.router, prefix="/api")
 app.include_router(chunks.router, prefix="/api")
 app.include_router(embeddings.router, prefix="/api")
 app.include_router(datasets.router, prefix="/api")
+app.include_router(search.router, prefix="/api")
 
 @app.get("/")
 async def root():
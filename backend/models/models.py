@@ -1,9 +1,10 @@
 from sqlalchemy import (
-    Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON
+    Column, Integer, BigInteger, String, Text, DateTime, ForeignKey, Boolean, JSON, Index,
+    LargeBinary, UniqueConstraint, text, event, DDL
 )
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.orm import backref, declarative_base, deferred, relationship
 from sqlalchemy.sql import func
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from pgvector.sqlalchemy import Vector
 
 Base = declarative_base()
@@ -26,10 +27,14 @@ class Dataset(Base):
     state = Column(String(20), server_default="new", nullable=False)
     last_run_at = Column(DateTime(timezone=True))
     error_count = Column(Integer, server_default='0', nullable=False)
+    # Растёт при каждой записи чанков/векторов стадиями ETL: по нему снимок NumpyIndex
+    # (search/numpy_index.py) понимает, что устарел, не перечитывая датасет
+    index_version = Column(BigInteger, server_default='0', nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
-    user = relationship("User", backref="datasets", lazy="selectin")
-    settings = relationship("DatasetSettings", back_populates="dataset", uselist=False, lazy="selectin")
+    # Связи не грузятся сами: что нужно маршруту или стадии — в models/profiles.py
+    user = relationship("User", backref=backref("datasets", lazy="raise"), lazy="raise")
+    settings = relationship("DatasetSettings", back_populates="dataset", uselist=False, lazy="raise")
 
 class DatasetSettings(Base):
     __tablename__ = "dataset_settings"
@@ -42,10 +47,14 @@ class DatasetSettings(Base):
     gpt_model = Column(String(32), default="gpt-3.5-turbo", nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
-    dataset = relationship("Dataset", back_populates="settings", lazy="selectin")
+    dataset = relationship("Dataset", back_populates="settings", lazy="raise")
 
 class Link(Base):
     __tablename__ = "links"
+    __table_args__ = (
+        # Ссылки датасета и очередь fetch (status = 'queued')
+        Index("ix_links_dataset_status", "dataset_id", "status"),
+    )
     id = Column(Integer, primary_key=True)
     dataset_id = Column(Integer, ForeignKey("datasets.id"), nullable=False)
     url = Column(Text, nullable=False)
@@ -54,15 +63,21 @@ class Link(Base):
     last_attempt_at = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
-    dataset = relationship("Dataset", backref="links", lazy="selectin")
+    dataset = relationship("Dataset", backref=backref("links", lazy="raise"), lazy="raise")
 
 class Page(Base):
     __tablename__ = "pages"
+    __table_args__ = (
+        Index("ix_pages_link_id", "link_id"),
+    )
     id = Column(Integer, primary_key=True)
     link_id = Column(Integer, ForeignKey("links.id"), nullable=False)
     url = Column(Text, nullable=False)
     title = Column(Text, nullable=True)
-    raw_html = Column(Text, nullable=False)
+    # HTML лежит сжатым в хранилище blob-ов (blobstore/) по адресу raw_html_sha.
+    # Старая колонка — только для ещё не перенесённых строк; не грузится с объектом.
+    raw_html = deferred(Column(Text))
+    raw_html_sha = Column(String(64))
     clean_text = Column(Text)
     raw_author = Column(Text)
     clean_author = Column(Text)
@@ -74,29 +89,130 @@ class Page(Base):
     clean_category = Column(Text)
     category_needs_review = Column(Boolean, server_default='false', nullable=False)
     meta_data = Column(JSONB, server_default='{}', nullable=False)
+    chunk_hash = Column(String(32))  # md5(clean_text + настройки чанкера) на момент последнего чанкирования
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
-    link = relationship("Link", backref="pages", lazy="selectin")
+    link = relationship("Link", backref=backref("pages", lazy="raise"), lazy="raise")
+
+class PageBlob(Base):
+    # Бэкенд "db" хранилища blob-ов: zstd-сжатый HTML, ключ — sha256 исходного HTML
+    __tablename__ = "page_blobs"
+    sha = Column(String(64), primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    size = Column(Integer, nullable=False)  # байт до сжатия
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
 class Chunk(Base):
     __tablename__ = "chunks"
+    __table_args__ = (
+        Index("ix_chunks_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_chunks_page_id", "page_id"),
+        # Keyset по датасету (deduper, qc, поиск) и выбор работы стадий — только по индексу
+        Index("ix_chunks_dataset_id", "dataset_id", "id"),
+        Index("ix_chunks_canonical", "dataset_id", "id", postgresql_where=text("duplicate_of IS NULL")),
+        Index(
+            "ix_chunks_pending_enrich", "dataset_id", "id",
+            postgresql_where=text("summary IS NULL AND quality IS NULL AND duplicate_of IS NULL"),
+        ),
+    )
     id = Column(Integer, primary_key=True)
     page_id = Column(Integer, ForeignKey("pages.id"), nullable=False)
+    # Копия links.dataset_id страницы: выборки по датасету без соединения chunks → pages → links
+    dataset_id = Column(Integer, ForeignKey("datasets.id", ondelete="CASCADE"), nullable=False)
     chunk_index = Column(Integer, nullable=False)
     chunk_text = Column(Text, nullable=False)
     summary = Column(Text)
     clean_author = Column(String)
     chunk_meta_data = Column(JSONB, server_default='{}', nullable=False)
     quality = Column(String(32))  # был Integer, заменил на строку — потому что ты пишешь 'ok' и 'needs_review'
+    # Почти-дубликат (etl/deduper.py): id канонического чанка; такие не обогащаются и не векторизуются
+    duplicate_of = Column(Integer, ForeignKey("chunks.id", ondelete="SET NULL"))
+    # chunk_text + summary + topics; заполняет триггер (CHUNKS_SEARCH_VECTOR_*), руками не писать
+    search_vector = Column(TSVECTOR)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
-    page = relationship("Page", backref="chunks", lazy="selectin")
+    page = relationship("Page", backref=backref("chunks", lazy="raise"), lazy="raise")
+
+# Конфиг словаря — по языку страницы (pages.meta_data->>'language'): ru → russian, иначе english
+CHUNKS_SEARCH_VECTOR_FUNCTION = """
+CREATE OR REPLACE FUNCTION chunks_search_vector_update() RETURNS trigger AS $$
+DECLARE
+    cfg regconfig;
+    topics text;
+BEGIN
+    SELECT CASE WHEN p.meta_data->>'language' = 'ru' THEN 'russian' ELSE 'english' END::regconfig
+    INTO cfg FROM pages p WHERE p.id = NEW.page_id;
+    IF jsonb_typeof(NEW.chunk_meta_data->'topics') = 'array' THEN
+        SELECT string_agg(t, ' ') INTO topics FROM jsonb_array_elements_text(NEW.chunk_meta_data->'topics') t;
+    END IF;
+    cfg := coalesce(cfg, 'english');
+    NEW.search_vector :=
+        setweight(to_tsvector(cfg, coalesce(NEW.chunk_text, '')), 'A') ||
+        setweight(to_tsvector(cfg, coalesce(NEW.summary, '')), 'B') ||
+        setweight(to_tsvector(cfg, coalesce(topics, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+CHUNKS_SEARCH_VECTOR_TRIGGER = """
+CREATE TRIGGER chunks_search_vector_trigger
+BEFORE INSERT OR UPDATE OF chunk_text, summary, chunk_meta_data ON chunks
+FOR EACH ROW EXECUTE FUNCTION chunks_search_vector_update()
+"""
+
+# Для create_all (init_db.py); в базах под alembic то же делает миграция
+event.listen(Chunk.__table__, "after_create", DDL(CHUNKS_SEARCH_VECTOR_FUNCTION))
+event.listen(Chunk.__table__, "after_create", DDL(CHUNKS_SEARCH_VECTOR_TRIGGER))
 
 class Embedding(Base):
     __tablename__ = "embeddings"
+    __table_args__ = (
+        # HNSW по выражению: у колонки нет размерности, индекс — только для 1536-мерных векторов
+        Index(
+            "ix_embeddings_vector_hnsw",
+            text("(vector::vector(1536)) vector_cosine_ops"),
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_where=text("vector_dims(vector) = 1536"),
+        ),
+        Index("ix_embeddings_dataset_id", "dataset_id", "chunk_id"),
+    )
     chunk_id = Column(Integer, ForeignKey("chunks.id"), primary_key=True)
+    dataset_id = Column(Integer, ForeignKey("datasets.id", ondelete="CASCADE"), nullable=False)  # = chunks.dataset_id
     input = Column(Text, nullable=False)
-    vector = Column(Vector(1536), nullable=False)
+    vector = Column(Vector(), nullable=False)  # размерность задаётся бэкендом датасета (embedding_settings)
     embed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
-    chunk = relationship("Chunk", backref="embedding", lazy="selectin")
\ No newline at end of file
+    chunk = relationship("Chunk", backref=backref("embedding", lazy="raise"), lazy="raise")
+
+class EmbeddingCache(Base):
+    # Один вектор на (модель, sha256 входа) — общий для всех чанков и датасетов с тем же текстом
+    __tablename__ = "embedding_cache"
+    model = Column(String(64), primary_key=True)
+    input_hash = Column(String(64), primary_key=True)
+    vector = Column(Vector(), nullable=False)  # без размерности: у разных моделей она разная
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class Job(Base):
+    # Очередь работы стадий ETL (etl/jobqueue.py): одна строка на (стадия, элемент).
+    # Захват — FOR UPDATE SKIP LOCKED; visible_at — до какого момента строка занята/отложена.
+    __tablename__ = "jobs"
+    __table_args__ = (
+        UniqueConstraint("stage", "item_id", name="uq_jobs_stage_item"),
+        Index(
+            "ix_jobs_claim", "stage", "dataset_id", "visible_at",
+            postgresql_where=text("status IN ('pending', 'running')"),
+        ),
+    )
+    id = Column(BigInteger, primary_key=True)
+    stage = Column(String(32), nullable=False)      # fetch | chunk | enrich | embed
+    dataset_id = Column(Integer, ForeignKey("datasets.id", ondelete="CASCADE"), nullable=False)
+    item_id = Column(Integer, nullable=False)       # links.id / pages.id / chunks.id — по стадии
+    status = Column(String(16), nullable=False, server_default="pending")  # pending | running | done | dead
+    attempts = Column(Integer, nullable=False, server_default="0")
+    visible_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    locked_by = Column(String(128))
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""profiles.py
+
+Профили загрузки ORM-объектов. Связи моделей объявлены с lazy="raise": обращение
+к незагруженной связи — ошибка, а не скрытый запрос (и не каскад chunk → page →
+link → dataset → user на каждую строку). Маршрут или стадия ETL, которой нужны
+объекты, объявляет профиль — какие колонки и какие связи (с их колонками) грузить:
+
+    result = await db.execute(select(Chunk).where(...).options(*CHUNK_RESPONSE.options()))
+
+Колонки вне профиля тоже raise (load_only(..., raiseload=True)): забытое поле видно
+сразу, а не по медленному запросу. Если объект не нужен — хватает select(Model.col, ...).
+Проверка в тестах, что запросы не выходят за профиль, — core/query_guard.py.
+"""
+
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, raiseload, selectinload
+
+from models.models import Chunk, Dataset, DatasetSettings, Embedding, Link, Page, User
+
+
+class Profile(NamedTuple):
+    model: type
+    columns: Tuple[str, ...]
+    relations: Optional[Dict[str, "Profile"]] = None
+
+    def options(self) -> list:
+        """Опции для select(model): свои колонки, связи профиля через selectin, остальное — raise."""
+        opts = [load_only(*[getattr(self.model, name) for name in self.columns], raiseload=True)]
+        for name, nested in (self.relations or {}).items():
+            opts.append(selectinload(getattr(self.model, name)).options(*nested.options()))
+        opts.append(raiseload("*"))
+        return opts
+
+    @property
+    def queries(self) -> int:
+        # Основной запрос + по одному selectin на каждую связь
+        return 1 + sum(nested.queries for nested in (self.relations or {}).values())
+
+    def allowed_columns(self) -> set:
+        """{(таблица, колонка)}, которые может выбрать запрос по профилю: свои колонки, ключи, связи."""
+        mapper = inspect(self.model)
+        table = mapper.local_table
+        allowed = {(table.name, name) for name in self.columns}
+        allowed |= {(table.name, column.name) for column in mapper.primary_key}
+        for name, nested in (self.relations or {}).items():
+            # selectin по связи выбирает ещё и колонки соединения с обеих сторон
+            for left, right in inspect(self.model).relationships[name].local_remote_pairs:
+                allowed |= {(left.table.name, left.name), (right.table.name, right.name)}
+            allowed |= nested.allowed_columns()
+        return allowed
+
+
+# --- API ---------------------------------------------------------------------
+
+USER_AUTH = Profile(User, ("id", "email", "password_hash"))
+
+DATASET_CHUNK_PREVIEW = Profile(
+    Dataset, ("id", "user_id"),
+    {"settings": Profile(DatasetSettings, ("dataset_id", "chunk_size", "chunk_overlap"))},
+)
+DATASET_SETTINGS_EDIT = Profile(
+    DatasetSettings, ("dataset_id", "chunk_size", "chunk_overlap", "summary_prompt", "metadata_targets", "gpt_model")
+)
+
+LINK_RESPONSE = Profile(Link, ("id", "dataset_id", "url", "status", "http_code", "created_at"))
+
+PAGE_ID = Profile(Page, ("id",))
+PAGE_RESPONSE = Profile(Page, (
+    "id", "link_id", "url", "title", "raw_html_sha", "clean_text",
+    "raw_author", "clean_author", "author_needs_review",
+    "raw_date", "clean_date", "date_needs_review",
+    "raw_category", "clean_category", "category_needs_review",
+    "meta_data", "created_at",
+))
+
+CHUNK_ID = Profile(Chunk, ("id",))
+CHUNK_RESPONSE = Profile(Chunk, (
+    "id", "page_id", "chunk_index", "chunk_text", "summary", "clean_author",
+    "chunk_meta_data", "quality", "created_at",
+))
+
+EMBEDDING_ID = Profile(Embedding, ("chunk_id",))
+EMBEDDING_RESPONSE = Profile(Embedding, ("chunk_id", "input", "vector", "embed_at"))
+
+# --- ETL ---------------------------------------------------------------------
+
+LINK_FETCH = Profile(Link, ("id", "url", "status", "http_code", "last_attempt_at"))
+PAGE_CLEAN = Profile(Page, ("id", "url", "clean_text"))
+CHUNK_QC = Profile(Chunk, ("id", "chunk_text"))
+DATASET_PROMPTS = Profile(Dataset, ("id", "name", "description"))
+SETTINGS_CHUNKER = Profile(DatasetSettings, ("dataset_id", "chunk_size", "chunk_overlap"))
+SETTINGS_LLM = Profile(DatasetSettings, ("dataset_id", "summary_prompt", "gpt_model"))
+SETTINGS_EMBED = Profile(DatasetSettings, ("dataset_id",))  # build_input читает только необязательные флаги
@@ -0,0 +1,82 @@
+"""bench_chunker.py
+
+Бенчмарк чанкирования: однопоточный путь против пула процессов (etl/chunker.py).
+
+Страницы собираются из data/chunks.jsonl (чанки склеиваются обратно по url),
+БД не нужна.
+
+Запуск:
+    python scripts/bench_chunker.py                     # все ядра, chunk_size=512
+    python scripts/bench_chunker.py --workers 4 --repeat 5 --chunk-size 300 --overlap 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import tiktoken
+
+from etl.chunker import split_texts
+from etl.splitter import TOKENIZER_MODEL
+from etl.workers import CPU_WORKERS, make_process_pool
+
+DEFAULT_INPUT = Path(__file__).resolve().parent.parent / "data" / "chunks.jsonl"
+
+
+def load_pages(path: Path, repeat: int) -> list[str]:
+    pages: dict[str, list[str]] = {}
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            pages.setdefault(row["url"], []).append(row["chunk_text"])
+    texts = [" ".join(parts) for parts in pages.values()]
+    return texts * repeat
+
+
+async def run(texts: list[str], chunk_size: int, overlap: int, workers: int) -> tuple[float, int]:
+    started = time.perf_counter()
+    if workers > 1:
+        with make_process_pool(workers) as pool:
+            result = await split_texts(texts, chunk_size, overlap, pool)
+    else:
+        result = await split_texts(texts, chunk_size, overlap)
+    return time.perf_counter() - started, sum(len(chunks) for chunks in result)
+
+
+def report(name: str, elapsed: float, pages: int, tokens: int, chunks: int) -> None:
+    print(f"{name:<16} {elapsed:7.2f} c  {pages / elapsed:9.1f} стр/с  {tokens / elapsed:12.0f} ток/с  чанков: {chunks}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark serial vs parallel chunking")
+    parser.add_argument("-i", "--input", default=str(DEFAULT_INPUT), help="chunks.jsonl to rebuild pages from")
+    parser.add_argument("--repeat", type=int, default=3, help="repeat the corpus N times")
+    parser.add_argument("--chunk-size", type=int, default=512)
+    parser.add_argument("--overlap", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=CPU_WORKERS)
+    args = parser.parse_args()
+
+    texts = load_pages(Path(args.input), args.repeat)
+    encoding = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+    tokens = sum(len(encoding.encode(text)) for text in texts)
+    print(f"📚 Страниц: {len(texts)}, токенов: {tokens}, chunk_size={args.chunk_size}, overlap={args.overlap}")
+
+    elapsed, chunks = asyncio.run(run(texts, args.chunk_size, args.overlap, 1))
+    report("1 поток", elapsed, len(texts), tokens, chunks)
+    serial = elapsed
+
+    elapsed, chunks = asyncio.run(run(texts, args.chunk_size, args.overlap, args.workers))
+    report(f"{args.workers} процессов", elapsed, len(texts), tokens, chunks)
+    print(f"🚀 Ускорение: ×{serial / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""bench_embedder.py
+
+Бенчмарк конвейера эмбеддингов (etl/embedder.py) против локального фейкового
+OpenAI (scripts/fake_openai.py). Запись — пустая (null writer), БД не нужна:
+меряется связка «кэш → пакеты по токенам → параллельные запросы → писатель».
+Кэш эмбеддингов — в памяти; --dup-rate задаёт долю повторяющихся входов.
+
+Запуск:
+    python scripts/bench_embedder.py                          # 2000 чанков, latency 200 мс
+    python scripts/bench_embedder.py --chunks 5000 --concurrency 1 8 --batch-tokens 2000 8000
+    python scripts/bench_embedder.py --dup-rate 0.3
+    python scripts/bench_embedder.py --backend local --concurrency 4 --batch-tokens 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from openai import AsyncOpenAI
+
+from etl.embedder import run_pipeline
+from etl.embedding_backends import DEFAULT_LOCAL_MODEL, LocalBackend, OpenAIBackend
+from etl.embedding_cache import CacheStats
+from etl.llm import RateLimiter
+from scripts.fake_openai import start
+
+TEXT = "Пример текста чанка для бенчмарка векторизации, примерно на сотню токенов. " * 6
+
+
+async def items(count: int, dup_rate: float):
+    rnd = random.Random(0)
+    for chunk_id in range(1, count + 1):
+        # Повтор — текст одного из уже встречавшихся чанков
+        source = rnd.randint(1, chunk_id) if rnd.random() < dup_rate else chunk_id
+        yield chunk_id, f"{source} {TEXT}"
+
+
+def make_backend(args: argparse.Namespace, base_url: str):
+    if args.backend == "local":
+        return LocalBackend(args.model or DEFAULT_LOCAL_MODEL, batch_size=args.local_batch)
+    client = AsyncOpenAI(api_key="sk-bench", base_url=base_url, max_retries=0)
+    # Лимиты API не должны влиять на замер
+    return OpenAIBackend(client, limiter=RateLimiter(rpm=10**9, tpm=10**12))
+
+
+async def run(backend, chunks: int, concurrency: int, batch_tokens: int,
+              dup_rate: float) -> tuple[float, int, CacheStats]:
+    memory_cache: dict = {}
+    stats = CacheStats()
+
+    async def lookup(hashes):
+        return {h: memory_cache[h] for h in hashes if h in memory_cache}
+
+    async def null_write(rows, fresh) -> None:
+        memory_cache.update(fresh)
+
+    started = time.perf_counter()
+    _, done = await run_pipeline(
+        items(chunks, dup_rate), null_write, backend,
+        concurrency=concurrency, batch_tokens=batch_tokens,
+        lookup=lookup, stats=stats,
+    )
+    elapsed = time.perf_counter() - started
+    return elapsed, done, stats
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    runner, base_url = await start(latency=args.latency / 1000, dims=args.dims)
+    try:
+        print(f"{'concurrency':>11} {'batch_tok':>9} {'время':>8} {'векторов/с':>11}")
+        for concurrency in args.concurrency:
+            for batch_tokens in args.batch_tokens:
+                backend = make_backend(args, base_url)
+                try:
+                    elapsed, done, stats = await run(backend, args.chunks, concurrency, batch_tokens, args.dup_rate)
+                finally:
+                    await backend.close()
+                    if isinstance(backend, OpenAIBackend):
+                        await backend.client.close()
+                print(f"{concurrency:>11} {batch_tokens:>9} {elapsed:7.2f}c {done / elapsed:11.1f}")
+        if args.dup_rate:
+            print(stats.report())
+        print(f"📊 Fake API: {runner.app['stats']}")
+    finally:
+        await runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the embedding pipeline against a fake endpoint")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=200, help="fake API latency in ms")
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--batch-tokens", type=int, nargs="+", default=[2000, 8000])
+    parser.add_argument("--backend", choices=["openai", "local"], default="openai",
+                        help="openai — fake endpoint; local — sentence-transformers on CPU")
+    parser.add_argument("--model", help="local model name")
+    parser.add_argument("--local-batch", type=int, default=64, help="local model batch size")
+    parser.add_argument("--dup-rate", type=float, default=0.0, help="share of chunks repeating an earlier input")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""bench_fetcher.py
+
+Бенчмарк движка скачивания (etl/fetcher.py) на локальных aiohttp-серверах.
+
+Каждый «хост» — отдельный порт на 127.0.0.1 со своей задержкой ответа.
+
+Запуск:
+    python scripts/bench_fetcher.py                          # 8 хостов по 50 страниц, 50 мс
+    python scripts/bench_fetcher.py --hosts 4 --latency 20,200 --rate 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from aiohttp import web
+
+from etl.fetcher import Fetcher, make_session
+
+PAGE = "<html lang='ru'><head><title>bench</title></head><body>" + "<p>текст</p>" * 200 + "</body></html>"
+
+
+async def start_host(latency: float) -> tuple[web.AppRunner, int]:
+    async def handler(request):
+        await asyncio.sleep(latency)
+        return web.Response(text=PAGE, content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, port
+
+
+async def bench(args) -> None:
+    latencies = [float(x) / 1000 for x in args.latency.split(",")]
+    runners, urls = [], []
+    for i in range(args.hosts):
+        runner, port = await start_host(latencies[i % len(latencies)])
+        runners.append(runner)
+        urls += [f"http://127.0.0.1:{port}/page/{n}" for n in range(args.pages)]
+
+    # Перемешиваем, как в реальном списке ссылок
+    urls = [u for n in range(args.pages) for u in urls[n::args.pages]]
+
+    fetched = 0
+
+    async def on_result(url, status, html):
+        nonlocal fetched
+        if status == 200:
+            fetched += 1
+
+    try:
+        async with make_session(args.in_flight, args.per_host) as session:
+            fetcher = Fetcher(
+                session,
+                max_in_flight=args.in_flight,
+                per_host_concurrency=args.per_host,
+                per_host_rate=args.rate,
+                per_host_burst=args.burst,
+            )
+            started = time.perf_counter()
+            await fetcher.run(urls, on_result)
+            elapsed = time.perf_counter() - started
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+    print(f"🌐 Хостов: {args.hosts}, страниц: {len(urls)}, успешно: {fetched}")
+    print(f"⏱️  {elapsed:.2f} c → {fetched / elapsed:.1f} стр/с")
+    print(f"📏 Потолок по бюджету: {args.hosts * args.rate:.1f} стр/с (rate × хосты)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark concurrent fetcher against local servers")
+    parser.add_argument("--hosts", type=int, default=8, help="number of stand-in hosts")
+    parser.add_argument("--pages", type=int, default=50, help="pages per host")
+    parser.add_argument("--latency", default="50", help="per-host latency in ms, comma separated (cycled)")
+    parser.add_argument("--rate", type=float, default=10.0, help="requests per second per host")
+    parser.add_argument("--burst", type=float, default=1.0, help="token bucket capacity per host")
+    parser.add_argument("--per-host", type=int, default=2, help="concurrent requests per host")
+    parser.add_argument("--in-flight", type=int, default=32, help="global in-flight limit")
+    asyncio.run(bench(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""bench_search.py
+
+Бенчмарк поиска в памяти (search/numpy_index.py) на синтетических векторах, без Postgres:
+точный float32, int8 и IVF — задержка на запрос, пакетная пропускная способность,
+recall@k относительно точного поиска и занимаемая память.
+
+Векторы — смесь гауссовых кластеров (ближе к реальным эмбеддингам, чем равномерный шум).
+
+Запуск:
+    python scripts/bench_search.py                              # 100k × 384
+    python scripts/bench_search.py --rows 1000000 --dims 1536 --nlist 1024 --nprobe 8 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://bench@localhost/bench")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import numpy as np
+
+from search.numpy_index import NumpyIndex
+
+
+def make_data(rows: int, dims: int, queries: int, clusters: int = 256, seed: int = 0):
+    rnd = np.random.default_rng(seed)
+    centers = rnd.standard_normal((clusters, dims), dtype=np.float32)
+    labels = rnd.integers(clusters, size=rows)
+    vectors = centers[labels] + 0.6 * rnd.standard_normal((rows, dims), dtype=np.float32)
+    query_labels = rnd.integers(clusters, size=queries)
+    query_vectors = centers[query_labels] + 0.6 * rnd.standard_normal((queries, dims), dtype=np.float32)
+    return vectors, query_vectors
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def measure(name: str, index: NumpyIndex, queries: np.ndarray, k: int, truth, nprobe=None) -> np.ndarray:
+    # Одиночные запросы — через общий async-интерфейс, как в API
+    async def single():
+        started = time.perf_counter()
+        for query in queries:
+            await index.search(index.dataset_id, query, k, ef_search=nprobe)
+        return (time.perf_counter() - started) * 1000 / len(queries)
+
+    single_ms = asyncio.run(single())
+
+    started = time.perf_counter()
+    found, _ = index.search_batch(queries, k, nprobe=nprobe)
+    batch_qps = len(queries) / (time.perf_counter() - started)
+
+    rec = recall(found, truth) if truth is not None else 1.0
+    print(f"{name:<22} {single_ms:9.3f} мс/запрос  {batch_qps:10.0f} запр/с пакетом  "
+          f"recall@{k}={rec:.3f}  {index.nbytes / 2**20:8.1f} МБ")
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the in-memory NumPy search engine")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dims", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=256, help="IVF lists (0 — no IVF)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16])
+    args = parser.parse_args()
+
+    vectors, queries = make_data(args.rows, args.dims, args.queries)
+    ids = np.arange(1, args.rows + 1)
+    print(f"📦 {args.rows} векторов × {args.dims}, {args.queries} запросов, k={args.k}")
+
+    exact = NumpyIndex.build(1, ids, vectors)
+    truth = measure("float32 точный", exact, queries, args.k, None)
+
+    int8 = NumpyIndex.build(1, ids, vectors, dtype="int8")
+    measure("int8 точный", int8, queries, args.k, truth)
+
+    # Снимок на диске и подъём через memmap
+    with tempfile.TemporaryDirectory() as path:
+        started = time.perf_counter()
+        exact.save(path)
+        saved = time.perf_counter() - started
+        started = time.perf_counter()
+        mapped = NumpyIndex.load(path)
+        print(f"💾 снимок: запись {saved:.2f} c, открытие memmap {(time.perf_counter() - started) * 1000:.1f} мс")
+        measure("float32 memmap", mapped, queries, args.k, truth)
+        del mapped
+
+    if args.nlist:
+        started = time.perf_counter()
+        ivf = NumpyIndex.build(1, ids, vectors, nlist=args.nlist)
+        print(f"🧭 IVF nlist={args.nlist}: построение {time.perf_counter() - started:.2f} c")
+        for nprobe in args.nprobe:
+            measure(f"IVF nprobe={nprobe}", ivf, queries, args.k, truth, nprobe=nprobe)
+
+
+if __name__ == "__main__":
+    main()
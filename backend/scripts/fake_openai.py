@@ -0,0 +1,149 @@
+"""fake_openai.py
+
+Локальный фейковый OpenAI-совместимый сервер для прогона ETL без сети и без затрат.
+
+Поддерживает:
+* POST /v1/chat/completions — отвечает JSON {"summary", "topics"} как ждёт enricher
+  (на пакетный промпт с "### chunk_id=N" — массивом по каждому chunk_id);
+* POST /v1/embeddings       — детерминированные нормированные векторы (учитывает "dimensions");
+* GET  /stats               — счётчики запросов.
+
+Умеет имитировать задержку и ошибки 429/500 (с Retry-After).
+
+Запуск:
+    python scripts/fake_openai.py --port 8089 --latency 200 --error-rate 0.1
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 python etl/enricher.py 1
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+
+from aiohttp import web
+
+SUMMARY = "Фейковое резюме фрагмента текста, достаточно длинное, чтобы пройти проверку качества в enricher."
+TOPICS = ["маркетинг", "контент", "соцсети"]
+
+
+def fake_vector(text: str, dims: int) -> list[float]:
+    rnd = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vec = [rnd.gauss(0, 1) for _ in range(dims)]
+    norm = math.sqrt(sum(x * x for x in vec)) or 1.0
+    return [x / norm for x in vec]
+
+
+def chat_content(prompt: str) -> str:
+    chunk_ids = [int(x) for x in re.findall(r"### chunk_id=(\d+)", prompt)]
+    if chunk_ids:
+        return json.dumps(
+            [{"chunk_id": chunk_id, "summary": SUMMARY, "topics": TOPICS} for chunk_id in chunk_ids],
+            ensure_ascii=False,
+        )
+    return json.dumps({"summary": SUMMARY, "topics": TOPICS}, ensure_ascii=False)
+
+
+def make_app(latency: float = 0.0, error_rate: float = 0.0, dims: int = 1536) -> web.Application:
+    stats = {"chat": 0, "embeddings": 0, "inputs": 0, "errors": 0}
+
+    async def maybe_fail():
+        await asyncio.sleep(latency)
+        if error_rate and random.random() < error_rate:
+            stats["errors"] += 1
+            if random.random() < 0.5:
+                return web.json_response(
+                    {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                    status=429, headers={"Retry-After": "0.1"},
+                )
+            return web.json_response({"error": {"message": "Internal error", "type": "server_error"}}, status=500)
+        return None
+
+    async def chat(request):
+        body = await request.json()
+        failed = await maybe_fail()
+        if failed is not None:
+            return failed
+        stats["chat"] += 1
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        content = chat_content(prompt)
+        prompt_tokens = len(prompt) // 3 + 1
+        completion_tokens = len(content) // 3 + 1
+        return web.json_response({
+            "id": f"chatcmpl-fake-{stats['chat']}",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    async def embeddings(request):
+        body = await request.json()
+        failed = await maybe_fail()
+        if failed is not None:
+            return failed
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        stats["embeddings"] += 1
+        stats["inputs"] += len(inputs)
+        size = body.get("dimensions") or dims
+        tokens = sum(len(text) // 3 + 1 for text in inputs)
+        return web.json_response({
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_vector(text, size)}
+                for i, text in enumerate(inputs)
+            ],
+            "model": body.get("model", "fake"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    async def get_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/v1/chat/completions", chat)
+    app.router.add_post("/v1/embeddings", embeddings)
+    app.router.add_get("/stats", get_stats)
+    app["stats"] = stats
+    return app
+
+
+async def start(host: str = "127.0.0.1", port: int = 0, **kwargs) -> tuple[web.AppRunner, str]:
+    """Стартует сервер в текущем event loop, возвращает (runner, base_url)."""
+    runner = web.AppRunner(make_app(**kwargs), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{port}/v1"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible server for local ETL runs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=100, help="response latency in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 429/500")
+    parser.add_argument("--dims", type=int, default=1536, help="default embedding dimensions")
+    args = parser.parse_args()
+
+    app = make_app(latency=args.latency / 1000, error_rate=args.error_rate, dims=args.dims)
+    print(f"🤖 Fake OpenAI: http://{args.host}:{args.port}/v1")
+    web.run_app(app, host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
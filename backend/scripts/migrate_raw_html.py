@@ -0,0 +1,133 @@
+"""migrate_raw_html.py
+
+Переносит pages.raw_html в хранилище blob-ов (blobstore/, zstd + sha256) и
+обнуляет старую колонку. Идёт пачками по pages.id с commit на пачку, поэтому
+его можно прерывать и запускать снова; сжатие — в пуле процессов.
+
+Место в таблице pages освобождается после VACUUM FULL pages (или pg_repack).
+
+Запуск:
+    python scripts/migrate_raw_html.py                    # бэкенд из BLOB_STORE, все ядра
+    python scripts/migrate_raw_html.py --batch 200 --workers 4
+    python scripts/migrate_raw_html.py --dry-run          # только посчитать сжатие
+    python scripts/migrate_raw_html.py --restore          # обратно в pages.raw_html (перед downgrade)
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import select, update
+
+from blobstore import get_blob_store, load_page_html, pack_html
+from core.db import async_session_maker
+from etl.workers import CPU_WORKERS, make_process_pool, run_in_pool
+from models.models import Page
+
+DEFAULT_BATCH = 100  # страниц на пачку: сотни КБ HTML на строку
+
+
+def pack_many(htmls: list[str]):
+    # Вызывается в процессе пула
+    return [pack_html(html) for html in htmls]
+
+
+async def migrate(batch_size: int, workers: int, dry_run: bool) -> None:
+    store = get_blob_store()
+    print(f"📦 Хранилище: {store.name}{' (dry run)' if dry_run else ''}")
+    raw_bytes = packed_bytes = pages = 0
+    started = time.perf_counter()
+    last_id = 0
+    with make_process_pool(workers) as pool:
+        async with async_session_maker() as session:
+            while True:
+                result = await session.execute(
+                    select(Page.id, Page.raw_html)
+                    .where(Page.raw_html.isnot(None))
+                    .where(Page.id > last_id)
+                    .order_by(Page.id)
+                    .limit(batch_size)
+                )
+                rows = result.all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+
+                # Пачка режется на части по числу процессов
+                step = max(1, len(rows) // workers)
+                parts = await asyncio.gather(*[
+                    run_in_pool(pool, pack_many, [row.raw_html for row in rows[i:i + step]])
+                    for i in range(0, len(rows), step)
+                ])
+                packed = [blob for part in parts for blob in part]
+
+                raw_bytes += sum(blob.size for blob in packed)
+                packed_bytes += sum(len(blob.data) for blob in packed)
+                pages += len(rows)
+                if not dry_run:
+                    await store.put_many(session, packed)
+                    await session.execute(
+                        update(Page),
+                        [{"id": row.id, "raw_html_sha": blob.sha, "raw_html": None} for row, blob in zip(rows, packed)],
+                    )
+                    await session.commit()
+                print(f"  ✅ страниц: {pages}, {raw_bytes / 2**20:.1f} МБ → {packed_bytes / 2**20:.1f} МБ")
+
+    if not pages:
+        print("✨ Нечего переносить: raw_html уже во внешнем хранилище.")
+        return
+    elapsed = time.perf_counter() - started
+    print(f"🏁 Перенесено {pages} страниц за {elapsed:.1f} c, сжатие ×{raw_bytes / max(packed_bytes, 1):.1f}")
+    if not dry_run:
+        print("🧹 Освободить место в pages: VACUUM FULL pages; (или pg_repack)")
+
+
+async def restore(batch_size: int) -> None:
+    restored = 0
+    last_id = 0
+    async with async_session_maker() as session:
+        while True:
+            result = await session.execute(
+                select(Page.id)
+                .where(Page.raw_html.is_(None))
+                .where(Page.raw_html_sha.isnot(None))
+                .where(Page.id > last_id)
+                .order_by(Page.id)
+                .limit(batch_size)
+            )
+            page_ids = result.scalars().all()
+            if not page_ids:
+                break
+            last_id = page_ids[-1]
+            html = await load_page_html(session, page_ids)
+            missing = set(page_ids) - set(html)
+            if missing:
+                print(f"  ⚠️ Нет blob-ов для страниц: {sorted(missing)}")
+            await session.execute(update(Page), [{"id": page_id, "raw_html": text} for page_id, text in html.items()])
+            await session.commit()
+            restored += len(html)
+            print(f"  ✅ возвращено: {restored}")
+    print(f"🏁 HTML возвращён в pages.raw_html для {restored} страниц")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move pages.raw_html into the compressed blob store")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH)
+    parser.add_argument("--workers", type=int, default=CPU_WORKERS)
+    parser.add_argument("--dry-run", action="store_true", help="measure compression without writing")
+    parser.add_argument("--restore", action="store_true", help="copy HTML back into pages.raw_html")
+    args = parser.parse_args()
+    if args.restore:
+        asyncio.run(restore(args.batch))
+    else:
+        asyncio.run(migrate(args.batch, args.workers, args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
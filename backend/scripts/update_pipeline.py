@@ -3,70 +3,42 @@
 Инкрементально обновляет базу CCE.
 
 Добавлено:
-* Явный список шагов со счётчиком («Step 1/5 …»), чтобы было видно, где скрипт находится.
+* Явный список шагов со счётчиком («Step 1/3 …»), чтобы было видно, где скрипт находится.
 * Если новых URL нет — выводит INFO‑сообщение и прерывает работу **до** обогащения.
+* Стадии больше не запускаются подпроцессами по очереди: новые URL ставятся в очередь
+  датасета, а etl/orchestrator.py гонит их потоком fetch → chunk → dedupe → enrich/embed
+  в этом же процессе. Промежуточных jsonl-файлов нет — всё лежит в БД.
 
 Запуск:
-    python update_pipeline.py                 # стандартные файлы
-    python update_pipeline.py -n links2.txt   # кастомный файл новых ссылок
+    python update_pipeline.py -d 3                 # стандартные файлы
+    python update_pipeline.py -d 3 -n links2.txt   # кастомный файл новых ссылок
 """
 
 from __future__ import annotations
 
 import argparse
-import datetime as dt
+import asyncio
 import logging
+import os
 import shutil
-import subprocess
 import sys
 from pathlib import Path
-from typing import List
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.db import async_session_maker
+from etl.insert_links import _insert_links
+from etl.orchestrator import run_pipeline
 
 # ──────────────────────────── Константы ────────────────────────────────
 DEFAULT_NEW_FILE   = "new_links.txt"
 DEFAULT_CLEAN_FILE = "clean_links_unique.txt"
 DEFAULT_TMP_FILE   = "new_links_unique.txt"
 
-EXTRACT = "extract.py"
-CLEAN   = "clean_text_extractor.py"
-CHUNK   = "chunker.py"
-DEDUPER = "deduper.py"          # optional
-ENRICH  = "enricher.py"
-
-CHUNK_SIZE = 500
-OVERLAP    = 30
 DEDUP_THRESHOLD = 0.9            # None → пропускаем шаг дедупа
 
 # ──────────────────────────── Вспомогательные утилиты ─────────────────
 
-def run(cmd: List[str | Path]) -> None:
-    """Запускает внешнюю команду и стримит вывод в лог.
-    Принимает список str/Path, конвертирует в str для subprocess.
-    """
-    cmd_str = [str(c) for c in cmd]
-    logging.info("$ %s", " ".join(cmd_str))
-    print(f"\n🚀 Запускаем команду: {' '.join(cmd_str)}")
-
-    proc = subprocess.Popen(
-        cmd_str,
-        text=True,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        encoding='utf-8',
-        errors='replace'
-    )
-    assert proc.stdout is not None
-    for line in proc.stdout:
-        line = line.rstrip()
-        logging.debug(line)
-        print(f"  {line}")
-    proc.wait()
-    if proc.returncode != 0:
-        print(f"❌ Ошибка выполнения команды (код {proc.returncode})")
-        raise RuntimeError(f"Command failed: {' '.join(cmd_str)} → {proc.returncode}")
-    print("✅ Команда выполнена успешно\n")
-
-
 def diff_links(new_path: Path, clean_path: Path, tmp_path: Path) -> int:
     """Сохраняет в tmp_path только те URL, которых нет в clean_path.
     Если clean_path отсутствует – считаем, что база пуста.
@@ -93,12 +65,30 @@ def append_file(src: Path, dst: Path) -> None:
 
 # ──────────────────────────── Основной скрипт ─────────────────────────
 
+async def process_links(dataset_id: int, path: Path, dedupe: bool, total: int) -> None:
+    # Один event loop на оба шага: пул соединений движка привязан к циклу
+    print(f"\n📝 Шаг 1/{total}: Ссылки в очередь датасета {dataset_id}")
+    print("-" * 50)
+    urls = [u.strip() for u in path.read_text(encoding="utf-8").splitlines() if u.strip()]
+    async with async_session_maker() as session:
+        queued = await _insert_links(dataset_id, urls, session)
+        await session.commit()
+    print(f"📥 В очереди новых ссылок: {queued}")
+
+    print(f"\n🚀 Шаг 2/{total}: Потоковый конвейер")
+    print("-" * 50)
+    if not dedupe:
+        print("⏩ Пропускаем шаг дедупликации")
+    await run_pipeline(dataset_id, dedupe=dedupe, threshold=DEDUP_THRESHOLD or 0)
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Incremental update of CCE pipeline")
+    parser.add_argument("-d", "--dataset", type=int, required=True, help="dataset id to update")
     parser.add_argument("-n", "--new",   default=DEFAULT_NEW_FILE,   help="file with raw new links")
     parser.add_argument("-c", "--clean", default=DEFAULT_CLEAN_FILE, help="master unique links list")
     parser.add_argument("-q", "--quiet", action="store_true", help="suppress INFO logs, show only WARNING")
-    parser.add_argument("--skip-dedupe",  action="store_true", help="skip semantic dedupe step even if available")
+    parser.add_argument("--skip-dedupe",  action="store_true", help="skip near-duplicate step")
     args = parser.parse_args()
 
     logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO,
@@ -124,61 +114,19 @@ def main() -> None:
         logging.info("No new links → pipeline finished BEFORE enrichment ✋")
         return
 
-    ts = dt.datetime.now().strftime("%Y%m%d_%H%M%S")
-    meta        = root / f"meta_{ts}.jsonl"
-    meta_clean  = root / f"meta_clean_{ts}.jsonl"
-    chunks      = root / f"chunks_{ts}.jsonl"
-    enriched    = root / f"enriched_{ts}.jsonl"
-
-    step = 1; total = 5 + (0 if args.skip_dedupe else 1)
-
-    # Step 1: extract ---------------------------------------------------
-    print(f"\n📝 Шаг {step}/{total}: Извлечение метаданных")
-    print("-" * 50)
-    run([sys.executable, EXTRACT, "--input", tmp_path, "--output", meta])
-
-    # Step 2: clean -----------------------------------------------------
-    print(f"\n🧹 Шаг {step}/{total}: Очистка текста")
-    print("-" * 50)
-    run([sys.executable, CLEAN, "--input", meta, "--output", meta_clean])
+    total = 3
 
-    # Step 3: chunk -----------------------------------------------------
-    print(f"\n✂️ Шаг {step}/{total}: Разбиение на чанки")
-    print("-" * 50)
-    run([sys.executable, CHUNK,
-         "--input", meta_clean,
-         "--output", chunks,
-         "--chunk_size", str(CHUNK_SIZE),
-         "--overlap", str(OVERLAP)])
-
-    # Step 4: dedupe (optional) ----------------------------------------
-    chunks_to_enrich = chunks
-    if not args.skip_dedupe and Path(DEDUPER).exists() and DEDUP_THRESHOLD:
-        print(f"\n🔄 Шаг {step}/{total}: Семантическая дедупликация")
-        print("-" * 50)
-        dedup_chunks = root / f"chunks_dedup_{ts}.jsonl"
-        run([sys.executable, DEDUPER,
-             "-i", chunks,
-             "-o", dedup_chunks,
-             "-t", str(DEDUP_THRESHOLD)])
-        chunks_to_enrich = dedup_chunks
-    else:
-        print("\n⏩ Пропускаем шаг дедупликации")
-
-    # Step 5: enrich ----------------------------------------------------
-    print(f"\n✨ Шаг {step}/{total}: Обогащение данных")
-    print("-" * 50)
-    run([sys.executable, ENRICH, "--input", chunks_to_enrich, "--output", enriched])
+    # Step 1–2: queue links, fetch → chunk → dedupe → enrich/embed ------
+    dedupe = not args.skip_dedupe and bool(DEDUP_THRESHOLD)
+    asyncio.run(process_links(args.dataset, tmp_path, dedupe, total))
 
-    # Step 6: append to master -----------------------------------------
-    print(f"\n💾 Шаг {step}/{total}: Добавление в основную базу")
+    # Step 3: append to master -----------------------------------------
+    print(f"\n💾 Шаг 3/{total}: Добавление в основной список ссылок")
     print("-" * 50)
-    append_file(tmp_path,          clean_path)
-    append_file(chunks_to_enrich,  root / "chunks.jsonl")
-    append_file(enriched,          root / "enriched_chunks.jsonl")
+    append_file(tmp_path, clean_path)
 
     print("\n🎉 Обновление базы завершено успешно!")
-    logging.info("Pipeline finished ✅. Master files updated.")
+    logging.info("Pipeline finished ✅. Master list updated.")
 
 
 if __name__ == "__main__":
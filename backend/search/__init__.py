@@ -0,0 +1,10 @@
+# Поиск по чанкам: векторный (pgvector, NumPy), лексический и гибридный
+from search.base import SearchFilters, SearchHit, VectorIndex
+from search.pgvector_index import PgVectorIndex
+from search.numpy_index import NumpyIndex
+from search.query import embed_query
+from search.hybrid import lexical_search, rrf_fuse
+from search.results import load_results
+
+__all__ = ["SearchFilters", "SearchHit", "VectorIndex", "PgVectorIndex", "NumpyIndex", "embed_query",
+           "lexical_search", "rrf_fuse", "load_results"]
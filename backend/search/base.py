@@ -0,0 +1,34 @@
+"""base.py
+
+Общий интерфейс движков векторного поиска.
+
+Движок отвечает только за «вектор → top-k chunk_id со score» внутри датасета,
+с предфильтрами по quality и chunk_meta_data. Тексты чанков для ответа API
+догружаются отдельно, по найденным id.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, NamedTuple, Optional
+
+
+class SearchHit(NamedTuple):
+    chunk_id: int
+    score: float  # косинусное сходство, больше — ближе
+
+
+class SearchFilters(NamedTuple):
+    quality: Optional[List[str]] = None        # chunks.quality IN (...)
+    metadata: Optional[Dict[str, Any]] = None  # chunks.chunk_meta_data @> {...}
+
+
+class VectorIndex(ABC):
+    @abstractmethod
+    async def search(
+        self,
+        dataset_id: int,
+        vector: List[float],
+        k: int = 10,
+        filters: Optional[SearchFilters] = None,
+        ef_search: Optional[int] = None,
+    ) -> List[SearchHit]:
+        ...
@@ -0,0 +1,52 @@
+"""hybrid.py
+
+Лексический поиск по chunks.search_vector (GIN) и слияние с векторным через
+reciprocal rank fusion: score = Σ 1 / (rrf_k + rank) по всем спискам.
+
+Запрос разбирается сразу обоими словарями (russian и english) — язык запроса
+заранее не известен, а search_vector чанка построен словарём его страницы.
+"""
+
+from sqlalchemy import cast, func, select
+from sqlalchemy.dialects.postgresql import REGCONFIG
+
+from models.models import Chunk
+from search.base import SearchFilters, SearchHit
+
+RRF_K = 60
+CANDIDATES = 50  # минимум кандидатов с каждой стороны для слияния
+
+
+def ts_query(query_text: str):
+    return func.websearch_to_tsquery(cast("russian", REGCONFIG), query_text).op("||")(
+        func.websearch_to_tsquery(cast("english", REGCONFIG), query_text)
+    )
+
+
+async def lexical_search(session, dataset_id, query_text, k=10, filters=None):
+    """Top-k чанков датасета по ts_rank_cd; score — ранг полнотекстового совпадения."""
+    filters = filters or SearchFilters()
+    tsq = ts_query(query_text)
+    rank = func.ts_rank_cd(Chunk.search_vector, tsq)
+    query = (
+        select(Chunk.id, rank.label("rank"))
+        .where(Chunk.dataset_id == dataset_id)
+        .where(Chunk.search_vector.op("@@")(tsq))
+    )
+    if filters.quality:
+        query = query.where(Chunk.quality.in_(filters.quality))
+    if filters.metadata:
+        query = query.where(Chunk.chunk_meta_data.contains(filters.metadata))
+
+    result = await session.execute(query.order_by(rank.desc(), Chunk.id).limit(k))
+    return [SearchHit(row.id, float(row.rank)) for row in result]
+
+
+def rrf_fuse(rankings, k=10, rrf_k=RRF_K):
+    """Списки SearchHit (каждый отсортирован по убыванию) → общий top-k по RRF."""
+    scores = {}
+    for hits in rankings:
+        for rank, hit in enumerate(hits, start=1):
+            scores[hit.chunk_id] = scores.get(hit.chunk_id, 0.0) + 1.0 / (rrf_k + rank)
+    best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+    return [SearchHit(chunk_id, score) for chunk_id, score in best]
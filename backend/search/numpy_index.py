@@ -0,0 +1,333 @@
+"""numpy_index.py
+
+Векторный поиск в памяти процесса на NumPy — для локальных прогонов, бенчмарков
+без Postgres и датасетов, которые целиком помещаются в RAM.
+
+* Векторы датасета лежат одной непрерывной матрицей float32 (или int8 с масштабом
+  на строку), нормированные — косинус считается одним matmul'ом.
+* Пакет запросов обрабатывается за один проход: (Q×d) @ (d×N) блоками по BLOCK_ROWS.
+* Опционально IVF: k-means на nlist центроидов, запрос смотрит nprobe ближайших списков.
+  В общем интерфейсе nprobe передаётся через ef_search.
+* Снимок на диске (data/search/<dataset_id>/) открывается через np.load(mmap_mode="r"):
+  после рестарта индекс поднимается без чтения эмбеддингов из БД.
+* Устаревание — по datasets.index_version, который увеличивают стадии ETL при записи
+  чанков и векторов (bump_version). Сверка — не чаще раза в VERSION_TTL секунд.
+"""
+
+import json
+import os
+import time
+from collections import Counter
+
+import numpy as np
+from sqlalchemy import select, update
+
+from models.models import Chunk, Dataset, Embedding
+from search.base import SearchFilters, SearchHit, VectorIndex
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "search")
+BLOCK_ROWS = 65536   # строк матрицы на один matmul — ограничивает временную память для int8
+LOAD_BATCH = 5000
+KMEANS_ITERATIONS = 10
+DEFAULT_NPROBE = 8
+VERSION_TTL = float(os.getenv("NUMPY_INDEX_VERSION_TTL", "5"))  # секунд между сверками версии
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def quantize(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Симметричное квантование по строке: v ≈ codes * scale
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def kmeans(vectors: np.ndarray, nlist: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """Сферический k-means (центроиды нормированы); для обучения хватает выборки."""
+    rnd = np.random.default_rng(seed)
+    sample = vectors[rnd.choice(len(vectors), min(len(vectors), nlist * 256), replace=False)]
+    centroids = sample[rnd.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = sample[assign == c]
+            # Пустой кластер переинициализируем случайной точкой
+            centroids[c] = members.sum(axis=0) if len(members) else sample[rnd.integers(len(sample))]
+        centroids = normalize(centroids)
+    return centroids
+
+
+def json_contains(doc, pattern) -> bool:
+    """doc @> pattern по правилам JSONB: объект — рекурсивно по ключам, массив — каждый
+    элемент pattern содержится в каком-то элементе doc, скаляры — равенство с учётом типа."""
+    if isinstance(pattern, dict):
+        return isinstance(doc, dict) and all(
+            key in doc and json_contains(doc[key], value) for key, value in pattern.items()
+        )
+    if isinstance(pattern, list):
+        return isinstance(doc, list) and all(
+            any(json_contains(item, wanted) for item in doc) for wanted in pattern
+        )
+    if isinstance(doc, (dict, list)):
+        return False
+    if isinstance(doc, bool) or isinstance(pattern, bool):
+        # В JSON true и 1 — разные значения, а в Python True == 1
+        return doc is pattern
+    return doc == pattern
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Индексы k лучших по строкам, отсортированные по убыванию score."""
+    k = min(k, scores.shape[1])
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+class NumpyIndex(VectorIndex):
+    def __init__(self, dataset_id, ids, vectors=None, codes=None, scales=None,
+                 quality=None, metadata=None, centroids=None, lists=None, version=None):
+        self.dataset_id = dataset_id
+        self.ids = ids
+        self.vectors = vectors      # float32 (N, d) или None
+        self.codes = codes          # int8 (N, d) или None
+        self.scales = scales        # float32 (N,)
+        self.quality = quality      # np.array строк или None
+        self.metadata = metadata    # список dict или None
+        self.centroids = centroids  # (nlist, d) или None
+        self.lists = lists          # номер списка IVF для каждой строки
+        self.version = version      # dataset_version() на момент построения
+        self._inverted = None
+
+    @classmethod
+    def build(cls, dataset_id, ids, vectors, quality=None, metadata=None,
+              dtype="float32", nlist=0, version=None):
+        vectors = normalize(vectors)
+        params = {}
+        if dtype == "int8":
+            params["codes"], params["scales"] = quantize(vectors)
+        else:
+            params["vectors"] = vectors
+        if nlist and len(vectors) > nlist:
+            params["centroids"] = kmeans(vectors, nlist)
+            params["lists"] = np.concatenate([
+                np.argmax(vectors[i:i + BLOCK_ROWS] @ params["centroids"].T, axis=1)
+                for i in range(0, len(vectors), BLOCK_ROWS)
+            ]).astype(np.int32)
+        return cls(
+            dataset_id,
+            np.asarray(ids, dtype=np.int64),
+            quality=np.asarray(quality, dtype=object) if quality is not None else None,
+            metadata=metadata,
+            version=version,
+            **params,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dims(self):
+        matrix = self.vectors if self.vectors is not None else self.codes
+        return matrix.shape[1]
+
+    @property
+    def nbytes(self):
+        matrix = self.vectors if self.vectors is not None else self.codes
+        return matrix.nbytes
+
+    def _scores(self, queries, rows=None):
+        """(Q, N') косинусов для строк rows (или всех)."""
+        matrix = self.vectors if self.vectors is not None else self.codes
+        if rows is not None:
+            block = matrix[rows]
+            scores = queries @ block.T.astype(np.float32, copy=False)
+            return scores * self.scales[rows] if self.codes is not None else scores
+        out = np.empty((len(queries), len(matrix)), dtype=np.float32)
+        for i in range(0, len(matrix), BLOCK_ROWS):
+            block = np.asarray(matrix[i:i + BLOCK_ROWS]).astype(np.float32, copy=False)
+            out[:, i:i + BLOCK_ROWS] = queries @ block.T
+            if self.codes is not None:
+                out[:, i:i + BLOCK_ROWS] *= self.scales[i:i + BLOCK_ROWS]
+        return out
+
+    def list_rows(self, lists):
+        # Инвертированные списки: строки, отсортированные по номеру списка, и границы
+        if self._inverted is None:
+            order = np.argsort(self.lists, kind="stable")
+            bounds = np.searchsorted(self.lists[order], np.arange(len(self.centroids) + 1))
+            self._inverted = (order, bounds)
+        order, bounds = self._inverted
+        return np.concatenate([order[bounds[l]:bounds[l + 1]] for l in lists])
+
+    def filter_mask(self, filters):
+        if filters is None or (not filters.quality and not filters.metadata):
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        if filters.quality:
+            mask &= np.isin(self.quality, filters.quality)
+        if filters.metadata:
+            # Та же семантика, что у chunk_meta_data @> {...} в pgvector_index
+            mask &= np.fromiter(
+                (json_contains(meta, filters.metadata) for meta in self.metadata),
+                dtype=bool, count=len(self),
+            )
+        return mask
+
+    def search_batch(self, queries, k=10, filters=None, nprobe=None):
+        """Пакет запросов (Q, d) → (ids (Q, k'), scores (Q, k')), k' ≤ k."""
+        queries = normalize(np.atleast_2d(queries))
+        mask = self.filter_mask(filters)
+
+        if self.centroids is None:
+            scores = self._scores(queries)
+            if mask is not None:
+                scores[:, ~mask] = -np.inf
+            best = top_k(scores, k)
+            return self.ids[best], np.take_along_axis(scores, best, axis=1)
+
+        # IVF: у каждого запроса свой набор списков, поэтому по одному
+        nprobe = min(nprobe or DEFAULT_NPROBE, len(self.centroids))
+        probes = top_k(queries @ self.centroids.T, nprobe)
+        all_ids, all_scores = [], []
+        for query, lists in zip(queries, probes):
+            rows = self.list_rows(lists)
+            if mask is not None:
+                rows = rows[mask[rows]]
+            scores = self._scores(query[None, :], rows)
+            best = top_k(scores, k)[0] if len(rows) else np.empty(0, dtype=np.int64)
+            all_ids.append(self.ids[rows[best]])
+            all_scores.append(scores[0, best])
+        width = max((len(ids) for ids in all_ids), default=0)
+        pad = lambda arrays, fill, dtype: np.array(
+            [np.concatenate([a, np.full(width - len(a), fill, dtype=dtype)]) for a in arrays], dtype=dtype
+        )
+        return pad(all_ids, -1, np.int64), pad(all_scores, -np.inf, np.float32)
+
+    async def search(self, dataset_id, vector, k=10, filters=None, ef_search=None):
+        if dataset_id != self.dataset_id:
+            raise ValueError(f"Индекс построен для датасета {self.dataset_id}, а не {dataset_id}")
+        ids, scores = self.search_batch(np.asarray(vector, dtype=np.float32), k, filters, nprobe=ef_search)
+        return [
+            SearchHit(int(chunk_id), float(score))
+            for chunk_id, score in zip(ids[0], scores[0])
+            if chunk_id >= 0 and np.isfinite(score)
+        ]
+
+    # --- снимок на диске ---
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        arrays = {"ids": self.ids, "vectors": self.vectors, "codes": self.codes, "scales": self.scales,
+                  "centroids": self.centroids, "lists": self.lists}
+        for name, array in arrays.items():
+            if array is not None:
+                np.save(os.path.join(path, f"{name}.npy"), array)
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "dataset_id": self.dataset_id,
+                "version": self.version,
+                "quality": self.quality.tolist() if self.quality is not None else None,
+                "metadata": self.metadata,
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+
+        def array(name):
+            file = os.path.join(path, f"{name}.npy")
+            return np.load(file, mmap_mode="r" if mmap else None) if os.path.exists(file) else None
+
+        return cls(
+            meta["dataset_id"], array("ids"), array("vectors"), array("codes"), array("scales"),
+            quality=np.asarray(meta["quality"], dtype=object) if meta["quality"] is not None else None,
+            metadata=meta["metadata"],
+            centroids=array("centroids"), lists=array("lists"),
+            version=meta["version"],
+        )
+
+
+def snapshot_path(dataset_id):
+    return os.path.join(SNAPSHOT_DIR, str(dataset_id))
+
+
+async def dataset_version(session, dataset_id):
+    # Одна строка по первичному ключу вместо прохода по эмбеддингам датасета
+    return await session.scalar(select(Dataset.index_version).where(Dataset.id == dataset_id))
+
+
+async def bump_version(session, dataset_id):
+    """Отметить, что чанки или векторы датасета изменились; без commit — в транзакции записи.
+    dataset_id — число или скалярный подзапрос (маршрут знает только id чанка)."""
+    await session.execute(
+        update(Dataset).where(Dataset.id == dataset_id).values(index_version=Dataset.index_version + 1)
+    )
+
+
+async def load_from_db(session, dataset_id, dtype="float32", nlist=0, batch_size=LOAD_BATCH):
+    """Векторы датасета из БД, keyset по chunk_id; только нужные колонки."""
+    version = await dataset_version(session, dataset_id)
+    ids, vectors, quality, metadata = [], [], [], []
+    last_id = 0
+    while True:
+        result = await session.execute(
+            select(Embedding.chunk_id, Embedding.vector, Chunk.quality, Chunk.chunk_meta_data)
+            .join(Chunk, Chunk.id == Embedding.chunk_id)
+            .where(Embedding.dataset_id == dataset_id)
+            .where(Embedding.chunk_id > last_id)
+            .order_by(Embedding.chunk_id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+        for row in rows:
+            ids.append(row.chunk_id)
+            vectors.append(np.asarray(row.vector, dtype=np.float32))
+            quality.append(row.quality)
+            metadata.append(row.chunk_meta_data or {})
+        last_id = rows[-1].chunk_id
+
+    if not ids:
+        return None
+    # Векторы разной размерности (сменили бэкенд) в одну матрицу не сложить — берём основную
+    dims = Counter(len(v) for v in vectors).most_common(1)[0][0]
+    keep = [i for i, v in enumerate(vectors) if len(v) == dims]
+    return NumpyIndex.build(
+        dataset_id,
+        [ids[i] for i in keep],
+        np.stack([vectors[i] for i in keep]),
+        quality=[quality[i] for i in keep],
+        metadata=[metadata[i] for i in keep],
+        dtype=dtype, nlist=nlist, version=version,
+    )
+
+
+_indexes = {}
+_checked = {}   # dataset_id → time.monotonic() последней сверки версии
+
+
+async def get_index(session, dataset_id, dtype="float32", nlist=0):
+    """Индекс датасета: из памяти, со снимка на диске или заново из БД, если версия датасета сменилась."""
+    index = _indexes.get(dataset_id)
+    if index is not None and time.monotonic() - _checked.get(dataset_id, 0) < VERSION_TTL:
+        return index
+    version = await dataset_version(session, dataset_id)
+    if index is None and os.path.exists(os.path.join(snapshot_path(dataset_id), "meta.json")):
+        index = NumpyIndex.load(snapshot_path(dataset_id))
+    if index is None or index.version != version:
+        index = await load_from_db(session, dataset_id, dtype=dtype, nlist=nlist)
+        if index is None:
+            return None
+        index.save(snapshot_path(dataset_id))
+    _indexes[dataset_id] = index
+    _checked[dataset_id] = time.monotonic()
+    return index
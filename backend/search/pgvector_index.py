@@ -0,0 +1,79 @@
+"""pgvector_index.py
+
+Поиск в Postgres через pgvector.
+
+Колонка embeddings.vector без размерности, поэтому HNSW-индекс построен по выражению
+(vector::vector(1536)) с условием vector_dims(vector) = 1536 (см. миграцию c5d2e8f1a9b4 и Embedding.__table_args__).
+Запрос повторяет то же выражение и условие — иначе планировщик индекс не возьмёт.
+Для других размерностей запрос тот же, но без индекса.
+
+Фильтры (датасет, quality, metadata) HNSW проверяет уже после обхода графа. На pgvector ≥ 0.8
+включается hnsw.iterative_scan — обход продолжается, пока не наберётся k подходящих строк;
+если строк всё равно меньше k, запрос повторяется точным перебором по отфильтрованным строкам.
+"""
+
+from sqlalchemy import cast, func, literal_column, select, text
+
+from models.models import Chunk, Embedding
+from search.base import SearchFilters, SearchHit, VectorIndex
+from pgvector.sqlalchemy import Vector
+
+INDEXED_DIMS = 1536
+DEFAULT_EF_SEARCH = 40  # значение pgvector по умолчанию
+MAX_EF_SEARCH = 1000
+ITERATIVE_SCAN_VERSION = (0, 8)
+
+_iterative_scan = None
+
+
+async def supports_iterative_scan(session) -> bool:
+    # hnsw.iterative_scan появился в pgvector 0.8; версия расширения не меняется без рестарта
+    global _iterative_scan
+    if _iterative_scan is None:
+        version = await session.scalar(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'"))
+        _iterative_scan = version is not None and tuple(int(part) for part in version.split(".")[:2]) >= ITERATIVE_SCAN_VERSION
+    return _iterative_scan
+
+
+class PgVectorIndex(VectorIndex):
+    def __init__(self, session):
+        self.session = session
+
+    async def search(self, dataset_id, vector, k=10, filters=None, ef_search=None):
+        filters = filters or SearchFilters()
+        dims = len(vector)
+        # ef_search меньше k обрезает выдачу — поднимаем до k
+        ef = min(max(ef_search or DEFAULT_EF_SEARCH, k), MAX_EF_SEARCH)
+        # SET LOCAL не принимает bind-параметры; ef — проверенное целое
+        await self.session.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef)}"))
+        if await supports_iterative_scan(self.session):
+            # Датасет, quality и metadata проверяются после обхода графа: без итеративного
+            # сканирования из ef кандидатов фильтр может оставить меньше k
+            await self.session.execute(text("SET LOCAL hnsw.iterative_scan = relaxed_order"))
+
+        query = (
+            select(Embedding.chunk_id)
+            .where(Embedding.dataset_id == dataset_id)
+            # Литерал, а не параметр: иначе условие частичного индекса не доказывается
+            .where(func.vector_dims(Embedding.vector) == literal_column(str(int(dims))))
+        )
+        if filters.quality or filters.metadata:
+            # chunks нужны только для фильтров
+            query = query.join(Chunk, Chunk.id == Embedding.chunk_id)
+        if filters.quality:
+            query = query.where(Chunk.quality.in_(filters.quality))
+        if filters.metadata:
+            query = query.where(Chunk.chunk_meta_data.contains(filters.metadata))
+
+        distance = cast(Embedding.vector, Vector(dims)).cosine_distance(vector)
+        hits = await self._top_k(query, distance, k)
+        if len(hits) < k and dims == INDEXED_DIMS:
+            # Старый pgvector или фильтр уже и max_scan_tuples: точный перебор строк датасета
+            # (по ix_embeddings_dataset_id). Выражение без приведения к vector(1536) HNSW не берёт.
+            hits = await self._top_k(query, Embedding.vector.cosine_distance(vector), k)
+        return hits
+
+    async def _top_k(self, query, distance, k):
+        result = await self.session.execute(query.add_columns(distance.label("distance")).order_by(distance).limit(k))
+        # relaxed_order может вернуть соседей чуть не по порядку — досортировываем
+        return sorted((SearchHit(row.chunk_id, 1 - row.distance) for row in result), key=lambda hit: -hit.score)
@@ -0,0 +1,28 @@
+"""query.py
+
+Векторизация поискового запроса тем же бэкендом, что и чанки датасета
+(Dataset.embedding_settings). Бэкенды кэшируются по настройкам:
+локальную модель не стоит грузить на каждый запрос.
+"""
+
+import json
+
+from openai import AsyncOpenAI
+
+from core.config import settings
+from etl.embedding_backends import make_backend
+
+client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+_backends = {}
+
+
+def get_backend(embedding_settings):
+    key = json.dumps(embedding_settings or {}, sort_keys=True)
+    if key not in _backends:
+        _backends[key] = make_backend(embedding_settings, client)
+    return _backends[key]
+
+
+async def embed_query(query_text: str, embedding_settings) -> list:
+    vectors = await get_backend(embedding_settings).embed([query_text])
+    return list(vectors[0])
@@ -0,0 +1,34 @@
+"""results.py
+
+Тексты и метаданные найденных чанков для ответа API — одним запросом по id,
+в порядке выдачи движка.
+"""
+
+from sqlalchemy import select
+
+from models.models import Chunk, Page
+
+
+async def load_results(session, hits):
+    rows = await session.execute(
+        select(
+            Chunk.id, Chunk.page_id, Page.url, Chunk.chunk_text,
+            Chunk.summary, Chunk.quality, Chunk.chunk_meta_data
+        )
+        .join(Page, Page.id == Chunk.page_id)
+        .where(Chunk.id.in_([hit.chunk_id for hit in hits]))
+    )
+    chunks = {chunk.id: chunk for chunk in rows}
+    return [
+        {
+            "chunk_id": hit.chunk_id,
+            "page_id": chunks[hit.chunk_id].page_id,
+            "url": chunks[hit.chunk_id].url,
+            "score": hit.score,
+            "chunk_text": chunks[hit.chunk_id].chunk_text,
+            "summary": chunks[hit.chunk_id].summary,
+            "quality": chunks[hit.chunk_id].quality,
+            "chunk_meta_data": chunks[hit.chunk_id].chunk_meta_data or {},
+        }
+        for hit in hits if hit.chunk_id in chunks
+    ]
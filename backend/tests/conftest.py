@@ -0,0 +1,27 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# core.config требует настройки при импорте; тесты не ходят ни в рабочую базу, ни в OpenAI
+os.environ.setdefault("DATABASE_URL", os.getenv("TEST_DATABASE_URL", "postgresql+asyncpg://localhost/test"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import pytest
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.ext.compiler import compiles
+
+
+# Тесты на SQLite используют реальные модели: типам Postgres нужны только имена для DDL
+@compiles(JSONB, "sqlite")
+def compile_jsonb(type_, compiler, **kw):
+    return "JSON"
+
+
+@compiles(TSVECTOR, "sqlite")
+def compile_tsvector(type_, compiler, **kw):
+    return "TEXT"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
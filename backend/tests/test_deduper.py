@@ -0,0 +1,21 @@
+"""UnionFind в deduper: канонический чанк — меньший id группы, длинные цепочки без рекурсии."""
+
+from etl.deduper import UnionFind
+
+
+def test_long_chain_keeps_smallest_id():
+    groups = UnionFind()
+    for chunk_id in range(1, 100000):
+        groups.union(chunk_id + 1, chunk_id)
+    assert groups.find(100000) == 1
+    assert {groups.find(chunk_id) for chunk_id in groups.parent} == {1}
+
+
+def test_merged_groups_keep_smallest_id():
+    groups = UnionFind()
+    groups.union(10, 11)
+    groups.union(12, 13)
+    groups.union(13, 3)
+    groups.union(11, 12)
+    assert {groups.find(chunk_id) for chunk_id in (3, 10, 11, 12, 13)} == {3}
+    assert groups.find(42) == 42
@@ -0,0 +1,33 @@
+"""Ответ GPT валидного JSON, но не той формы, отправляет чанк на ревью и не роняет воркер."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from etl import enricher
+
+pytestmark = pytest.mark.anyio
+
+CHUNK = SimpleNamespace(id=7, chunk_text="text", chunk_meta_data={})
+
+
+@pytest.mark.parametrize("reply", [
+    '{"summary": "s", "topics": 5}',
+    '{"summary": "s", "topics": ["ab", null]}',
+    '[1, 2]',
+    None,
+])
+async def test_malformed_reply_needs_review(monkeypatch, reply):
+    async def chat_completion(*args, validate=None, **kwargs):
+        assert not validate(reply)   # такой ответ не попадёт в кэш
+        return reply
+
+    monkeypatch.setattr(enricher, "chat_completion", chat_completion)
+    result = await enricher.enrich_chunk(CHUNK, "prompt", "gpt-test", None)
+    assert result == {"id": 7, "quality": "needs_review"}
+
+
+def test_batch_reply_skips_non_string_topics():
+    chunks = [SimpleNamespace(id=1), SimpleNamespace(id=2)]
+    reply = '[{"chunk_id": 1, "summary": "a", "topics": ["x"]}, {"chunk_id": 2, "summary": "b", "topics": [null]}]'
+    assert enricher.parse_batch_reply(reply, chunks) == {1: ("a", ["x"])}
@@ -0,0 +1,62 @@
+"""Дата новой страницы доходит до DateNormalizer: build_page не отправляет на ревью
+дату только за то, что она не ISO, а clean_dates её нормализует. Модели — в SQLite.
+"""
+
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable
+
+from etl.meta_cleaner import clean_dates
+from etl.raw_html_extractor import build_page
+from models.models import Link, Page
+
+pytestmark = pytest.mark.anyio
+
+
+class AwaitableSession:
+    # clean_dates ждёт AsyncSession; драйвера aiosqlite нет — те же вызовы синхронно
+    def __init__(self, session):
+        self.session = session
+
+    async def execute(self, *args, **kwargs):
+        return self.session.execute(*args, **kwargs)
+
+
+def meta(raw_date):
+    return {"title": "t", "raw_author": "Автор", "raw_date": raw_date, "raw_category": "news",
+            "meta_data": {}, "clean_text": "text"}
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(CreateTable(Link.__table__))
+        conn.execute(CreateTable(Page.__table__))
+        conn.execute(insert(Link).values(id=1, dataset_id=1, url="https://example.ru/a"))
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+async def test_non_iso_dates_are_normalized(session):
+    link = SimpleNamespace(id=1)
+    for url, raw_date in [("https://example.ru/a", "12 марта 2024"), ("https://example.ru/b", "03.05.2024")]:
+        page = build_page(link, url, None, meta(raw_date))
+        assert not page.date_needs_review
+        session.add(page)
+    session.add(build_page(link, "https://example.ru/c", None, meta(None)))
+    session.flush()
+
+    await clean_dates(AwaitableSession(session), 1, "gpt-test")
+
+    rows = session.execute(select(Page.clean_date, Page.date_needs_review).order_by(Page.id)).all()
+    assert [(row.clean_date.date() if row.clean_date else None, row.date_needs_review) for row in rows] == [
+        (date(2024, 3, 12), False),
+        (date(2024, 5, 3), False),
+        (None, True),
+    ]
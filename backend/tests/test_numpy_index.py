@@ -0,0 +1,71 @@
+"""NumpyIndex: фильтр metadata как chunk_meta_data @> {...} в pgvector_index; версия датасета
+сверяется не чаще раза в VERSION_TTL."""
+
+import numpy as np
+import pytest
+
+from search import SearchFilters, numpy_index
+from search.numpy_index import NumpyIndex
+
+METADATA = [
+    {"topics": ["ai", "db"], "source": {"site": "a", "lang": "ru"}},
+    {"topics": ["ai"], "source": {"site": "b"}},
+    {"topics": "ai", "flag": 1},
+    {"flag": True},
+]
+
+
+def matched(metadata):
+    rnd = np.random.default_rng(0)
+    index = NumpyIndex.build(1, range(len(METADATA)), rnd.normal(size=(len(METADATA), 8)), metadata=METADATA)
+    return set(index.ids[index.filter_mask(SearchFilters(metadata=metadata))].tolist())
+
+
+def test_nested_object_containment():
+    assert matched({"source": {"site": "a"}}) == {0}
+
+
+def test_array_contains_elements():
+    assert matched({"topics": ["db"]}) == {0}
+    assert matched({"topics": ["ai"]}) == {0, 1}
+
+
+def test_scalar_does_not_match_array():
+    assert matched({"topics": "ai"}) == {2}
+
+
+def test_bool_is_not_number():
+    assert matched({"flag": True}) == {3}
+    assert matched({"flag": 1}) == {2}
+
+
+@pytest.mark.anyio
+async def test_get_index_checks_version_once_per_ttl(monkeypatch, tmp_path):
+    checks, loads = [], []
+    version = {"value": 1}
+
+    async def dataset_version(session, dataset_id):
+        checks.append(dataset_id)
+        return version["value"]
+
+    async def load_from_db(session, dataset_id, dtype="float32", nlist=0):
+        loads.append(dataset_id)
+        return NumpyIndex.build(dataset_id, [1, 2], np.eye(2, 8), version=version["value"])
+
+    monkeypatch.setattr(numpy_index, "dataset_version", dataset_version)
+    monkeypatch.setattr(numpy_index, "load_from_db", load_from_db)
+    monkeypatch.setattr(numpy_index, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(numpy_index, "_indexes", {})
+    monkeypatch.setattr(numpy_index, "_checked", {})
+    clock = {"now": 100.0}
+    monkeypatch.setattr(numpy_index.time, "monotonic", lambda: clock["now"])
+
+    for _ in range(3):
+        await numpy_index.get_index(None, 9)
+    assert (len(checks), len(loads)) == (1, 1)
+
+    # Запись стадии ETL подняла версию: после TTL индекс перестраивается
+    version["value"] = 2
+    clock["now"] += numpy_index.VERSION_TTL
+    index = await numpy_index.get_index(None, 9)
+    assert (len(checks), len(loads), index.version) == (2, 2, 2)
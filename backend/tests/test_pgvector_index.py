@@ -0,0 +1,73 @@
+"""Фильтрованный поиск по HNSW должен возвращать k результатов, даже когда фильтр
+оставляет малую долю кандидатов ef_search. Нужен Postgres с pgvector, в TEST_DATABASE_URL —
+одноразовая база: схема пересоздаётся.
+"""
+
+import os
+
+import numpy as np
+import pytest
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from models.models import Base, Chunk, Dataset, Embedding, Link, Page, User
+from search import PgVectorIndex, SearchFilters
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+DIMS = 1536
+
+pytestmark = [
+    pytest.mark.anyio,
+    pytest.mark.skipif(not TEST_DATABASE_URL, reason="нужен Postgres с pgvector в TEST_DATABASE_URL"),
+]
+
+
+async def add_dataset(session, dataset_id, vectors, qualities):
+    await session.execute(insert(Dataset).values(id=dataset_id, user_id=1, name=f"ds{dataset_id}"))
+    await session.execute(insert(Link).values(id=dataset_id, dataset_id=dataset_id, url=f"https://example.com/{dataset_id}"))
+    await session.execute(insert(Page).values(id=dataset_id, link_id=dataset_id, url=f"https://example.com/{dataset_id}"))
+    base = dataset_id * 100000
+    await session.execute(insert(Chunk), [
+        {"id": base + i, "page_id": dataset_id, "dataset_id": dataset_id, "chunk_index": i,
+         "chunk_text": f"chunk {i}", "quality": quality}
+        for i, quality in enumerate(qualities)
+    ])
+    await session.execute(insert(Embedding), [
+        {"chunk_id": base + i, "dataset_id": dataset_id, "input": f"chunk {i}", "vector": vector.tolist()}
+        for i, vector in enumerate(vectors)
+    ])
+
+
+@pytest.fixture
+async def session():
+    engine = create_async_engine(TEST_DATABASE_URL)
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    rng = np.random.default_rng(7)
+    async with AsyncSession(engine) as session:
+        await session.execute(insert(User).values(id=1, email="t@example.com", password_hash="x"))
+        # Большой датасет: "ok" только у 15 чанков из 3000
+        await add_dataset(session, 1, rng.normal(size=(3000, DIMS)), ["ok" if i % 200 == 0 else None for i in range(3000)])
+        # Маленький датасет в общем индексе
+        await add_dataset(session, 2, rng.normal(size=(12, DIMS)), [None] * 12)
+        await session.commit()
+        yield session
+    await engine.dispose()
+
+
+async def test_small_dataset_in_shared_index_returns_k(session):
+    query = np.random.default_rng(1).normal(size=DIMS).tolist()
+    hits = await PgVectorIndex(session).search(2, query, k=10)
+    assert len(hits) == 10
+    assert all(hit.chunk_id // 100000 == 2 for hit in hits)
+
+
+async def test_selective_quality_filter_returns_k(session):
+    query = np.random.default_rng(2).normal(size=DIMS).tolist()
+    hits = await PgVectorIndex(session).search(1, query, k=10, filters=SearchFilters(quality=["ok"]))
+    assert len(hits) == 10
+    assert all((hit.chunk_id - 100000) % 200 == 0 for hit in hits)
+    assert [hit.score for hit in hits] == sorted((hit.score for hit in hits), reverse=True)
@@ -0,0 +1,49 @@
+"""QueryGuard ловит N+1 и колонки вне профиля и пропускает запрос, собранный по профилю.
+Реальная модель Chunk в SQLite (типы Postgres — в conftest.py).
+"""
+
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable
+
+from core.query_guard import QueryGuard
+from models.models import Chunk
+from models.profiles import CHUNK_ID, CHUNK_RESPONSE
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        # CreateTable, а не create_all: триггер search_vector на plpgsql в SQLite не создать
+        conn.execute(CreateTable(Chunk.__table__))
+        conn.execute(insert(Chunk), [
+            {"id": i, "page_id": 1, "dataset_id": 1, "chunk_index": i, "chunk_text": f"chunk {i}",
+             "chunk_meta_data": {}, "quality": "ok"}
+            for i in range(1, 6)
+        ])
+    yield engine
+    engine.dispose()
+
+
+def test_profile_query_passes(engine):
+    with Session(engine) as session, QueryGuard(engine, CHUNK_RESPONSE):
+        chunks = session.scalars(select(Chunk).options(*CHUNK_RESPONSE.options())).all()
+        assert [chunk.chunk_text for chunk in chunks] == [f"chunk {i}" for i in range(1, 6)]
+
+
+def test_n_plus_one_fails(engine):
+    with Session(engine) as session:
+        with pytest.raises(AssertionError, match="N\\+1"):
+            with QueryGuard(engine, CHUNK_ID, allow=("chunks.chunk_text",), extra=1):
+                for chunk in session.scalars(select(Chunk).options(*CHUNK_ID.options())).all():
+                    session.scalar(select(Chunk.chunk_text).where(Chunk.id == chunk.id))
+
+
+def test_extra_columns_fail(engine):
+    with Session(engine) as session:
+        with pytest.raises(AssertionError, match="лишние колонки") as error:
+            with QueryGuard(engine, CHUNK_RESPONSE):
+                session.scalars(select(Chunk)).all()
+    assert "search_vector" in str(error.value)